@@ -34,6 +34,10 @@ rm -rf $MEADOW_WEB_PATH
 mkdir -p $REPO_DIR/buildroot_files/overlay/usr/share/
 cp -r $MEADOW_WEB_SRC_PATH $MEADOW_WEB_PATH
 
+# Minify, fingerprint and precompress the CSS/JS (nginx serves static/dist/ directly)
+echo "Building static assets"
+python3 "$MEADOW_WEB_PATH/assets.py" "$MEADOW_WEB_PATH/static"
+
 # ---- Buildroot Config ----
 cd "$BUILDROOT_DIR"
 
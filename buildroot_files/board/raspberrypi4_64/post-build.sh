@@ -29,4 +29,8 @@ chmod +x "${TARGET_DIR}/usr/lib/meadow/scripts/install-bitcoin.sh"
 chmod +x "${TARGET_DIR}/usr/lib/meadow/scripts/start-bitcoind.sh"
 chmod +x "${TARGET_DIR}/usr/lib/meadow/scripts/stop-bitcoind.sh"
 chmod +x "${TARGET_DIR}/usr/lib/meadow/scripts/create-user.sh"
+chmod +x "${TARGET_DIR}/usr/lib/meadow/scripts/clone-datadir.sh"
 
+# Precompile the web app with the host Python (same version as the target's), so the
+# first boot doesn't spend its time compiling every module before the UI comes up
+"${HOST_DIR}/bin/python3" -m compileall -q -d /usr/share/meadow_web "${TARGET_DIR}/usr/share/meadow_web"
@@ -0,0 +1,12 @@
+#!/bin/sh
+# Usage: clone-datadir.sh export <folder> [--chunk-size MB] [--compression zstd|gzip]
+#        clone-datadir.sh import <folder> [--replace] [--workers N]
+#
+# Thin wrapper around the web app's chain data export/import (meadow_web/datadir_clone.py).
+# Export writes blocks/ and chainstate/ of the stopped node as checksummed chunks; import
+# checks and unpacks them, and continues where an interrupted import stopped.
+
+set -e
+
+cd /usr/share
+exec /usr/bin/python3 -m meadow_web.datadir_clone "$@"
@@ -3,6 +3,7 @@
 # Initialize variables
 DATADIR=""
 BITCOIN_DIR=""
+EXTRA_ARGS=""
 
 # Parse arguments
 for arg in "$@"; do
@@ -13,9 +14,13 @@ for arg in "$@"; do
     -bitcoin_dir=*)
       BITCOIN_DIR="${arg#*=}"
       ;;
+    -*=*)
+      # Passed on to bitcoind, e.g. -dbcache=450 when several nodes share the memory
+      EXTRA_ARGS="$EXTRA_ARGS $arg"
+      ;;
     *)
       echo "Unknown argument: $arg"
-      echo "Usage: $0 -datadir=<path> -bitcoin_dir=<path>"
+      echo "Usage: $0 -datadir=<path> -bitcoin_dir=<path> [-option=value ...]"
       exit 1
       ;;
   esac
@@ -24,7 +29,7 @@ done
 # Validate arguments
 if [ -z "$DATADIR" ] || [ -z "$BITCOIN_DIR" ]; then
   echo "Error: both -datadir and -bitcoin_dir must be specified"
-  echo "Usage: $0 -datadir=<path> -bitcoin_dir=<path>"
+  echo "Usage: $0 -datadir=<path> -bitcoin_dir=<path> [-option=value ...]"
   exit 1
 fi
 
@@ -42,7 +47,8 @@ if [ ! -x "$BITCOIND_PATH" ]; then
 fi
 
 # Start bitcoind
-"$BITCOIND_PATH" -datadir="$DATADIR" -daemon
+# EXTRA_ARGS is left unquoted on purpose: one word per option
+"$BITCOIND_PATH" -datadir="$DATADIR" -daemon $EXTRA_ARGS
 
 echo "bitcoind started from $BITCOIND_PATH with datadir: $DATADIR"
 
@@ -1,5 +1,7 @@
 import os
 import sys
+import threading
+import time
 from pathlib import Path
 
 # Manually adding the project root to sys.path
@@ -8,89 +10,187 @@ project_root = str(Path(__file__).parent.parent)
 if project_root not in sys.path:
     sys.path.insert(0, project_root)
 
-from flask import Flask, render_template, request, redirect, url_for, flash
+# Cold start is timed from here on – before Flask and SQLAlchemy load (see startup.py)
+from meadow_web.startup import startup_timer
+
+from flask import Flask, render_template, request, redirect, url_for, flash, g
 from flask_login import current_user
 
-# Flask app needs to be created *before* we import things that depend on it
-app = Flask(__name__)
-
-# Config comes in after the app is made to dodge circular import issues
-from meadow_web.config import SECRET_KEY, SQLALCHEMY_DATABASE_URI, SQLALCHEMY_TRACK_MODIFICATIONS
-
-# Feed the app its secret keys and DB settings
-app.config['SECRET_KEY'] = SECRET_KEY
-app.config['SQLALCHEMY_DATABASE_URI'] = SQLALCHEMY_DATABASE_URI
-app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = SQLALCHEMY_TRACK_MODIFICATIONS
-
-# Import extensions after app exists – classic Flask sequencing
-from meadow_web.extensions import db, login_manager
-
-# Hook up SQLAlchemy and Flask-Login to the app
-db.init_app(app)
-login_manager.init_app(app)
-login_manager.login_view = 'auth.login'  # if not logged in, users get sent here
-
-# Model import needs app context (again, circular imports are lurking everywhere)
-with app.app_context():
-    from meadow_web.models import User
-
-    # Make sure the DB tables actually exist
-    db.create_all()
-
-# Same import-sequencing trick: blueprints come in after app is ready
-from meadow_web.routes.auth import auth_bp
-from meadow_web.routes.dashboard import dashboard_bp
-
-# Plug in the blueprints so Flask knows about our routes
-app.register_blueprint(auth_bp)
-app.register_blueprint(dashboard_bp)
-
-# Needed by Flask-Login to load users from DB sessions
-@login_manager.user_loader
-def load_user(user_id):
-    return User.query.get(int(user_id))
-
-# Makes some Tor-related info globally available in templates
-@app.context_processor
-def inject_tor_info():
-    tor_address = None
-    is_tor = False
-
-    # Try to read the onion address from the file (if it exists)
-    try:
-        with open('/var/lib/tor/hidden_service/hostname', 'r') as f:
-            tor_address = f.read().strip()
-    except (IOError, FileNotFoundError):
-        pass  # No big deal, just means we're not serving over Tor (probably)
-
-    # Now detect if current request came via Tor – multiple heuristics here:
-    if request.host and request.host.endswith('.onion'):
-        is_tor = True
-    elif 'X-Forwarded-Host' in request.headers and request.headers['X-Forwarded-Host'].endswith('.onion'):
-        is_tor = True
-    elif request.remote_addr and request.remote_addr.endswith('.onion'):  # meh, rare but included
-        is_tor = True
-    elif request.remote_addr in ('127.0.0.1', '::1') and 'Tor' in request.headers.get('User-Agent', ''):
-        is_tor = True
-
-    return {
-        'tor_address': tor_address,
-        'is_tor': is_tor,
-        'connection_type': 'Tor' if is_tor else 'Regular HTTP'
-    }
-
-# Default route – send logged-in users to their dashboard, others to login
-@app.route('/')
-def index():
-    if current_user.is_authenticated:
-        return redirect(url_for('dashboard.dashboard'))
-    return redirect(url_for('auth.login'))
+# App factory: importing this module is cheap, create_app() does the work. Everything
+# else is imported inside it, in the order Flask needs (config, extensions, models, blueprints).
+# gunicorn calls it as `meadow_web.app:create_app()`; `meadow_web.app.app` still works and
+# builds the app on first access.
+
+def create_app() -> Flask:
+    startup_timer.mark('imports')
+    app = Flask(__name__)
+
+    # In production nginx sits in front (over a unix socket), so the client address and
+    # scheme come from its X-Forwarded-* headers
+    from werkzeug.middleware.proxy_fix import ProxyFix
+    app.wsgi_app = ProxyFix(app.wsgi_app, x_for=1, x_proto=1)
+
+    # Templates link CSS/JS through asset_url(), which knows the fingerprinted builds
+    from meadow_web import assets
+    assets.init_app(app)
+
+    # Feed the app its secret keys and DB settings
+    from meadow_web.config import SECRET_KEY, SQLALCHEMY_DATABASE_URI, SQLALCHEMY_TRACK_MODIFICATIONS
+    app.config['SECRET_KEY'] = SECRET_KEY
+    app.config['SQLALCHEMY_DATABASE_URI'] = SQLALCHEMY_DATABASE_URI
+    app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = SQLALCHEMY_TRACK_MODIFICATIONS
+
+    # Hook up SQLAlchemy and Flask-Login to the app
+    from meadow_web.extensions import db, login_manager
+    db.init_app(app)
+    login_manager.init_app(app)
+    login_manager.login_view = 'auth.login'  # if not logged in, users get sent here
+
+    # Where does the time go? Template renders and SQL statements are timed for /metrics
+    from meadow_web import metrics
+    metrics.instrument_templates(app)
+
+    # Tables are only (re)checked when the DB's schema stamp is out of date
+    from meadow_web.models import ensure_schema, user_cache
+    with app.app_context():
+        metrics.instrument_engine(db.engine)
+        ensure_schema()
+    startup_timer.mark('database')
+
+    # Needed by Flask-Login on every request – answered from memory, see UserCache
+    @login_manager.user_loader
+    def load_user(user_id):
+        return user_cache.get_by_id(int(user_id))
+
+    from meadow_web.routes.auth import auth_bp
+    from meadow_web.routes.dashboard import dashboard_bp
+    from meadow_web.routes.metrics import metrics_bp
+
+    # Plug in the blueprints so Flask knows about our routes
+    app.register_blueprint(auth_bp)
+    app.register_blueprint(dashboard_bp)
+    app.register_blueprint(metrics_bp)
+    _register_hooks(app)
+    startup_timer.mark('routes')
+
+    _start_background_services()
+    startup_timer.mark('services')
+    startup_timer.ready()
+    return app
+
+
+def _register_hooks(app: Flask) -> None:
+    from meadow_web import metrics
+    from meadow_web.config import PROFILER_ENABLED
+
+    # Every request is timed, per endpoint
+    @app.before_request
+    def start_request_timer():
+        g.request_started = time.perf_counter()
+        g.meadow_db_queries = 0
+        if PROFILER_ENABLED and request.args.get('_profile') == '1' and current_user.is_authenticated:
+            from meadow_web.profiler import SamplingProfiler
+            g.profiler = SamplingProfiler(threading.get_ident()).start()
+
+    @app.after_request
+    def record_request_metrics(response):
+        if 'request_started' not in g:
+            return response  # an earlier before_request hook bailed out
+        endpoint = request.endpoint or 'unmatched'
+        # For SSE streams this is the time to the first byte, not the life of the stream
+        metrics.http_request_duration.observe(time.perf_counter() - g.request_started, endpoint=endpoint,
+                                              method=request.method, status=response.status_code)
+        metrics.http_request_db_queries.observe(g.meadow_db_queries, endpoint=endpoint)
+        if startup_timer.response_served(endpoint):
+            metrics.record_startup(startup_timer.report())
+
+        profiler = g.pop('profiler', None)
+        if profiler is not None:
+            profiler.stop()
+            path = profiler.save(endpoint)
+            if path:
+                response.headers['X-Meadow-Profile'] = path.name
+        return response
+
+    # Makes some Tor-related info globally available in templates
+    @app.context_processor
+    def inject_tor_info():
+        tor_address = None
+        is_tor = False
+
+        # Try to read the onion address from the file (if it exists)
+        try:
+            with open('/var/lib/tor/hidden_service/hostname', 'r') as f:
+                tor_address = f.read().strip()
+        except (IOError, FileNotFoundError):
+            pass  # No big deal, just means we're not serving over Tor (probably)
+
+        # Now detect if current request came via Tor – multiple heuristics here:
+        if request.host and request.host.endswith('.onion'):
+            is_tor = True
+        elif 'X-Forwarded-Host' in request.headers and request.headers['X-Forwarded-Host'].endswith('.onion'):
+            is_tor = True
+        elif request.remote_addr and request.remote_addr.endswith('.onion'):  # meh, rare but included
+            is_tor = True
+        elif request.remote_addr in ('127.0.0.1', '::1') and 'Tor' in request.headers.get('User-Agent', ''):
+            is_tor = True
+
+        return {
+            'tor_address': tor_address,
+            'is_tor': is_tor,
+            'connection_type': 'Tor' if is_tor else 'Regular HTTP'
+        }
+
+    # Default route – send logged-in users to their dashboard, others to login
+    @app.route('/')
+    def index():
+        if current_user.is_authenticated:
+            return redirect(url_for('dashboard.dashboard'))
+        return redirect(url_for('auth.login'))
+
+
+def _start_background_services() -> None:
+    # In supervisor mode bitcoind is our child, watched by its own thread
+    from meadow_web.config import BITCOIN_SUPERVISED
+    if BITCOIN_SUPERVISED:
+        from meadow_web.supervisor import supervisor
+        supervisor.start_thread()
+    # Extra nodes from the node registry (other chains) always have a supervisor each
+    from meadow_web.nodes import node_registry
+    node_registry.start()
+
+    # One background thread keeps the node status fresh for every client
+    from meadow_web.status_monitor import status_monitor
+    status_monitor.start()
+
+    # ...and another one records sync/resource history for the charts
+    from meadow_web.sampler import sampler
+    sampler.start()
+
+    # ...and one follows debug.log for the log viewer
+    from meadow_web.debug_log import debug_log
+    debug_log.start()
+
+    # ...and one listens for bitcoind's new block/transaction notifications (if pyzmq is around)
+    from meadow_web.zmq_bridge import zmq_bridge
+    zmq_bridge.start()
+
+
+def __getattr__(name):
+    # `from meadow_web.app import app` – built once, on first use
+    if name == 'app':
+        globals()['app'] = create_app()
+        return globals()['app']
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
 
 if __name__ == '__main__':
+    app = create_app()
+
     # One-time setup: print a message if there are no users yet
     with app.app_context():
-        from meadow_web.models import User
-        if not User.query.first():
+        from meadow_web.models import user_cache
+        if user_cache.get() is None:
             print("No users found. Please register the first user at /register")
 
     # Fire up the Flask server with some sane settings
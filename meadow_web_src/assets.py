@@ -0,0 +1,131 @@
+import gzip
+import hashlib
+import json
+import re
+import shutil
+import sys
+import logging
+from pathlib import Path
+from typing import Dict, Optional
+
+# Static asset pipeline.
+#
+# Build time (build_raspberrypi4_64.sh runs `python3 assets.py static/`, stdlib only,
+# so the host Python needs nothing extra): every .css/.js under static/ is minified,
+# written to static/dist/ under a name containing its content hash, and precompressed
+# next to it (.gz, plus .br when the brotli module is around). static/dist/manifest.json
+# maps "css/style.css" to "dist/css/style.<hash>.css".
+#
+# Run time: templates call asset_url('css/style.css'), which gives the fingerprinted URL
+# from the manifest, or the plain file when there is no build (development). nginx
+# serves /static/dist/ straight from disk with immutable cache headers – a changed file
+# gets a new name, so browsers never need to revalidate.
+
+logger = logging.getLogger(__name__)
+
+DIST_DIR = 'dist'
+MANIFEST_NAME = 'manifest.json'
+HASH_LENGTH = 10
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+try:
+    import rjsmin
+except ImportError:
+    rjsmin = None
+
+
+def minify_css(text: str) -> str:
+    text = re.sub(r'/\*.*?\*/', '', text, flags=re.S)
+    text = re.sub(r'\s+', ' ', text)
+    # Spaces before ':' are left alone – "a :hover" and "a:hover" are different selectors
+    text = re.sub(r'\s*([{};,>])\s*', r'\1', text)
+    text = re.sub(r':\s+', ':', text)
+    return text.replace(';}', '}').strip() + '\n'
+
+
+def minify_js(text: str) -> str:
+    if rjsmin is not None:
+        return rjsmin.jsmin(text) + '\n'
+    # Without rjsmin only the safe part: indentation, blank lines and whole-line comments.
+    # Line breaks stay (automatic semicolon insertion), and so does anything inside a
+    # multi-line template literal.
+    lines = []
+    in_template = False
+    for line in text.split('\n'):
+        if in_template:
+            lines.append(line)
+        else:
+            stripped = line.strip()
+            if stripped and not stripped.startswith('//'):
+                lines.append(stripped)
+        if line.count('`') % 2:
+            in_template = not in_template
+    return '\n'.join(lines) + '\n'
+
+
+MINIFIERS = {'.css': minify_css, '.js': minify_js}
+
+
+def build(static_dir: Path) -> Dict[str, str]:
+    # Rebuilds static/dist/ from scratch and returns the manifest
+    static_dir = Path(static_dir)
+    dist = static_dir / DIST_DIR
+    if dist.exists():
+        shutil.rmtree(dist)
+
+    manifest = {}
+    sources = sorted(path for path in static_dir.rglob('*')
+                     if path.suffix in MINIFIERS and dist not in path.parents)
+    for source in sources:
+        name = source.relative_to(static_dir).as_posix()
+        data = MINIFIERS[source.suffix](source.read_text(encoding='utf-8')).encode('utf-8')
+        digest = hashlib.sha256(data).hexdigest()[:HASH_LENGTH]
+
+        target = dist / source.relative_to(static_dir).with_name(f'{source.stem}.{digest}{source.suffix}')
+        target.parent.mkdir(parents=True, exist_ok=True)
+        target.write_bytes(data)
+        # mtime=0 keeps the .gz byte-identical between builds of the same content
+        target.with_name(target.name + '.gz').write_bytes(gzip.compress(data, compresslevel=9, mtime=0))
+        if brotli is not None:
+            target.with_name(target.name + '.br').write_bytes(brotli.compress(data, quality=11))
+
+        manifest[name] = target.relative_to(static_dir).as_posix()
+        print(f"{name} -> {manifest[name]} ({source.stat().st_size} -> {len(data)} bytes)")
+
+    (dist / MANIFEST_NAME).write_text(json.dumps(manifest, indent=2, sort_keys=True) + '\n')
+    return manifest
+
+
+def load_manifest(static_dir: Path) -> Dict[str, str]:
+    try:
+        return json.loads((Path(static_dir) / DIST_DIR / MANIFEST_NAME).read_text())
+    except FileNotFoundError:
+        return {}
+    except (OSError, ValueError) as e:
+        logger.error(f"Ignoring broken asset manifest: {e}")
+        return {}
+
+
+def init_app(app, manifest: Optional[Dict[str, str]] = None) -> None:
+    # Makes asset_url() available in templates
+    from flask import url_for
+
+    if manifest is None:
+        manifest = load_manifest(app.static_folder)
+    if manifest:
+        logger.info(f"Serving {len(manifest)} fingerprinted static assets")
+
+    def asset_url(filename: str) -> str:
+        return url_for('static', filename=manifest.get(filename, filename))
+
+    app.jinja_env.globals['asset_url'] = asset_url
+
+
+if __name__ == '__main__':
+    if len(sys.argv) != 2:
+        sys.exit(f"Usage: {sys.argv[0]} <static dir>")
+    build(Path(sys.argv[1]))
@@ -0,0 +1,269 @@
+import hashlib
+import json
+import re
+import struct
+import threading
+import time
+import logging
+from functools import lru_cache
+from pathlib import Path
+from typing import Any, Dict, List, NamedTuple, Optional, Tuple
+from meadow_web.config import (
+    ASSUMEUTXO_SNAPSHOTS_FILE,
+    ASSUMEUTXO_SEARCH_DIRS,
+    ASSUMEUTXO_LOAD_TIMEOUT
+)
+from meadow_web.bitcoin_rpc import bitcoin_rpc, BitcoinRPCError, RPCError, RPCTimeoutError
+from meadow_web.debug_log import debug_log
+from meadow_web.node_info import node_info_cache
+
+logger = logging.getLogger(__name__)
+
+# AssumeUTXO fast bootstrap: load a UTXO snapshot into bitcoind with loadtxoutset.
+#
+# The snapshot file (utxo-840000.dat and the like, copied to the data disk or on a USB
+# stick) starts with a small header naming its network and base block. Before handing
+# it to bitcoind we check that header against the snapshots bitcoind accepts – listed
+# in ASSUMEUTXO_SNAPSHOTS_FILE, not in code – along with the file size and, where the
+# data file knows it, the SHA256 of the whole file. bitcoind itself checks the UTXO set
+# hash once everything is loaded.
+#
+# loadtxoutset blocks until every coin is in the chainstate, which takes hours on a Pi.
+# It runs on its own thread while the job follows bitcoind's "[snapshot]" log lines for
+# progress. Afterwards bitcoind has two chainstates: the snapshot one it syncs to the tip
+# from, and the background one validating the blocks below the snapshot.
+
+# "utxo" 0xff, then a uint16 version, the network magic, the base block hash and a uint64 coin count
+_HEADER = struct.Struct('<5sH4s32sQ')
+_MAGIC = b'utxo\xff'
+_SUPPORTED_VERSIONS = (2,)
+
+# Even the smallest coin takes a few bytes, so a file below this is cut short
+_MIN_BYTES_PER_COIN = 4
+
+_HASH_CHUNK_SIZE = 1024 * 1024
+_PROGRESS_INTERVAL = 1.0
+
+# "[snapshot] 12000000 coins loaded (6.78%, 1032 MB)"
+_COINS_LOADED = re.compile(r'\[snapshot\] (\d+) coins loaded \(([\d.]+)%')
+
+
+class SnapshotHeader(NamedTuple):
+    version: int
+    network_magic: str
+    blockhash: str
+    coins: int
+
+
+def read_header(path: Path) -> Optional[SnapshotHeader]:
+    # The snapshot metadata at the start of `path`, or None if it isn't a UTXO snapshot
+    try:
+        with open(path, 'rb') as f:
+            raw = f.read(_HEADER.size)
+    except OSError:
+        return None
+    if len(raw) != _HEADER.size:
+        return None
+    magic, version, network_magic, blockhash, coins = _HEADER.unpack(raw)
+    if magic != _MAGIC:
+        return None
+    # Block hashes are stored the other way round from how RPC shows them
+    return SnapshotHeader(version, network_magic.hex(), blockhash[::-1].hex(), coins)
+
+
+@lru_cache(maxsize=1)
+def load_known_snapshots(path: Path = ASSUMEUTXO_SNAPSHOTS_FILE) -> Dict[str, Dict[str, Any]]:
+    # {blockhash: snapshot} for every network in the data file
+    try:
+        with open(path, 'r') as f:
+            data = json.load(f)
+    except (OSError, ValueError) as e:
+        logger.error(f"Failed to read the AssumeUTXO snapshot list {path}: {str(e)}")
+        return {}
+
+    known = {}
+    for network, details in data.get('networks', {}).items():
+        for snapshot in details.get('snapshots', []):
+            known[snapshot['blockhash']] = dict(snapshot, network=network, magic=details['magic'])
+    return known
+
+
+def known_snapshot(blockhash: Optional[str]) -> Optional[Dict[str, Any]]:
+    return load_known_snapshots().get(blockhash) if blockhash else None
+
+
+def _version_number(version: str) -> int:
+    # "28.0" -> 280000, the way getnetworkinfo reports versions
+    parts = [int(part) for part in version.split('.')] + [0, 0]
+    return parts[0] * 10000 + parts[1] * 100 + parts[2]
+
+
+def check_file(path: Path) -> Tuple[Optional[Dict[str, Any]], Optional[str]]:
+    # (the known snapshot `path` is, None) – or (None, what's wrong with it)
+    header = read_header(path)
+    if header is None:
+        return None, "Not a UTXO snapshot file"
+    if header.version not in _SUPPORTED_VERSIONS:
+        return None, f"Unsupported snapshot format version {header.version}"
+
+    snapshot = known_snapshot(header.blockhash)
+    if snapshot is None or snapshot['magic'] != header.network_magic:
+        return None, f"Snapshot at block {header.blockhash} isn't one bitcoind accepts"
+
+    try:
+        size = path.stat().st_size
+    except OSError as e:
+        return None, f"Can't read {path}: {str(e)}"
+    if snapshot.get('file_size') is not None:
+        if size != snapshot['file_size']:
+            return None, f"File is {size:,} bytes, expected {snapshot['file_size']:,} – incomplete copy?"
+    elif size < _HEADER.size + header.coins * _MIN_BYTES_PER_COIN:
+        return None, f"File is too small for {header.coins:,} coins – incomplete copy?"
+
+    return dict(snapshot, coins=header.coins, size=size), None
+
+
+def _search(folder: Path) -> List[Path]:
+    # .dat files in `folder` and its immediate subfolders
+    found = []
+    try:
+        entries = sorted(folder.iterdir())
+    except OSError:
+        return found
+    for entry in entries:
+        try:
+            if entry.is_file() and entry.suffix == '.dat':
+                found.append(entry)
+            elif entry.is_dir():
+                found.extend(sorted(child for child in entry.glob('*.dat') if child.is_file()))
+        except OSError:
+            continue
+    return found
+
+
+def find_snapshot_files(search_dirs: List[Path] = ASSUMEUTXO_SEARCH_DIRS) -> List[Dict[str, Any]]:
+    # Every UTXO snapshot lying around, usable or not (with the reason it isn't)
+    files = []
+    for folder in search_dirs:
+        for path in _search(Path(folder)):
+            if read_header(path) is None:
+                continue  # peers.dat, mempool.dat, ... – not ours
+            snapshot, problem = check_file(path)
+            files.append({
+                'path': str(path),
+                'height': snapshot['height'] if snapshot else None,
+                'network': snapshot['network'] if snapshot else None,
+                'coins': snapshot['coins'] if snapshot else None,
+                'size': snapshot['size'] if snapshot else None,
+                'usable': snapshot is not None,
+                'problem': problem
+            })
+    return files
+
+
+def _verify_sha256(job, path: Path, expected: str, size: int) -> bool:
+    job.update(phase='verifying', bytes_done=0, bytes_total=size, message="Checking the snapshot's SHA256")
+    sha256 = hashlib.sha256()
+    done, reported = 0, time.monotonic()
+    with open(path, 'rb') as f:
+        while True:
+            chunk = f.read(_HASH_CHUNK_SIZE)
+            if not chunk:
+                break
+            sha256.update(chunk)
+            done += len(chunk)
+            if time.monotonic() - reported >= _PROGRESS_INTERVAL:
+                job.update(bytes_done=done)
+                reported = time.monotonic()
+    job.update(bytes_done=done)
+    return sha256.hexdigest() == expected.lower()
+
+
+def _preflight(snapshot: Dict[str, Any]) -> Optional[str]:
+    # Why bitcoind can't take this snapshot right now, if it can't
+    network = bitcoin_rpc.call('getnetworkinfo')
+    if network.get('version', 0) < _version_number(snapshot['min_version']):
+        return f"Loading this snapshot needs Bitcoin Core {snapshot['min_version']} or newer"
+
+    chain = bitcoin_rpc.call('getblockchaininfo')
+    if chain.get('chain') != snapshot['network']:
+        return f"The node runs on {chain.get('chain')}, the snapshot is for {snapshot['network']}"
+    if chain.get('blocks', 0) >= snapshot['height']:
+        return f"The node is already past block {snapshot['height']:,} – a snapshot won't speed it up"
+    if chain.get('headers', 0) < snapshot['height']:
+        return (f"The node only knows headers up to {chain.get('headers', 0):,}; wait until it has "
+                f"block {snapshot['height']:,}'s header (a few minutes after the start)")
+
+    try:
+        chainstates = bitcoin_rpc.call('getchainstates')
+    except RPCError:
+        chainstates = {}
+    if len(chainstates.get('chainstates', [])) > 1:
+        return "A snapshot is already loaded"
+    return None
+
+
+def _follow_log(job, coins: int, done: threading.Event) -> None:
+    # Turns bitcoind's "[snapshot]" log lines into job progress until `done` is set
+    status = debug_log.status()
+    offset, generation = status['size'], status['generation']
+    while not done.is_set():
+        debug_log.wait_for_change(offset, generation, 2.0)
+        lines, offset, generation = debug_log.read_from(offset, generation)
+        for line in lines:
+            text = line['text']
+            if '[snapshot]' not in text:
+                continue
+            match = _COINS_LOADED.search(text)
+            if match:
+                loaded = int(match.group(1))
+                job.update(bytes_done=loaded, message=f"{loaded:,} of {coins:,} coins loaded ({match.group(2)}%)")
+            else:
+                job.update(message=text.split('[snapshot]', 1)[1].strip())
+
+
+def load_snapshot(job, path: str) -> Tuple[bool, str]:
+    # Checks the snapshot at `path` and loads it into the running node.
+    # Meant to run as a background job (kind 'snapshot')
+    path = Path(path)
+    job.update(phase='checking', message=f"Checking {path.name}")
+    snapshot, problem = check_file(path)
+    if snapshot is None:
+        return False, problem
+
+    if snapshot.get('file_sha256'):
+        try:
+            if not _verify_sha256(job, path, snapshot['file_sha256'], snapshot['size']):
+                return False, "The snapshot's SHA256 doesn't match – the file is damaged or not the published one"
+        except OSError as e:
+            return False, f"Failed to read {path}: {str(e)}"
+
+    try:
+        problem = _preflight(snapshot)
+    except BitcoinRPCError as e:
+        return False, f"Can't reach the node: {str(e)}"
+    if problem:
+        return False, problem
+
+    job.update(phase='loading', bytes_done=0, bytes_total=snapshot['coins'],
+               message=f"Loading {snapshot['coins']:,} coins from the block {snapshot['height']:,} snapshot")
+    done = threading.Event()
+    follower = threading.Thread(target=_follow_log, args=(job, snapshot['coins'], done),
+                                name=f'snapshot-log-{job.id}', daemon=True)
+    follower.start()
+    try:
+        result = bitcoin_rpc.call('loadtxoutset', str(path), timeout=ASSUMEUTXO_LOAD_TIMEOUT)
+    except RPCTimeoutError:
+        return False, (f"bitcoind didn't finish within {ASSUMEUTXO_LOAD_TIMEOUT // 3600}h; "
+                       "it may still be loading – check the node log")
+    except RPCError as e:
+        return False, f"bitcoind refused the snapshot: {e.message}"
+    except BitcoinRPCError as e:
+        return False, f"Lost the node while loading the snapshot: {str(e)}"
+    finally:
+        done.set()
+        follower.join(5)
+        node_info_cache.invalidate('blockchain', 'chainstates')
+
+    return True, (f"Loaded {result.get('coins_loaded', snapshot['coins']):,} coins. The node now syncs from "
+                  f"block {result.get('base_height', snapshot['height']):,}; older blocks are checked in the background")
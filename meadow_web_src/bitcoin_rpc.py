@@ -0,0 +1,205 @@
+import base64
+import http.client
+import itertools
+import json
+import logging
+import queue
+import socket
+import threading
+from pathlib import Path
+from typing import Any, List, Optional, Sequence, Tuple
+from meadow_web.config import (
+    BITCOIN_DATA_DIR,
+    BITCOIN_RPC_HOST,
+    BITCOIN_RPC_PORT,
+    BITCOIN_RPC_TIMEOUT,
+    BITCOIN_RPC_POOL_SIZE,
+    BITCOIN_RPC_USER,
+    BITCOIN_RPC_PASSWORD
+)
+
+logger = logging.getLogger(__name__)
+
+# bitcoind's "I'm up, but still loading" error code (block index, wallet, ...)
+RPC_IN_WARMUP = -28
+# Method not found – an older bitcoind that doesn't have the call yet
+RPC_METHOD_NOT_FOUND = -32601
+
+
+class BitcoinRPCError(Exception):
+    # Base class for everything that can go wrong talking to bitcoind
+    pass
+
+
+class RPCConnectionError(BitcoinRPCError):
+    # bitcoind isn't reachable (not running, wrong port, connection dropped)
+    pass
+
+
+class RPCTimeoutError(RPCConnectionError):
+    pass
+
+
+class RPCAuthError(BitcoinRPCError):
+    # Missing/stale .cookie or wrong rpcuser/rpcpassword
+    pass
+
+
+class RPCError(BitcoinRPCError):
+    # bitcoind answered, but with a JSON-RPC error
+    def __init__(self, code: int, message: str, method: Optional[str] = None):
+        super().__init__(f"{method or 'RPC'} failed ({code}): {message}")
+        self.code = code
+        self.message = message
+        self.method = method
+
+
+class BitcoinRPC:
+    # JSON-RPC client for bitcoind with a small pool of keep-alive connections.
+    #
+    # Authenticates with the .cookie file bitcoind writes into its data directory
+    # (re-read whenever bitcoind rejects it, since it changes on every restart),
+    # unless an explicit rpcuser/rpcpassword is configured.
+
+    def __init__(self, data_dir: Path, host: str = BITCOIN_RPC_HOST, port: int = BITCOIN_RPC_PORT,
+                 timeout: float = BITCOIN_RPC_TIMEOUT, pool_size: int = BITCOIN_RPC_POOL_SIZE,
+                 user: Optional[str] = BITCOIN_RPC_USER, password: Optional[str] = BITCOIN_RPC_PASSWORD):
+        self.data_dir = Path(data_dir)
+        self.host = host
+        self.port = port
+        self.timeout = timeout
+        self._pool: 'queue.LifoQueue[http.client.HTTPConnection]' = queue.LifoQueue(maxsize=pool_size)
+        self._ids = itertools.count(1)
+        self._auth_lock = threading.Lock()
+        self._auth_header: Optional[str] = None
+        if user and password:
+            self._auth_header = self._basic_auth(f'{user}:{password}')
+            self._static_auth = True
+        else:
+            self._static_auth = False
+
+    @property
+    def cookie_path(self) -> Path:
+        return self.data_dir / '.cookie'
+
+    @staticmethod
+    def _basic_auth(credentials: str) -> str:
+        return 'Basic ' + base64.b64encode(credentials.encode()).decode()
+
+    def _get_auth(self, reload: bool = False) -> str:
+        with self._auth_lock:
+            if self._auth_header is None or (reload and not self._static_auth):
+                try:
+                    cookie = self.cookie_path.read_text().strip()
+                except OSError as e:
+                    raise RPCAuthError(f"Can't read RPC cookie {self.cookie_path}: {e}")
+                self._auth_header = self._basic_auth(cookie)
+            return self._auth_header
+
+    # --- connection pool ---
+
+    def _acquire(self) -> Tuple[http.client.HTTPConnection, bool]:
+        # Returns (connection, reused) – reused connections may have been closed by bitcoind
+        try:
+            return self._pool.get_nowait(), True
+        except queue.Empty:
+            return http.client.HTTPConnection(self.host, self.port, timeout=self.timeout), False
+
+    def _release(self, conn: http.client.HTTPConnection) -> None:
+        try:
+            self._pool.put_nowait(conn)
+        except queue.Full:
+            conn.close()
+
+    def close(self) -> None:
+        while True:
+            try:
+                self._pool.get_nowait().close()
+            except queue.Empty:
+                return
+
+    # --- requests ---
+
+    def _post(self, payload: Any, timeout: Optional[float]) -> Tuple[int, Any]:
+        body = json.dumps(payload)
+        timeout = self.timeout if timeout is None else timeout
+
+        for attempt in range(3):
+            conn, reused = self._acquire()
+            conn.timeout = timeout
+            if conn.sock is not None:
+                conn.sock.settimeout(timeout)
+            try:
+                conn.request('POST', '/', body=body, headers={
+                    'Authorization': self._get_auth(reload=attempt > 0),
+                    'Content-Type': 'application/json'
+                })
+                response = conn.getresponse()
+                data = response.read()
+            except socket.timeout as e:
+                conn.close()
+                raise RPCTimeoutError(f"bitcoind did not answer within {timeout}s") from e
+            except (ConnectionError, http.client.HTTPException, OSError) as e:
+                conn.close()
+                if reused:
+                    continue  # stale keep-alive connection – try again on a fresh one
+                raise RPCConnectionError(f"Can't reach bitcoind at {self.host}:{self.port}: {e}") from e
+
+            if response.status in (401, 403):
+                conn.close()
+                if attempt == 0 and not self._static_auth:
+                    continue  # cookie rotated when bitcoind restarted – re-read it once
+                raise RPCAuthError(f"bitcoind rejected our credentials (HTTP {response.status})")
+
+            if response.will_close:
+                conn.close()
+            else:
+                self._release(conn)
+
+            try:
+                return response.status, json.loads(data)
+            except ValueError:
+                raise BitcoinRPCError(f"Unexpected response from bitcoind (HTTP {response.status}): {data[:200]!r}")
+
+        raise RPCConnectionError(f"Can't reach bitcoind at {self.host}:{self.port}")
+
+    @staticmethod
+    def _result(method: str, reply: Any) -> Any:
+        if not isinstance(reply, dict):
+            raise BitcoinRPCError(f"Malformed reply to {method}: {reply!r}")
+        error = reply.get('error')
+        if error:
+            raise RPCError(error.get('code', 0), error.get('message', ''), method)
+        return reply.get('result')
+
+    def call(self, method: str, *params: Any, timeout: Optional[float] = None) -> Any:
+        # One RPC call; raises RPCError if bitcoind returns an error
+        payload = {'jsonrpc': '1.0', 'id': next(self._ids), 'method': method, 'params': list(params)}
+        _, reply = self._post(payload, timeout)
+        return self._result(method, reply)
+
+    def batch(self, calls: Sequence[Tuple[str, Sequence[Any]]], timeout: Optional[float] = None) -> List[Any]:
+        # Several calls in one round trip. Returns results in order; a failed call's slot
+        # holds its RPCError instead of raising, so one bad call doesn't hide the rest.
+        if not calls:
+            return []
+        ids = [next(self._ids) for _ in calls]
+        payload = [{'jsonrpc': '1.0', 'id': call_id, 'method': method, 'params': list(params)}
+                   for call_id, (method, params) in zip(ids, calls)]
+        _, replies = self._post(payload, timeout)
+        if not isinstance(replies, list):
+            # bitcoind answers a batch with a single error object if it can't parse it at all
+            raise BitcoinRPCError(f"Malformed batch reply: {replies!r}")
+
+        by_id = {reply.get('id'): reply for reply in replies if isinstance(reply, dict)}
+        results = []
+        for call_id, (method, _) in zip(ids, calls):
+            try:
+                results.append(self._result(method, by_id.get(call_id)))
+            except BitcoinRPCError as e:
+                results.append(e)
+        return results
+
+
+# Shared client for the node this web app manages
+bitcoin_rpc = BitcoinRPC(BITCOIN_DATA_DIR)
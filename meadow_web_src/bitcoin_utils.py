@@ -1,10 +1,25 @@
 import os
+import signal
 import subprocess
 import logging
 import time
-from pathlib import Path
-from typing import Tuple, Optional
-from meadow_web.config import BITCOIN_INSTALL_DIR, BITCOIN_DATA_DIR, SCRIPTS_DIR, BITCOIN_INSTALL_URL
+from typing import List, Optional, Tuple
+from meadow_web.config import (
+    BITCOIN_INSTALL_DIR,
+    BITCOIN_DATA_DIR,
+    SCRIPTS_DIR,
+    BITCOIN_INSTALL_URL,
+    BITCOIN_START_TIMEOUT,
+    BITCOIN_STOP_TIMEOUT,
+    BITCOIN_STOP_KILL
+)
+from meadow_web.bitcoin_rpc import BitcoinRPCError, RPCError, RPC_IN_WARMUP
+from meadow_web.conf_tuner import clear_restart_required
+from meadow_web.jobs import job_registry
+from meadow_web.metrics import run_subprocess
+from meadow_web.nodes import Node, node_registry
+from meadow_web.process_probe import bitcoind_probe, ExitWatcher
+from meadow_web.version_store import version_store
 
 logger = logging.getLogger(__name__)
 
@@ -13,228 +28,228 @@ def is_bitcoin_installed() -> bool:
     bitcoind_path = BITCOIN_INSTALL_DIR / 'bin' / 'bitcoind'
     return bitcoind_path.exists() and bitcoind_path.is_file()
 
-def is_installation_in_progress() -> bool:
-    # This checks if a Bitcoin install is already happening, using a lock file
-    lock_file = Path("/tmp/bitcoin_install.lock")
-    
-    if lock_file.exists():
-        try:
-            # Check if the installer process is really running
-            result = subprocess.run(
-                ['pgrep', '-f', 'install-bitcoin.sh'],
-                stdout=subprocess.PIPE,
-                stderr=subprocess.PIPE,
-                text=True
-            )
-            process_running = result.returncode == 0 and bool(result.stdout.strip())
-
-            if not process_running:
-                # Stale lock file – nuke it
-                try:
-                    lock_file.unlink()
-                    logger.info("Removed stale lock file as installation process is not running")
-                    return False
-                except Exception as e:
-                    logger.error(f"Failed to remove stale lock file: {e}")
-                    # Still mark it as 'in progress' to play it safe
-                    return True
-            return True
-        except Exception as e:
-            logger.error(f"Error checking installation process: {str(e)}")
-            return True  # better safe than sorry
-    return False
-
-def mark_installation_started() -> None:
-    # Drop a lock file to say "hands off, I'm installing Bitcoin"
+def get_bitcoin_versions() -> dict:
+    # Which Bitcoin Core release is active, and which ones are ready to switch to
+    return {
+        'active_version': version_store.active_version(),
+        'installed_versions': version_store.installed_versions()
+    }
+
+def activate_bitcoin_version(version: str) -> Tuple[bool, str]:
+    # Upgrade/rollback: flips the install symlink to another installed release.
+    # A running node keeps using its binary until it is restarted.
+    if is_installation_in_progress():
+        return False, "Can't switch versions while an installation is running"
     try:
-        with open("/tmp/bitcoin_install.lock", 'w') as f:
-            f.write(str(time.time()))
-        logger.info("Marked Bitcoin installation as started")
-    except Exception as e:
-        logger.error(f"Failed to mark installation as started: {str(e)}")
+        version_store.activate(version)
+    except ValueError as e:
+        return False, str(e)
+    except OSError as e:
+        error_msg = f"Failed to switch to Bitcoin Core {version}: {str(e)}"
+        logger.error(error_msg, exc_info=True)
+        return False, error_msg
 
-def mark_installation_completed() -> None:
-    # Remove the lock file to show we're done installing
-    try:
-        lock_file = Path("/tmp/bitcoin_install.lock")
-        if lock_file.exists():
-            lock_file.unlink()
-            logger.info("Marked Bitcoin installation as completed")
-    except Exception as e:
-        logger.error(f"Failed to mark installation as completed: {str(e)}")
+    if is_bitcoin_running():
+        return True, f"Switched to Bitcoin Core {version}. Restart the node to use it."
+    return True, f"Switched to Bitcoin Core {version}"
 
-def is_bitcoin_running() -> bool:
-    # Looks for the 'bitcoind' process in the system process list
-    try:
-        result = subprocess.run(
-            ['ps', 'aux'],
-            stdout=subprocess.PIPE,
-            stderr=subprocess.PIPE,
-            text=True
-        )
-        if result.returncode != 0:
-            logger.error(f"Failed to get process list: {result.stderr}")
-            return False
-
-        for line in result.stdout.splitlines():
-            if 'bitcoind' in line and not 'grep' in line:
-                logger.debug(f"Found bitcoind process: {line.strip()}")
-                return True
+def is_installation_in_progress() -> bool:
+    # The job registry knows exactly whether an install job is running – no lock files
+    return job_registry.active('install') is not None
 
-        logger.debug("No bitcoind process found")
-        return False
+def is_bitcoin_running(max_age: Optional[float] = None) -> bool:
+    # Asks the shared process probe (pidfile + /proc, cached for a couple of seconds)
+    # Pass max_age=0 when you need a fresh answer rather than the cached one
+    try:
+        return bitcoind_probe.is_running(max_age)
     except Exception as e:
         logger.error(f"Error checking if Bitcoin is running: {str(e)}")
         return False
 
-def stop_bitcoin_node() -> Tuple[bool, str]:
-    # Gracefully stops the node using a script – no 'kill -9' brutality
-    script_path = SCRIPTS_DIR / 'stop-bitcoind.sh'
+def is_node_operation_in_progress() -> bool:
+    # Start and stop of the primary node share one job kind, so they can never overlap –
+    # this is for the jobs (snapshot load, datadir export/import) that must not run alongside
+    return job_registry.active('node') is not None
 
-    if not script_path.exists() or not os.access(script_path, os.X_OK):
-        return False, "Stop script missing or not executable"
+def _no_progress(**kwargs) -> None:
+    pass
 
+def _request_stop(node: Node, pid: int) -> Optional[str]:
+    # RPC `stop`, or SIGTERM if RPC is unreachable – both take bitcoind's clean
+    # shutdown path. Returns an error message if neither could be sent.
     try:
-        if not is_bitcoin_running():
-            return True, "Bitcoin node is not running"
-
-        cmd = [
-            str(script_path),
-            f"-datadir={BITCOIN_DATA_DIR}",
-            f"-bitcoin_dir={BITCOIN_INSTALL_DIR}"
-        ]
-
-        logger.info(f"Stopping Bitcoin node with command: {' '.join(cmd)}")
-
-        result = subprocess.run(
-            cmd,
-            stdout=subprocess.PIPE,
-            stderr=subprocess.PIPE,
-            text=True,
-            timeout=60
-        )
-
-        if result.stdout:
-            logger.info(f"Stop script stdout: {result.stdout}")
-        if result.stderr:
-            logger.error(f"Stop script stderr: {result.stderr}")
+        node.rpc.call('stop', timeout=30)
+        return None
+    except BitcoinRPCError as e:
+        logger.warning(f"RPC stop failed ({str(e)}), sending SIGTERM to PID {pid}")
+    try:
+        os.kill(pid, signal.SIGTERM)
+    except ProcessLookupError:
+        pass
+    except OSError as e:
+        return f"Failed to stop Bitcoin node: {str(e)}"
+    return None
+
+def stop_bitcoin_node(job=None, node: Optional[Node] = None) -> Tuple[bool, str]:
+    # Asks bitcoind to shut down (over RPC, or via the supervisor when it owns the
+    # process) and returns the moment the process is gone. `node` defaults to the
+    # primary one (see nodes.py).
+    # Meant to run as a background job; `job` (optional) gets phase/message updates.
+    node = node or node_registry.primary
+    report = job.update if job else _no_progress
+    report(phase='stopping', message="Looking for bitcoind")
+
+    pid = node.probe.get_pid(max_age=0)
+    if pid is None:
+        return True, "Bitcoin node is not running"
+
+    # Watch the process before asking it to stop, so its exit can't slip past us
+    with ExitWatcher(pid) as watcher:
+        report(message="Asking bitcoind to shut down")
+        if node.supervisor is not None:
+            # The supervisor owns the process; it sends SIGTERM and won't restart it
+            node.supervisor.stop()
+        else:
+            error_msg = _request_stop(node, pid)
+            if error_msg:
+                return False, error_msg
+
+        started = time.monotonic()
+        deadline = started + BITCOIN_STOP_TIMEOUT
+        while not watcher.wait(min(5.0, max(deadline - time.monotonic(), 0))):
+            elapsed = time.monotonic() - started
+            if elapsed >= BITCOIN_STOP_TIMEOUT:
+                break
+            report(message=f"Writing the UTXO cache to disk ({int(elapsed)}s)")
+        else:
+            node.changed()
+            logger.info(f"Bitcoin node {node.name} stopped after {time.monotonic() - started:.1f}s")
+            return True, "Bitcoin node stopped successfully"
 
-        # Wait and confirm it really shut down
-        for _ in range(30):  # check every 2 seconds, for 1 minute
-            if not is_bitcoin_running():
-                logger.info("Bitcoin node stopped successfully")
-                return True, "Bitcoin node stopped successfully"
-            time.sleep(2)
+        if not BITCOIN_STOP_KILL:
+            return False, f"bitcoind is still shutting down after {BITCOIN_STOP_TIMEOUT}s"
 
-        return False, "Failed to stop bitcoind within timeout (still running)"
-    except Exception as e:
-        error_msg = f"Error stopping Bitcoin node: {str(e)}"
-        logger.error(error_msg, exc_info=True)
-        return False, error_msg
-
-def start_bitcoin_node() -> Tuple[bool, str]:
-    # Fires up the node using the designated shell script
+        logger.error(f"bitcoind still running after {BITCOIN_STOP_TIMEOUT}s, killing PID {pid}")
+        try:
+            os.kill(pid, signal.SIGKILL)
+        except ProcessLookupError:
+            pass
+        watcher.wait(10)
+        node.changed()
+        return False, "bitcoind did not shut down in time and was killed"
+
+def _launch_with_script(node: Node, args: List[str]) -> Optional[str]:
+    # Classic mode: the start script runs `bitcoind -daemon` (plus `args`). Returns an error message on failure.
     script_path = SCRIPTS_DIR / 'start-bitcoind.sh'
-
     if not script_path.exists() or not os.access(script_path, os.X_OK):
-        return False, "Start script missing or not executable"
+        return "Start script missing or not executable"
 
     try:
         cmd = [
             str(script_path),
-            f"-datadir={BITCOIN_DATA_DIR}",
+            f"-datadir={node.spec.data_dir}",
             f"-bitcoin_dir={BITCOIN_INSTALL_DIR}"
-        ]
+        ] + args
 
         logger.info(f"Starting Bitcoin node with command: {' '.join(cmd)}")
 
-        # Launch script in background so we don’t block
-        process = subprocess.Popen(
+        # The script returns as soon as bitcoind has daemonized
+        result = run_subprocess(
+            'start-bitcoind',
             cmd,
             stdout=subprocess.PIPE,
             stderr=subprocess.PIPE,
             text=True,
+            timeout=60,
             start_new_session=True
         )
-
-        if process.poll() is None:
-            logger.info("Bitcoin node started successfully")
-            return True, "Bitcoin node started successfully"
-        else:
-            _, stderr = process.communicate()
-            error_msg = f"Failed to start Bitcoin node: {stderr}"
+        if result.returncode != 0:
+            error_msg = f"Failed to start Bitcoin node: {(result.stderr or result.stdout).strip()}"
             logger.error(error_msg)
-            return False, error_msg
-
-    except Exception as e:
+            return error_msg
+    except (OSError, subprocess.SubprocessError) as e:
         error_msg = f"Unexpected error while starting Bitcoin node: {str(e)}"
         logger.error(error_msg, exc_info=True)
+        return error_msg
+    return None
+
+def _startup_failure(node: Node) -> Optional[str]:
+    # Why a starting node is gone, if it is
+    if node.supervisor is not None:
+        state = node.supervisor.state()
+        if state['state'] == 'running':
+            return None
+        last_exit = state['last_exit'] or {}
+        details = last_exit.get('stderr') or last_exit.get('error') or 'check debug.log in the data directory'
+        return f"bitcoind exited during startup: {details}"
+    if not node.probe.is_running(max_age=0):
+        return "bitcoind exited during startup – check debug.log in the data directory"
+    return None
+
+def start_bitcoin_node(job=None, node: Optional[Node] = None) -> Tuple[bool, str]:
+    # Launches bitcoind (start script, or the supervisor when it owns the process), then
+    # waits until RPC actually answers – a live process that is still loading its block
+    # index doesn't count as running yet. `node` defaults to the primary one.
+    # Meant to run as a background job; `job` (optional) gets phase/message updates.
+    node = node or node_registry.primary
+    report = job.update if job else _no_progress
+    report(phase='starting', message="Launching bitcoind")
+
+    if node.probe.is_running(max_age=0):
+        return True, "Bitcoin node is already running"
+
+    # Its part of dbcache/maxmempool next to the nodes already running
+    memory, error_msg = node_registry.memory_share(node)
+    if error_msg:
         return False, error_msg
-
-def install_bitcoin() -> Tuple[bool, str]:
-    # Runs the full installer script with all required args
-    script_path = SCRIPTS_DIR / 'install-bitcoin.sh'
-
-    if not script_path.exists():
-        error_msg = f"Installation script not found at {script_path}"
-        logger.error(error_msg)
-        return False, error_msg
-
-    if not script_path.is_file():
-        error_msg = f"Installation path is not a file: {script_path}"
-        logger.error(error_msg)
-        return False, error_msg
-
-    if not os.access(script_path, os.X_OK):
-        error_msg = f"Installation script is not executable: {script_path}"
-        logger.error(error_msg)
-        return False, error_msg
-
-    try:
-        mark_installation_started()
-
-        # Ensure the data dir exists before we proceed
-        logger.info(f"Ensuring data directory exists: {BITCOIN_DATA_DIR}")
-        BITCOIN_DATA_DIR.mkdir(parents=True, exist_ok=True)
-
-        cmd = [
-            str(script_path),
-            f"--url={BITCOIN_INSTALL_URL}",
-            f"--dest={BITCOIN_INSTALL_DIR}",
-            f"--data_dir_dest={BITCOIN_DATA_DIR}"
-        ]
-
-        logger.info(f"Executing installation command: {' '.join(cmd)}")
-        result = subprocess.run(
-            cmd,
-            capture_output=True,
-            text=True,
-            timeout=1200  # 20 mins max
-        )
-
-        mark_installation_completed()
-
-        logger.info(f"Installation stdout: {result.stdout}")
-        if result.stderr:
-            logger.error(f"Installation stderr: {result.stderr}")
-
-        if result.returncode == 0:
-            success_msg = f"Bitcoin installed successfully to {BITCOIN_INSTALL_DIR}"
-            logger.info(success_msg)
-            return True, success_msg
-        else:
-            error_msg = f"Installation failed with return code {result.returncode}. Error: {result.stderr or 'No error output'}"
-            logger.error(error_msg)
+    args = node.launch_args(memory)
+    if node.supervisor is not None:
+        try:
+            # An extra node's data dir is created on its first start
+            node.spec.data_dir.mkdir(parents=True, exist_ok=True)
+        except OSError as e:
+            return False, f"Can't create the data directory {node.spec.data_dir}: {str(e)}"
+        node.supervisor.extra_args = args
+        node.supervisor.start_thread()
+        node.supervisor.start()
+    else:
+        error_msg = _launch_with_script(node, args)
+        if error_msg:
             return False, error_msg
 
-    except subprocess.TimeoutExpired:
-        # Don't clear the lock here – the script might still be working
-        error_msg = "Installation timed out after 20 minutes but may still be running in background"
-        logger.error(error_msg)
-        return False, error_msg
-    except Exception as e:
-        # Clean up the lock in all other failure cases
-        mark_installation_completed()
-        error_msg = f"Unexpected error during installation: {str(e)}"
-        logger.error(error_msg, exc_info=True)
-        return False, error_msg
+    node.changed()
+    # ...and the node picks up the current bitcoin.conf
+    clear_restart_required(node.spec.data_dir)
+
+    report(phase='warmup', message="Waiting for bitcoind to answer RPC")
+    started = time.monotonic()
+    while time.monotonic() - started < BITCOIN_START_TIMEOUT:
+        try:
+            node.rpc.call('getblockcount', timeout=10)
+            logger.info(f"Bitcoin node {node.name} ready after {time.monotonic() - started:.1f}s")
+            return True, "Bitcoin node started successfully"
+        except RPCError as e:
+            if e.code != RPC_IN_WARMUP:
+                return False, f"Bitcoin node started but RPC fails: {e.message}"
+            # e.g. "Loading block index…", "Verifying blocks…"
+            report(message=e.message)
+        except BitcoinRPCError:
+            # Not listening yet, or the .cookie file isn't written yet
+            pass
+
+        # A node that dies while starting up won't come back by itself
+        if time.monotonic() - started > 5:
+            error_msg = _startup_failure(node)
+            if error_msg:
+                return False, error_msg
+        time.sleep(1)
+
+    return False, f"bitcoind did not answer RPC within {BITCOIN_START_TIMEOUT}s"
+
+def install_bitcoin(job) -> Tuple[bool, str]:
+    # Downloads, verifies and unpacks Bitcoin Core in one streaming pass.
+    # Meant to run as a background job: progress is reported through `job`.
+    from meadow_web.installer import install_bitcoin_core
+
+    logger.info(f"Installing Bitcoin Core from {BITCOIN_INSTALL_URL}")
+    return install_bitcoin_core(BITCOIN_INSTALL_URL, BITCOIN_DATA_DIR, progress=job.update)
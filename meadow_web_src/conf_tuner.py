@@ -0,0 +1,365 @@
+import difflib
+import json
+import os
+import shutil
+import time
+import logging
+from pathlib import Path
+from typing import Any, Dict, List, NamedTuple, Optional, Tuple
+from meadow_web.config import (
+    BITCOIN_CONF_TEMPLATE,
+    BITCOIN_DATA_DIR,
+    BITCOIN_ZMQ_HASHBLOCK,
+    BITCOIN_ZMQ_RAWTX,
+    TUNER_RESERVED_MEMORY_MB,
+    TUNER_FULL_NODE_DISK_GB,
+    TUNER_BLOCKSONLY_DURING_IBD
+)
+from meadow_web.system_stats import find_mount, read_meminfo
+
+logger = logging.getLogger(__name__)
+
+# Sizes bitcoin.conf to the box it runs on.
+#
+# Two profiles: 'ibd' throws every spare byte of RAM and every core at the initial sync,
+# 'steady' gives most of it back once the node has caught up. Only the keys recommend()
+# returns are touched – everything else in bitcoin.conf is left as it is.
+#
+# Each change keeps the previous file as bitcoin.conf.bak plus a unified diff in the
+# state file, so it can be reviewed and undone from the dashboard.
+
+PROFILE_IBD = 'ibd'
+PROFILE_STEADY = 'steady'
+PROFILES = (PROFILE_IBD, PROFILE_STEADY)
+
+CONF_NAME = 'bitcoin.conf'
+BACKUP_NAME = 'bitcoin.conf.bak'
+STATE_NAME = 'meadow-tuning.json'
+
+# Bitcoin Core's own limits
+MIN_DBCACHE_MB = 4
+MIN_PRUNE_MB = 550
+MIN_MAXMEMPOOL_MB = 5
+
+# Filesystems where every flush is expensive (copy-on-write or FUSE); a bigger cache
+# during IBD means fewer of them
+_SLOW_FLUSH_FS = ('btrfs', 'fuseblk', 'ntfs', 'ntfs3', 'exfat', 'vfat')
+
+# Room kept free next to a pruned chain for the chainstate, indexes and logs
+_PRUNE_HEADROOM_MB = 20 * 1024
+
+
+class Hardware(NamedTuple):
+    mem_total_mb: int
+    cpu_count: int
+    fs_type: Optional[str]
+    disk_total_mb: int
+    disk_free_mb: int
+
+
+def read_hardware(data_dir: Path = BITCOIN_DATA_DIR) -> Hardware:
+    mem_total = read_meminfo().get('MemTotal', 0)
+    mount = find_mount(data_dir)
+    # On a fresh install the data dir may not exist yet – its filesystem does
+    disk_path = data_dir if data_dir.exists() else (mount['mount_point'] if mount else '/')
+    try:
+        disk = shutil.disk_usage(disk_path)
+        disk_total, disk_free = disk.total, disk.free
+    except OSError as e:
+        logger.error(f"Failed to read disk usage for {data_dir}: {e}")
+        disk_total = disk_free = 0
+    return Hardware(
+        mem_total_mb=mem_total // (1024 * 1024),
+        cpu_count=os.cpu_count() or 1,
+        fs_type=mount['fs_type'] if mount else None,
+        disk_total_mb=disk_total // (1024 * 1024),
+        disk_free_mb=disk_free // (1024 * 1024)
+    )
+
+
+def recommend(hardware: Hardware, profile: str) -> Tuple[Dict[str, Optional[str]], List[str]]:
+    # Returns ({key: value or None to remove}, [why, ...]) for the given profile
+    settings: Dict[str, Optional[str]] = {}
+    reasons: List[str] = []
+    spare_mb = max(hardware.mem_total_mb - TUNER_RESERVED_MEMORY_MB, 0)
+
+    if profile == PROFILE_IBD:
+        share = 0.6
+        if hardware.fs_type in _SLOW_FLUSH_FS:
+            share = 0.7
+            reasons.append(f"{hardware.fs_type} makes cache flushes expensive, so the sync cache gets a larger share")
+        dbcache = max(int(spare_mb * share), 300)
+        reasons.append(f"dbcache={dbcache}: {int(share * 100)}% of the RAM left after {TUNER_RESERVED_MEMORY_MB} MB "
+                       f"for the system, so fewer UTXO flushes to disk during the initial sync")
+        settings['par'] = str(hardware.cpu_count)
+        reasons.append(f"par={hardware.cpu_count}: verify scripts on every core while syncing")
+        settings['maxmempool'] = str(MIN_MAXMEMPOOL_MB if TUNER_BLOCKSONLY_DURING_IBD else 50)
+        settings['blocksonly'] = '1' if TUNER_BLOCKSONLY_DURING_IBD else None
+        if TUNER_BLOCKSONLY_DURING_IBD:
+            reasons.append("blocksonly=1 and a minimal mempool: no transaction relay until the chain is synced")
+    else:
+        dbcache = min(max(hardware.mem_total_mb // 8, 300), 1024)
+        reasons.append(f"dbcache={dbcache}: synced nodes only need a modest cache, the rest is given back")
+        settings['par'] = str(max(hardware.cpu_count // 2, 1))
+        reasons.append(f"par={settings['par']}: leave cores free for the web UI and Tor")
+        settings['maxmempool'] = '100' if hardware.mem_total_mb < 3 * 1024 else '300'
+        reasons.append(f"maxmempool={settings['maxmempool']} for {hardware.mem_total_mb} MB of RAM")
+        settings['blocksonly'] = None
+    settings['dbcache'] = str(max(dbcache, MIN_DBCACHE_MB))
+
+    # Prune when the disk can't hold the whole chain
+    if hardware.disk_total_mb and hardware.disk_total_mb < TUNER_FULL_NODE_DISK_GB * 1024:
+        prune = max(int((hardware.disk_total_mb - _PRUNE_HEADROOM_MB) * 0.8), MIN_PRUNE_MB)
+        settings['prune'] = str(prune)
+        reasons.append(f"prune={prune}: the {hardware.disk_total_mb // 1024} GB disk is smaller than a full chain "
+                       f"needs ({TUNER_FULL_NODE_DISK_GB} GB)")
+    else:
+        settings['prune'] = None
+
+    # debug=1 logs every category and fills the data disk during sync
+    settings['debug'] = None
+
+    # New blocks and transactions are pushed to the web app (zmq_bridge.py), localhost only
+    settings['zmqpubhashblock'] = BITCOIN_ZMQ_HASHBLOCK
+    settings['zmqpubrawtx'] = BITCOIN_ZMQ_RAWTX
+    reasons.append("zmqpubhashblock/zmqpubrawtx on localhost: the dashboard hears about new blocks "
+                   "right away instead of polling RPC")
+    return settings, reasons
+
+
+def render(text: str, settings: Dict[str, Optional[str]]) -> str:
+    # Applies settings to bitcoin.conf text: existing lines are changed in place (or
+    # dropped for None), new keys are appended. Only the top, network-less section is
+    # touched – [main]/[test] sections are left alone.
+    lines = text.splitlines()
+    remaining = dict(settings)
+    result = []
+    in_section = False
+
+    for line in lines:
+        stripped = line.strip()
+        if stripped.startswith('['):
+            in_section = True
+        key = stripped.split('=', 1)[0].strip() if '=' in stripped and not stripped.startswith('#') else None
+        if not in_section and key in settings:
+            if key in remaining and remaining[key] is not None:
+                result.append(f"{key}={remaining[key]}")
+            remaining.pop(key, None)
+            continue
+        result.append(line)
+
+    additions = [f"{key}={value}" for key, value in remaining.items() if value is not None]
+    if additions:
+        # New keys must go above the first section header to apply to mainnet
+        insert_at = next((i for i, line in enumerate(result) if line.strip().startswith('[')), len(result))
+        while insert_at > 0 and not result[insert_at - 1].strip():
+            insert_at -= 1
+        block = ['', '# Sized for this hardware by Meadow'] + additions
+        if insert_at < len(result) and result[insert_at].strip():
+            block.append('')
+        result[insert_at:insert_at] = block
+
+    return '\n'.join(result).rstrip('\n') + '\n'
+
+
+def read_state(data_dir: Path = BITCOIN_DATA_DIR) -> Dict[str, Any]:
+    try:
+        with open(Path(data_dir) / STATE_NAME, 'r') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def _write_atomic(path: Path, text: str) -> None:
+    tmp_path = path.with_name(path.name + '.tmp')
+    with open(tmp_path, 'w') as f:
+        f.write(text)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+
+def _diff(before: str, after: str) -> str:
+    return ''.join(difflib.unified_diff(
+        before.splitlines(keepends=True), after.splitlines(keepends=True),
+        fromfile=f'{CONF_NAME} (before)', tofile=f'{CONF_NAME} (after)'))
+
+
+def plan(profile: str, data_dir: Path = BITCOIN_DATA_DIR, base: Optional[Path] = None) -> Dict[str, Any]:
+    # What apply_tuning() would write, without writing it
+    data_dir = Path(data_dir)
+    conf_path = data_dir / CONF_NAME
+    base = Path(base) if base else (conf_path if conf_path.exists() else BITCOIN_CONF_TEMPLATE)
+
+    hardware = read_hardware(data_dir)
+    settings, reasons = recommend(hardware, profile)
+    # A disk budget (storage.py) replaces the disk-size guess for pruning and indexes
+    storage = read_state(data_dir).get('storage')
+    if storage:
+        overridden = storage['settings']
+        reasons = [reason for reason in reasons if reason.split('=', 1)[0] not in overridden] + storage['reasons']
+        settings.update(overridden)
+    before = conf_path.read_text() if conf_path.exists() else ''
+    after = render(base.read_text(), settings)
+    return {
+        'profile': profile,
+        'hardware': hardware._asdict(),
+        'settings': settings,
+        'reasons': reasons,
+        'text': after,
+        'diff': _diff(before, after)
+    }
+
+
+def apply_tuning(profile: Optional[str] = None, data_dir: Path = BITCOIN_DATA_DIR,
+                 base: Optional[Path] = None, manual: bool = False) -> Tuple[bool, str]:
+    # Writes a bitcoin.conf tuned for `profile` (default: whatever was applied last, or
+    # 'ibd' for a fresh data dir). `base` is the file to start from – the current
+    # bitcoin.conf unless given (the installer passes the stock template). `manual` marks
+    # a profile the user picked themselves – switch_after_ibd() leaves those alone.
+    data_dir = Path(data_dir)
+    state = read_state(data_dir)
+    if not profile:
+        # Re-applying the saved profile keeps whoever chose it
+        manual = bool(state.get('manual'))
+    profile = profile or state.get('profile') or PROFILE_IBD
+    if profile not in PROFILES:
+        return False, f"Unknown tuning profile: {profile}"
+
+    conf_path = data_dir / CONF_NAME
+    try:
+        result = plan(profile, data_dir, base)
+        data_dir.mkdir(parents=True, exist_ok=True)
+
+        if conf_path.exists():
+            if conf_path.read_text() == result['text']:
+                message = "bitcoin.conf is already tuned for this hardware"
+                _save_state(data_dir, result, changed=False, manual=manual)
+                return True, message
+            shutil.copy2(conf_path, data_dir / BACKUP_NAME)
+        _write_atomic(conf_path, result['text'])
+        _save_state(data_dir, result, changed=True, manual=manual)
+    except OSError as e:
+        error_msg = f"Failed to tune bitcoin.conf: {str(e)}"
+        logger.error(error_msg)
+        return False, error_msg
+
+    message = f"bitcoin.conf tuned for {'initial sync' if profile == PROFILE_IBD else 'steady state'} " \
+              f"(dbcache={result['settings']['dbcache']}, par={result['settings']['par']})"
+    logger.info(message)
+    return True, message
+
+
+def _save_state(data_dir: Path, result: Dict[str, Any], changed: bool, manual: bool = False) -> None:
+    state = read_state(data_dir)
+    if changed:
+        state['previous_profile'] = state.get('profile')
+    state.update({
+        'profile': result['profile'],
+        'manual': manual,
+        'applied_at': time.time(),
+        'hardware': result['hardware'],
+        'settings': result['settings'],
+        'reasons': result['reasons'],
+    })
+    if changed:
+        state['diff'] = result['diff']
+        # bitcoind only reads its config at startup
+        state['restart_required'] = True
+    _write_atomic(data_dir / STATE_NAME, json.dumps(state, indent=2))
+
+
+def set_storage_settings(storage: Optional[Dict[str, Any]], data_dir: Path = BITCOIN_DATA_DIR) -> Tuple[bool, str]:
+    # Keeps a disk budget's settings ({'budget_gb', 'settings', 'reasons'}, or None to drop
+    # them) on top of every future tuning, and re-applies the current profile with them
+    data_dir = Path(data_dir)
+    state = read_state(data_dir)
+    previous = state.get('storage')
+    if storage:
+        state['storage'] = storage
+    else:
+        state.pop('storage', None)
+    try:
+        data_dir.mkdir(parents=True, exist_ok=True)
+        _write_atomic(data_dir / STATE_NAME, json.dumps(state, indent=2))
+    except OSError as e:
+        error_msg = f"Failed to save the disk budget: {str(e)}"
+        logger.error(error_msg)
+        return False, error_msg
+
+    success, message = apply_tuning(None, data_dir)
+    if not success:
+        # Don't leave a budget behind that bitcoin.conf doesn't have
+        state = read_state(data_dir)
+        if previous:
+            state['storage'] = previous
+        else:
+            state.pop('storage', None)
+        try:
+            _write_atomic(data_dir / STATE_NAME, json.dumps(state, indent=2))
+        except OSError as e:
+            logger.error(f"Failed to update tuning state: {e}")
+    return success, message
+
+
+def rollback(data_dir: Path = BITCOIN_DATA_DIR) -> Tuple[bool, str]:
+    # Swaps bitcoin.conf with the previous version – so rolling back twice redoes the change
+    data_dir = Path(data_dir)
+    conf_path, backup_path = data_dir / CONF_NAME, data_dir / BACKUP_NAME
+    if not backup_path.exists():
+        return False, "There is no previous bitcoin.conf to go back to"
+
+    try:
+        current = conf_path.read_text() if conf_path.exists() else ''
+        previous = backup_path.read_text()
+        _write_atomic(conf_path, previous)
+        _write_atomic(backup_path, current)
+
+        state = read_state(data_dir)
+        state.update({
+            'profile': state.get('previous_profile'),
+            'previous_profile': state.get('profile'),
+            # Going back is a deliberate choice – don't switch it away after the sync
+            'manual': True,
+            'applied_at': time.time(),
+            'diff': _diff(current, previous),
+            'restart_required': True
+        })
+        _write_atomic(data_dir / STATE_NAME, json.dumps(state, indent=2))
+    except OSError as e:
+        error_msg = f"Failed to restore the previous bitcoin.conf: {str(e)}"
+        logger.error(error_msg)
+        return False, error_msg
+
+    logger.info("Restored the previous bitcoin.conf")
+    return True, "Restored the previous bitcoin.conf"
+
+
+def clear_restart_required(data_dir: Path = BITCOIN_DATA_DIR) -> None:
+    # Called once bitcoind has been (re)started with the current file
+    state = read_state(data_dir)
+    if state.get('restart_required'):
+        state['restart_required'] = False
+        try:
+            _write_atomic(Path(data_dir) / STATE_NAME, json.dumps(state, indent=2))
+        except OSError as e:
+            logger.error(f"Failed to update tuning state: {e}")
+
+
+def memory_budget(data_dir: Path = BITCOIN_DATA_DIR) -> Tuple[int, int]:
+    # (dbcache, maxmempool) in MB that bitcoin.conf gives the node – what the box can spare
+    # for bitcoind, and what nodes.py splits up when several nodes run side by side
+    settings = read_state(data_dir).get('settings') or recommend(read_hardware(data_dir), PROFILE_STEADY)[0]
+    return int(settings.get('dbcache') or 300), int(settings.get('maxmempool') or 300)
+
+
+def switch_after_ibd(data_dir: Path = BITCOIN_DATA_DIR) -> bool:
+    # Called when the node reports its initial sync as done: moves a config still tuned for
+    # 'ibd' over to the steady profile, unless the user chose 'ibd' themselves. The running
+    # node keeps its settings until its next restart.
+    state = read_state(data_dir)
+    if state.get('profile') != PROFILE_IBD or state.get('manual'):
+        return False
+    logger.info("Initial block download finished, switching bitcoin.conf to steady-state settings")
+    success, _ = apply_tuning(PROFILE_STEADY, data_dir)
+    return success
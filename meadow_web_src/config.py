@@ -12,23 +12,224 @@ SQLALCHEMY_TRACK_MODIFICATIONS = False  # Disables SQLAlchemy change tracking ov
 # Pulls from env var if set, otherwise uses a very dev-only fallback
 SECRET_KEY = os.getenv('FLASK_SECRET_KEY', 'dev-key-change-me-in-production')
 
-# Flask app settings – bind to all interfaces so it's reachable from other devices
-DEBUG = True  # Should be False in production unless you like chaos
+# Dev server settings (`python app.py`) – bind to all interfaces so it's reachable from other devices
+# Turns on the Werkzeug debugger, so never in production (MEADOW_DEBUG=1 to opt in)
+DEBUG = os.getenv('MEADOW_DEBUG', '0') == '1'
 HOST = '0.0.0.0'
 PORT = 8080
 
+# Production serving (S50meadowweb): gunicorn behind nginx on a unix socket, see gunicorn.conf.py
+# One worker process – the status monitor, sampler, job registry and supervisor are
+# per-process singletons – with a thread per request. Every open dashboard holds a
+# thread or two for its SSE streams, so there are plenty of threads
+WEB_SOCKET = '/run/meadow/web.sock'
+WEB_PIDFILE = '/run/meadow/web.pid'
+WEB_THREADS = 32
+WEB_GRACEFUL_TIMEOUT = 10  # seconds open streams get on stop/reload before they're cut (browsers reconnect)
+WEB_KEEPALIVE = 75  # idle upstream connections; longer than nginx's keepalive_timeout so nginx closes first
+WEB_LOG = '/var/log/meadow-web.log'
+
 # Path where all our control/utility scripts live
 SCRIPTS_DIR = Path('/usr/lib/meadow/scripts')
 
 # Where we expect Bitcoin to be installed (binaries go here)
+# This is a symlink to the active release inside BITCOIN_VERSIONS_DIR
 BITCOIN_INSTALL_DIR = Path('/opt/bitcoin/')
 
+# Every installed release gets its own folder here, e.g. /opt/bitcoin-versions/28.1/
+BITCOIN_VERSIONS_DIR = Path('/opt/bitcoin-versions')
+
+# The big external disk – S50data_partition mounts the partition labelled "data" here
+DATA_MOUNT_POINT = Path('/data')
+
 # Bitcoin will use this dir for its data (wallet, blocks, etc)
-BITCOIN_DATA_DIR = Path('/data/bitcoin-data-directory')
+BITCOIN_DATA_DIR = DATA_MOUNT_POINT / 'bitcoin-data-directory'
+
+# How long (seconds) a bitcoind process lookup stays valid before /proc is checked again
+# Every dashboard poll asks "is it running?", so this keeps them from hammering procfs
+PROCESS_PROBE_TTL = 2.0
+
+# Node start/stop run in the background. A start only counts once RPC answers (bitcoind
+# loads its block index first, which takes minutes on a Pi); a stop waits for the final
+# flush of the UTXO cache to disk, which is slow with a big dbcache
+BITCOIN_START_TIMEOUT = 900
+BITCOIN_STOP_TIMEOUT = 600
+# SIGKILL bitcoind if it's still running after BITCOIN_STOP_TIMEOUT. Off by default:
+# a killed node has to rebuild its chainstate on the next start
+BITCOIN_STOP_KILL = False
+
+# Supervisor mode: the web app runs bitcoind as its own child (no -daemon), sees it exit
+# the moment it happens and restarts it after a crash – waiting BACKOFF_INITIAL seconds,
+# doubling each time up to BACKOFF_MAX; a run longer than STABLE_AFTER resets the count
+BITCOIN_SUPERVISED = os.getenv('MEADOW_SUPERVISE_BITCOIND', '0') == '1'
+SUPERVISOR_AUTOSTART = False  # start bitcoind along with the web app
+SUPERVISOR_BACKOFF_INITIAL = 5
+SUPERVISOR_BACKOFF_MAX = 300
+SUPERVISOR_STABLE_AFTER = 600
+
+# CPU/IO priority for a supervised bitcoind, so the web UI stays responsive during sync
+BITCOIN_NICE = 10  # 0 = leave alone
+BITCOIN_IONICE_CLASS = 2  # best-effort (None = leave alone)
+BITCOIN_IONICE_LEVEL = 7  # lowest priority within the class
+# Optional cgroup v2 limits (only applied when one of them is set)
+BITCOIN_CGROUP = 'meadow-bitcoind'
+BITCOIN_CPU_MAX = None  # cores, e.g. 3 to keep one core free
+BITCOIN_MEMORY_MAX_MB = None
+
+# More than one node: extra chains (signet, testnet4, ...) can run next to the mainnet node
+# in BITCOIN_DATA_DIR. They're listed in NODE_REGISTRY_PATH (see nodes.py for the format),
+# each with its own data dir, ports and optional caps, and always run under a supervisor.
+# dbcache/maxmempool from the tuned bitcoin.conf are split between the running nodes
+NODE_REGISTRY_PATH = DATA_MOUNT_POINT / 'meadow' / 'nodes.json'
+NODE_PRIMARY_NAME = 'main'
+NODE_STATUS_WORKERS = 4  # nodes asked for their status at the same time
+NODE_STATUS_TIMEOUT = 5  # seconds a node gets to answer before its status shows as unknown
+# A node isn't started if less dbcache than this (MB) is left of the tuned budget next to
+# what the running nodes already use – it would crawl, and more would overcommit the RAM
+NODE_MIN_DBCACHE_MB = 50
+
+# The status monitor re-checks installed/running/installing this often (seconds)
+# and pushes changes to every open dashboard over one stream
+STATUS_MONITOR_INTERVAL = 2.0
+
+# Idle status streams get a keep-alive comment this often so proxies don't drop them
+STATUS_STREAM_KEEPALIVE = 15
+
+# Events (status changes, new blocks, mempool activity) queued per open status stream.
+# A client that falls this far behind loses its backlog and is told to resync instead
+EVENT_QUEUE_SIZE = 64
+
+# ZMQ notifications from bitcoind (the tuner adds zmqpubhashblock/zmqpubrawtx to bitcoin.conf)
+# New blocks reach the dashboards the moment they connect, and the cached chain state is
+# patched from them. Needs pyzmq; without it the regular RPC refresh is all there is
+BITCOIN_ZMQ_HASHBLOCK = 'tcp://127.0.0.1:28332'
+BITCOIN_ZMQ_RAWTX = 'tcp://127.0.0.1:28333'
+ZMQ_EVENT_INTERVAL = 1.0  # notifications are batched into at most one block and one mempool event per interval
+# While the notifications are connected and the node is synced, new blocks arrive by
+# ZMQ and getblockchaininfo is only re-read this often as a safety net (instead of NODE_INFO_TTLS)
+ZMQ_CHAIN_TTL = 120
+
+# JSON-RPC access to bitcoind (bitcoin.conf binds it to localhost)
+# Auth comes from the .cookie file in BITCOIN_DATA_DIR unless a user/password is set here
+BITCOIN_RPC_HOST = '127.0.0.1'
+BITCOIN_RPC_PORT = 8332
+BITCOIN_RPC_USER = os.getenv('BITCOIN_RPC_USER')
+BITCOIN_RPC_PASSWORD = os.getenv('BITCOIN_RPC_PASSWORD')
+BITCOIN_RPC_TIMEOUT = 10  # seconds per call, unless the caller asks for something else
+BITCOIN_RPC_POOL_SIZE = 4  # idle keep-alive connections kept around
+
+# How long (seconds) each piece of node info may be served from cache on /api/bitcoin/info
+# bitcoind is slow to answer during IBD, so pollers share one RPC batch per refresh
+NODE_INFO_TTLS = {
+    'blockchain': 5,   # getblockchaininfo – height, headers, progress
+    'network': 15,     # getnetworkinfo – peers
+    'mempool': 10,     # getmempoolinfo
+    'disk': 30,        # free space on the data disk
+    'chainstates': 30, # getchainstates – the snapshot and background chainstate after an AssumeUTXO load
+}
+
+# AssumeUTXO fast bootstrap: a UTXO snapshot (e.g. utxo-840000.dat) on the data disk or a
+# USB stick is loaded with loadtxoutset, and the node syncs from the snapshot height while
+# the older blocks are validated in the background. Which snapshots bitcoind accepts is a
+# data file, so a new release's snapshot heights are a data change
+ASSUMEUTXO_SNAPSHOTS_FILE = BASE_DIR / 'assumeutxo.json'
+# Snapshot files are looked for in these folders and one level below them (USB sticks get mounted under /media or /mnt)
+ASSUMEUTXO_SEARCH_DIRS = [DATA_MOUNT_POINT, Path('/media'), Path('/mnt')]
+# loadtxoutset answers only once every coin is in the chainstate – hours on a Pi
+ASSUMEUTXO_LOAD_TIMEOUT = 6 * 3600
+
+# Chain data export/import (datadir_clone.py): a second node starts from another's blocks/
+# and chainstate/ instead of its own initial sync. Exports are cut into chunks of about this
+# many bytes – a damaged chunk is all that has to be copied again
+DATADIR_CHUNK_SIZE = 1024 * 1024 * 1024
+DATADIR_COMPRESSION_LEVEL = {'zstd': 3, 'gzip': 1}  # fast levels – the obfuscated block files barely compress anyway
+DATADIR_IMPORT_WORKERS = None  # processes checking chunk hashes during an import (None = one per core)
+
+# Sync progress and resource usage history (for the dashboard charts)
+# Sampled every TIMESERIES_SAMPLE_INTERVAL seconds and kept at several resolutions:
+# (seconds per point, number of points) – 10s for an hour, 1m for a day, 1h for a month
+TIMESERIES_LEVELS = [(10, 360), (60, 1440), (3600, 720)]
+TIMESERIES_SAMPLE_INTERVAL = 10
+TIMESERIES_SAVE_INTERVAL = 300  # flushed to disk this often (and on shutdown)
+TIMESERIES_PATH = Path('/data/meadow/timeseries.bin')
+
+# Initial sync monitor: when is a sample interval CPU-, disk- or memory-bound?
+# (percent of all cores busy / percent of time the data disk had I/O queued / percent iowait /
+# percent of RAM not available to the page cache / MB per second pushed out to swap)
+# Below all of them the node is just waiting on peers for blocks
+IBD_CPU_BOUND_PERCENT = 85
+# With assumevalid on (bitcoind's default) scripts below it aren't checked and connecting blocks
+# is mostly one thread, so one core this busy counts as CPU-bound too, however idle the rest are.
+# The shipped bitcoin.conf has assumevalid=0: every script is checked on -par threads across all
+# cores, and then only the all-core figure counts
+IBD_CORE_BOUND_PERCENT = 90
+IBD_DISK_BOUND_PERCENT = 80
+IBD_IOWAIT_BOUND_PERCENT = 25
+IBD_MEMORY_BOUND_PERCENT = 95
+IBD_SWAP_BOUND_MB_PER_SEC = 1
+IBD_RATE_SMOOTHING = 0.1  # EWMA weight of the newest blocks/s sample for the ETA
+IBD_BOTTLENECK_WINDOW = 60  # recent intervals summarised in the bottleneck breakdown (10 min)
+
+# Disk budget manager (storage.py): what fills the data disk, how fast, and whether the disk keeps up
+# Usage is re-measured every STORAGE_SCAN_INTERVAL seconds, but only folders that changed are
+# listed again and only files written to within STORAGE_SETTLED_AFTER seconds are re-stat'ed
+STORAGE_SCAN_INTERVAL = 300
+STORAGE_SETTLED_AFTER = 3600
+STORAGE_FULL_RESCAN_INTERVAL = 6 * 3600  # everything is stat'ed again this often, just in case
+STORAGE_GROWTH_WINDOW = 24 * 3600  # growth rate (and time-to-full) over this much usage history
+STORAGE_FULL_ALERT_DAYS = 14  # alert when the disk is projected to fill up within this many days
+STORAGE_LOW_FREE_PERCENT = 5  # ... or when less than this is left, whatever the trend
+# The disk is the bottleneck when requests wait at least this long on average (await, ms)
+# or it's busy IBD_DISK_BOUND_PERCENT of the time, in STORAGE_PRESSURE_SHARE of recent samples
+STORAGE_LATENCY_ALERT_MS = 50
+STORAGE_PRESSURE_WINDOW = 30  # samples (5 min)
+STORAGE_PRESSURE_SHARE = 0.8
+# A disk budget leaves this much (GB) unplanned for chainstate growth, logs and the web app's files
+STORAGE_BUDGET_HEADROOM_GB = 20
+
+# bitcoind's debug.log viewer: followed by byte offset, with a sparse time -> offset index
+# One index point per LOG_INDEX_STRIDE bytes; past LOG_INDEX_MAX_ENTRIES points the stride
+# doubles instead, so the index stays a few KB however big the log gets
+BITCOIN_DEBUG_LOG = BITCOIN_DATA_DIR / 'debug.log'
+LOG_INDEX_STRIDE = 256 * 1024
+LOG_INDEX_MAX_ENTRIES = 4096
+LOG_POLL_INTERVAL = 1.0  # seconds between checks for new lines
+LOG_PAGE_SIZE = 100  # lines per search page (callers may ask for up to LOG_PAGE_SIZE_MAX)
+LOG_PAGE_SIZE_MAX = 1000
+
+# /metrics (Prometheus text format) is open to logged-in users; a scraper can use
+# "Authorization: Bearer <token>" instead when this is set
+METRICS_TOKEN = os.getenv('MEADOW_METRICS_TOKEN')
+
+# Opt-in request profiler: with this on, a logged-in user can add ?_profile=1 to any URL
+# to get a flamegraph-ready (folded stacks) profile of that one request in PROFILE_DIR
+PROFILER_ENABLED = os.getenv('MEADOW_PROFILER', '0') == '1'
+PROFILE_DIR = Path('/data/meadow/profiles')
+PROFILE_INTERVAL = 0.005  # seconds between stack samples
+PROFILE_KEEP = 20  # newest profiles kept
 
 # URL to download Bitcoin Core – make sure this matches your architecture
+# The installer checks it against the SHA256SUMS file published in the same folder
 BITCOIN_INSTALL_URL = 'https://bitcoincore.org/bin/bitcoin-core-28.1/bitcoin-28.1-aarch64-linux-gnu.tar.gz'
 
+# Partial downloads are kept here (on the big data disk) so an interrupted install can resume
+INSTALL_DOWNLOAD_DIR = Path('/data/meadow/downloads')
+
+# Verified release tarballs, so reinstalls and rollbacks work offline
+# Keep this on the same disk as INSTALL_DOWNLOAD_DIR – finished downloads are moved, not copied
+BITCOIN_ARTIFACT_CACHE_DIR = Path('/data/meadow/cache')
+BITCOIN_ARTIFACT_CACHE_KEEP = 3
+
+# The stock bitcoin.conf that gets copied into the data dir on install
+BITCOIN_CONF_TEMPLATE = Path('/usr/lib/meadow/bitcoin.conf')
+
+# bitcoin.conf tuner: RAM (MB) left alone for the OS, nginx, Tor and this app when sizing dbcache
+TUNER_RESERVED_MEMORY_MB = 768
+# Disks smaller than this (GB) get a pruned node – a full chain plus indexes needs about this much
+TUNER_FULL_NODE_DISK_GB = 900
+# Skip transaction relay while syncing (it's switched back on once IBD is done)
+TUNER_BLOCKSONLY_DURING_IBD = True
+
 # Location of the Tor hidden service hostname file
 # Used to read the .onion address if we're serving over Tor
 TOR_HOSTNAME_PATH = '/var/lib/tor/hidden_service/hostname'
@@ -0,0 +1,496 @@
+import argparse
+import gzip
+import hashlib
+import json
+import multiprocessing
+import os
+import shutil
+import sys
+import tarfile
+import time
+import uuid
+import zlib
+import logging
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from meadow_web.config import (
+    BITCOIN_DATA_DIR,
+    DATADIR_CHUNK_SIZE,
+    DATADIR_COMPRESSION_LEVEL,
+    DATADIR_IMPORT_WORKERS
+)
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+logger = logging.getLogger(__name__)
+
+# Export/import of a node's chain data, so a second box can start from a synced copy
+# instead of doing its own multi-day initial sync.
+#
+# An export is a folder (on a USB disk, a network share, ...) of numbered chunks plus a
+# manifest.json. Each chunk is a self-contained compressed tar of whole files from
+# blocks/ and chainstate/, about DATADIR_CHUNK_SIZE bytes before compression, and the
+# manifest lists every chunk's SHA256, size and files. zstd when the zstandard module
+# is there, gzip otherwise – the manifest says which.
+#
+# The import checks the chunks' hashes in a process pool (hashing a few hundred GB is
+# CPU work) while unpacking them in order, and records each unpacked chunk in
+# .meadow-import.json in the data dir. A damaged or missing chunk stops the import;
+# copy that chunk again and the next run picks up where this one stopped.
+#
+#   python -m meadow_web.datadir_clone export /media/usb/meadow-export
+#   python -m meadow_web.datadir_clone import /media/usb/meadow-export
+
+MANIFEST_NAME = 'manifest.json'
+STATE_NAME = '.meadow-import.json'
+FORMAT_VERSION = 1
+
+# What gets copied: the block files (with their index) and the UTXO set. Wallets,
+# bitcoin.conf, peers.dat and the optional indexes stay behind
+EXPORT_DIRS = ('blocks', 'chainstate')
+
+COPY_BUFFER_SIZE = 1024 * 1024
+_PROGRESS_INTERVAL = 1.0
+_EXTENSIONS = {'zstd': '.tar.zst', 'gzip': '.tar.gz'}
+
+# What a chunk that passed its hash check can still throw when it doesn't unpack
+_UNPACK_ERRORS = (tarfile.TarError, EOFError, zlib.error, gzip.BadGzipFile) + (
+    (zstandard.ZstdError,) if zstandard is not None else ())
+
+
+class CloneError(Exception):
+    pass
+
+
+def _no_progress(**kwargs) -> None:
+    pass
+
+
+class _Throttle:
+    # Passes bytes_done on to `progress` at most once per _PROGRESS_INTERVAL
+
+    def __init__(self, progress: Callable[..., None], done: int = 0):
+        self.progress = progress
+        self.done = done
+        self._reported_at = 0.0
+
+    def add(self, count: int, force: bool = False) -> None:
+        self.done += count
+        now = time.monotonic()
+        if force or now - self._reported_at >= _PROGRESS_INTERVAL:
+            self._reported_at = now
+            self.progress(bytes_done=self.done)
+
+
+class _CountingReader:
+    # Source file for tarfile.addfile() that reports the bytes it hands over
+
+    def __init__(self, fileobj, throttle: _Throttle):
+        self._fileobj = fileobj
+        self._throttle = throttle
+
+    def read(self, size: int = -1) -> bytes:
+        data = self._fileobj.read(size)
+        self._throttle.add(len(data))
+        return data
+
+
+class _HashingWriter:
+    # Destination for the compressor: hashes and counts the compressed bytes on their way to disk
+
+    def __init__(self, fileobj):
+        self._fileobj = fileobj
+        self.sha256 = hashlib.sha256()
+        self.size = 0
+
+    def write(self, data) -> int:
+        self.sha256.update(data)
+        self.size += len(data)
+        return self._fileobj.write(data)
+
+    def flush(self) -> None:
+        self._fileobj.flush()
+
+
+def default_compression() -> str:
+    return 'zstd' if zstandard is not None else 'gzip'
+
+
+def _compressor(fileobj, compression: str):
+    if compression == 'zstd':
+        return zstandard.ZstdCompressor(level=DATADIR_COMPRESSION_LEVEL['zstd'], threads=-1).stream_writer(
+            fileobj, closefd=False)
+    return gzip.GzipFile(fileobj=fileobj, mode='wb', compresslevel=DATADIR_COMPRESSION_LEVEL['gzip'], mtime=0)
+
+
+def _decompressor(fileobj, compression: str):
+    if compression == 'zstd':
+        if zstandard is None:
+            raise CloneError("This export is zstd-compressed, but the zstandard module isn't installed")
+        return zstandard.ZstdDecompressor().stream_reader(fileobj, closefd=False)
+    return gzip.GzipFile(fileobj=fileobj, mode='rb')
+
+
+def _write_json_atomic(path: Path, data: Dict[str, Any]) -> None:
+    tmp_path = path.with_name(path.name + '.tmp')
+    with open(tmp_path, 'w') as f:
+        json.dump(data, f, indent=1)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+
+# --- export ---
+
+def list_files(data_dir: Path) -> List[Tuple[str, int]]:
+    # (path relative to the data dir, size) of everything to export, in a stable order
+    files = []
+    for top in EXPORT_DIRS:
+        root = data_dir / top
+        if not root.is_dir():
+            raise CloneError(f"{root} doesn't exist – is this a Bitcoin data directory?")
+        for dirpath, dirnames, filenames in os.walk(root):
+            dirnames.sort()
+            for name in sorted(filenames):
+                path = Path(dirpath) / name
+                if name == 'LOCK' or not path.is_file():
+                    continue  # LevelDB's lock file is recreated on open
+                files.append((str(path.relative_to(data_dir)), path.stat().st_size))
+    return files
+
+
+def plan_chunks(files: List[Tuple[str, int]], chunk_size: int) -> List[List[Tuple[str, int]]]:
+    # Consecutive files grouped into chunks of about chunk_size bytes (a bigger file gets a chunk of its own)
+    chunks, current, current_size = [], [], 0
+    for name, size in files:
+        if current and current_size + size > chunk_size:
+            chunks.append(current)
+            current, current_size = [], 0
+        current.append((name, size))
+        current_size += size
+    if current:
+        chunks.append(current)
+    return chunks
+
+
+def _write_chunk(data_dir: Path, files: List[Tuple[str, int]], path: Path, compression: str,
+                 throttle: _Throttle) -> Dict[str, Any]:
+    part_path = path.with_name(path.name + '.part')
+    with open(part_path, 'wb') as f:
+        writer = _HashingWriter(f)
+        compressor = _compressor(writer, compression)
+        with tarfile.open(fileobj=compressor, mode='w|', format=tarfile.PAX_FORMAT) as tar:
+            tar.copybufsize = COPY_BUFFER_SIZE
+            for name, size in files:
+                info = tar.gettarinfo(data_dir / name, arcname=name)
+                if info.size != size:
+                    raise CloneError(f"{name} changed size during the export – is the node still running?")
+                with open(data_dir / name, 'rb') as source:
+                    tar.addfile(info, _CountingReader(source, throttle))
+        compressor.close()
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(part_path, path)
+    return {
+        'name': path.name,
+        'size': writer.size,
+        'sha256': writer.sha256.hexdigest(),
+        'raw_bytes': sum(size for _, size in files),
+        'files': [[name, size] for name, size in files]
+    }
+
+
+def export_datadir(dest: Path, data_dir: Path = BITCOIN_DATA_DIR, progress: Optional[Callable[..., None]] = None,
+                   chunk_size: int = DATADIR_CHUNK_SIZE, compression: Optional[str] = None,
+                   chain_info: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    # Writes blocks/ and chainstate/ of a stopped node's data dir as chunks into `dest`.
+    # `progress` gets keyword updates (phase, bytes_done, bytes_total, message) – Job.update fits.
+    # Returns the manifest
+    progress = progress or _no_progress
+    data_dir, dest = Path(data_dir), Path(dest)
+    compression = compression or default_compression()
+    if compression == 'zstd' and zstandard is None:
+        raise CloneError("zstd compression needs the zstandard module")
+    if (dest / MANIFEST_NAME).exists():
+        raise CloneError(f"{dest} already holds an export")
+    dest.mkdir(parents=True, exist_ok=True)
+
+    files = list_files(data_dir)
+    chunks = plan_chunks(files, chunk_size)
+    total = sum(size for _, size in files)
+    free = shutil.disk_usage(dest).free
+    if free < total:
+        # Chain data hardly compresses (block files are obfuscated), so this won't fit
+        raise CloneError(f"Only {free / 1e9:.1f} GB free at {dest}, the chain data is {total / 1e9:.1f} GB")
+
+    manifest = {
+        'format': FORMAT_VERSION,
+        'id': uuid.uuid4().hex,
+        'created_at': time.time(),
+        'compression': compression,
+        'chunk_size': chunk_size,
+        'chain': chain_info or {},
+        'raw_bytes': total,
+        'chunks': []
+    }
+    progress(phase='exporting', bytes_done=0, bytes_total=total,
+             message=f"Exporting {len(files):,} files in {len(chunks)} chunks")
+    throttle = _Throttle(progress)
+    started = time.monotonic()
+    for index, chunk_files in enumerate(chunks):
+        path = dest / f"chunk-{index:05d}{_EXTENSIONS[compression]}"
+        manifest['chunks'].append(_write_chunk(data_dir, chunk_files, path, compression, throttle))
+        throttle.add(0, force=True)
+        progress(message=f"Wrote chunk {index + 1} of {len(chunks)}")
+
+    # Written last, so a folder with a manifest is always a complete export
+    _write_json_atomic(dest / MANIFEST_NAME, manifest)
+    elapsed = max(time.monotonic() - started, 0.001)
+    logger.info(f"Exported {total / 1e9:.1f} GB from {data_dir} to {dest} in {elapsed:.0f}s "
+                f"({total / elapsed / 1e6:.1f} MB/s)")
+    return manifest
+
+
+# --- import ---
+
+def read_manifest(source: Path) -> Dict[str, Any]:
+    try:
+        with open(Path(source) / MANIFEST_NAME, 'r') as f:
+            manifest = json.load(f)
+    except FileNotFoundError:
+        raise CloneError(f"No {MANIFEST_NAME} in {source} – not an export, or it didn't finish")
+    except (OSError, ValueError) as e:
+        raise CloneError(f"Can't read the export's manifest: {str(e)}")
+    if manifest.get('format') != FORMAT_VERSION:
+        raise CloneError(f"Unsupported export format {manifest.get('format')}")
+    return manifest
+
+
+def hash_file(path: str) -> Optional[str]:
+    # Runs in the worker processes; None if the file is missing or unreadable
+    sha256 = hashlib.sha256()
+    try:
+        with open(path, 'rb') as f:
+            while True:
+                data = f.read(COPY_BUFFER_SIZE)
+                if not data:
+                    break
+                sha256.update(data)
+    except OSError:
+        return None
+    return sha256.hexdigest()
+
+
+def _read_state(data_dir: Path) -> Dict[str, Any]:
+    try:
+        with open(data_dir / STATE_NAME, 'r') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def _extract_chunk(path: Path, chunk: Dict[str, Any], compression: str, data_dir: Path,
+                   throttle: _Throttle) -> None:
+    expected = {name: size for name, size in chunk['files']}
+    with open(path, 'rb') as f:
+        with tarfile.open(fileobj=_decompressor(f, compression), mode='r|') as tar:
+            for member in tar:
+                if member.name not in expected or not member.isfile():
+                    raise CloneError(f"{path.name} holds {member.name}, which the manifest doesn't list")
+                if hasattr(tarfile, 'data_filter'):
+                    tar.extract(member, data_dir, filter='data')
+                else:
+                    tar.extract(member, data_dir)
+                throttle.add(member.size)
+
+    for name, size in expected.items():
+        target = data_dir / name
+        if not target.is_file() or target.stat().st_size != size:
+            raise CloneError(f"{name} from {path.name} didn't unpack completely")
+
+
+def import_datadir(source: Path, data_dir: Path = BITCOIN_DATA_DIR, progress: Optional[Callable[..., None]] = None,
+                   workers: Optional[int] = DATADIR_IMPORT_WORKERS, replace: bool = False) -> Dict[str, Any]:
+    # Unpacks the export in `source` into a stopped node's data dir, resuming an earlier
+    # run of the same export. `replace` clears existing chain data first. Returns the manifest
+    progress = progress or _no_progress
+    source, data_dir = Path(source), Path(data_dir)
+    manifest = read_manifest(source)
+    chunks = manifest['chunks']
+
+    state = _read_state(data_dir)
+    if state.get('export_id') == manifest['id']:
+        done = state.get('chunks_done', 0)
+        logger.info(f"Resuming the import of {source} at chunk {done + 1} of {len(chunks)}")
+    else:
+        existing = [top for top in EXPORT_DIRS if (data_dir / top).exists()]
+        if existing and not replace:
+            raise CloneError(f"{data_dir} already has chain data ({', '.join(existing)}); replace it or pick another folder")
+        for top in existing:
+            shutil.rmtree(data_dir / top)
+        data_dir.mkdir(parents=True, exist_ok=True)
+        done = 0
+        _write_json_atomic(data_dir / STATE_NAME, {'export_id': manifest['id'], 'source': str(source), 'chunks_done': 0})
+
+    remaining = chunks[done:]
+    raw_done = sum(chunk['raw_bytes'] for chunk in chunks[:done])
+    progress(phase='importing', bytes_done=raw_done, bytes_total=manifest['raw_bytes'],
+             message=f"Checking and unpacking {len(remaining)} of {len(chunks)} chunks")
+    throttle = _Throttle(progress, raw_done)
+    started = time.monotonic()
+
+    # Fresh interpreters for the workers – forking a process full of threads isn't safe
+    pool = ProcessPoolExecutor(max_workers=workers or os.cpu_count(), mp_context=multiprocessing.get_context('spawn'))
+    try:
+        hashes = [pool.submit(hash_file, str(source / chunk['name'])) for chunk in remaining]
+        for index, chunk, future in zip(range(done, len(chunks)), remaining, hashes):
+            digest = future.result()
+            if digest is None:
+                raise CloneError(f"Chunk {index + 1} ({chunk['name']}) is missing – copy it and run the import again")
+            if digest != chunk['sha256']:
+                raise CloneError(f"Chunk {index + 1} ({chunk['name']}) is damaged – copy it again and "
+                                 "run the import again to continue from there")
+            try:
+                _extract_chunk(source / chunk['name'], chunk, manifest['compression'], data_dir, throttle)
+            except _UNPACK_ERRORS as e:
+                raise CloneError(f"Chunk {index + 1} ({chunk['name']}) doesn't unpack: {str(e)}")
+            _write_json_atomic(data_dir / STATE_NAME, {'export_id': manifest['id'], 'source': str(source),
+                                                       'chunks_done': index + 1})
+            throttle.add(0, force=True)
+            progress(message=f"Unpacked chunk {index + 1} of {len(chunks)}")
+    finally:
+        # After a bad chunk there's no point hashing the rest
+        pool.shutdown(wait=True, cancel_futures=True)
+
+    (data_dir / STATE_NAME).unlink()
+    elapsed = max(time.monotonic() - started, 0.001)
+    imported = manifest['raw_bytes'] - raw_done
+    logger.info(f"Imported {imported / 1e9:.1f} GB from {source} into {data_dir} in {elapsed:.0f}s "
+                f"({imported / elapsed / 1e6:.1f} MB/s)")
+    return manifest
+
+
+def import_in_progress(data_dir: Path = BITCOIN_DATA_DIR) -> Optional[Dict[str, Any]]:
+    # The unfinished import in `data_dir`, if there is one
+    state = _read_state(Path(data_dir))
+    return state or None
+
+
+# --- dashboard jobs ---
+
+def _chain_info() -> Dict[str, Any]:
+    from meadow_web.bitcoin_rpc import bitcoin_rpc, BitcoinRPCError
+    try:
+        chain = bitcoin_rpc.call('getblockchaininfo')
+    except BitcoinRPCError:
+        return {}
+    return {key: chain.get(key) for key in ('chain', 'blocks', 'bestblockhash', 'pruned')}
+
+
+def export_job(job, dest: str) -> Tuple[bool, str]:
+    # Background job (kind 'datadir'): stops the node, exports, and starts it again if it was running
+    from meadow_web.bitcoin_utils import is_bitcoin_running, start_bitcoin_node, stop_bitcoin_node
+
+    was_running = is_bitcoin_running(max_age=0)
+    chain_info = _chain_info() if was_running else {}
+    if was_running:
+        stopped, message = stop_bitcoin_node(job)
+        if not stopped:
+            return False, f"Couldn't stop the node for the export: {message}"
+
+    try:
+        manifest = export_datadir(Path(dest), progress=job.update, chain_info=chain_info)
+        success, message = True, (f"Exported {manifest['raw_bytes'] / 1e9:.1f} GB in "
+                                  f"{len(manifest['chunks'])} chunks to {dest}")
+    except (CloneError, OSError) as e:
+        success, message = False, f"Export failed: {str(e)}"
+        logger.error(message)
+
+    if was_running:
+        started, start_message = start_bitcoin_node(job)
+        if not started:
+            message += f" (restarting the node failed: {start_message})"
+    return success, message
+
+
+def import_job(job, source: str, replace: bool = False) -> Tuple[bool, str]:
+    # Background job (kind 'datadir'): the node has to be stopped, this doesn't start it
+    from meadow_web.bitcoin_utils import is_bitcoin_running
+    from meadow_web.node_info import node_info_cache
+
+    if is_bitcoin_running(max_age=0):
+        return False, "Stop the node before importing chain data"
+    try:
+        manifest = import_datadir(Path(source), progress=job.update, replace=replace)
+    except (CloneError, OSError) as e:
+        message = f"Import failed: {str(e)}"
+        logger.error(message)
+        return False, message
+    finally:
+        node_info_cache.invalidate()
+
+    chain = manifest.get('chain') or {}
+    height = f" at block {chain['blocks']:,}" if chain.get('blocks') is not None else ""
+    pruned = " The source node was pruned – set prune= in bitcoin.conf to match." if chain.get('pruned') else ""
+    return True, f"Imported {manifest['raw_bytes'] / 1e9:.1f} GB of chain data{height}. Start the node to continue syncing.{pruned}"
+
+
+# --- command line ---
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Export or import a node's chain data (blocks/ and chainstate/)")
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    export_parser = commands.add_parser('export', help="write an export of a stopped node into DEST")
+    export_parser.add_argument('dest')
+    export_parser.add_argument('--data-dir', default=str(BITCOIN_DATA_DIR))
+    export_parser.add_argument('--chunk-size', type=int, default=DATADIR_CHUNK_SIZE // (1024 * 1024),
+                               help="MB of chain data per chunk")
+    export_parser.add_argument('--compression', choices=sorted(_EXTENSIONS), default=None)
+
+    import_parser = commands.add_parser('import', help="unpack the export in SOURCE (resumes an interrupted import)")
+    import_parser.add_argument('source')
+    import_parser.add_argument('--data-dir', default=str(BITCOIN_DATA_DIR))
+    import_parser.add_argument('--workers', type=int, default=DATADIR_IMPORT_WORKERS,
+                               help="processes checking chunk hashes (default: one per core)")
+    import_parser.add_argument('--replace', action='store_true', help="throw away existing chain data first")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format='[datadir] %(message)s')
+
+    from meadow_web.process_probe import bitcoind_probe
+    if Path(args.data_dir) == BITCOIN_DATA_DIR and bitcoind_probe.is_running(0):
+        # The dashboard's export stops and restarts the node itself
+        print("[datadir] bitcoind is running – stop the node first", file=sys.stderr)
+        return 1
+
+    state = {'total': None, 'started': time.monotonic()}
+
+    def report(phase=None, bytes_done=None, bytes_total=None, message=None):
+        if bytes_total is not None:
+            state['total'] = bytes_total
+        if message:
+            print(f"[datadir] {message}", flush=True)
+        elif bytes_done is not None and state['total']:
+            rate = bytes_done / max(time.monotonic() - state['started'], 0.001)
+            print(f"[datadir] {100 * bytes_done / state['total']:5.1f}%  {bytes_done / 1e9:.2f} of "
+                  f"{state['total'] / 1e9:.2f} GB  {rate / 1e6:.1f} MB/s", flush=True)
+
+    try:
+        if args.command == 'export':
+            export_datadir(Path(args.dest), Path(args.data_dir), report,
+                           args.chunk_size * 1024 * 1024, args.compression)
+        else:
+            import_datadir(Path(args.source), Path(args.data_dir), report, args.workers, args.replace)
+    except (CloneError, OSError) as e:
+        print(f"[datadir] {args.command.capitalize()} failed: {str(e)}", file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,323 @@
+import bisect
+import calendar
+import mmap
+import os
+import re
+import threading
+import time
+import logging
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+from meadow_web.config import (
+    BITCOIN_DEBUG_LOG,
+    LOG_INDEX_STRIDE,
+    LOG_INDEX_MAX_ENTRIES,
+    LOG_POLL_INTERVAL
+)
+
+logger = logging.getLogger(__name__)
+
+# Read access to bitcoind's debug.log, however big it gets.
+#
+# A background thread stats the file once a second. New data only extends a sparse
+# index of (timestamp, byte offset) pairs – one sample every `stride` bytes, found by
+# reading a few KB at each boundary, never the whole file. The index is capped: when it
+# fills up, every other entry is dropped and the stride doubles, so memory stays flat.
+#
+# A different inode (rotation) or a shrinking file (-shrinkdebugfile, truncation) bumps
+# the `generation` and starts over; clients holding a byte offset from an older
+# generation start from the top of the new file.
+#
+# Searches mmap the file and run the regex over it directly, newest lines first, one
+# block at a time – the file's pages live in the page cache, not in our heap.
+
+_SEARCH_BLOCK = 4 * 1024 * 1024
+_PROBE_SIZE = 4096
+MAX_LINE_LENGTH = 8192  # longer lines are cut when returned
+
+_TIMESTAMP_RE = re.compile(rb'(\d{4})-(\d\d)-(\d\d)T(\d\d):(\d\d):(\d\d)(\.\d+)?Z')
+
+
+def parse_time(line: bytes) -> Optional[float]:
+    # Epoch seconds from a line's leading "2025-01-31T12:34:56(.123456)Z", if it has one
+    match = _TIMESTAMP_RE.match(line)
+    if not match:
+        return None
+    year, month, day, hour, minute, second = (int(part) for part in match.groups()[:6])
+    fraction = float(match.group(7)) if match.group(7) else 0.0
+    return calendar.timegm((year, month, day, hour, minute, second)) + fraction
+
+
+def _category_re(category: str) -> 're.Pattern':
+    # "[net]" or "[net:debug]" among the bracketed prefixes after the timestamp
+    # (a thread name like "[msghand]" may come first)
+    return re.compile(rb'^\S+ (?:\[[^\]\n]*\] )*?\[' + re.escape(category.encode()) + rb'(?::\w+)?\]', re.M)
+
+
+class DebugLog:
+
+    def __init__(self, path: Path = BITCOIN_DEBUG_LOG, stride: int = LOG_INDEX_STRIDE,
+                 max_entries: int = LOG_INDEX_MAX_ENTRIES, interval: float = LOG_POLL_INTERVAL):
+        self.path = Path(path)
+        self.base_stride = stride
+        self.max_entries = max_entries
+        self.interval = interval
+
+        self._cond = threading.Condition()
+        self._thread: Optional[threading.Thread] = None
+        self._reset(inode=None)
+        self.generation = 0
+
+    def _reset(self, inode: Optional[int]) -> None:
+        self._inode = inode
+        self._size = 0
+        self._stride = self.base_stride
+        self._index: List[Tuple[float, int]] = []  # sorted by offset (and so by time)
+        self._index_times: List[float] = []
+        self._next_sample = 0
+
+    # --- tailing ---
+
+    def start(self) -> None:
+        with self._cond:
+            if self._thread is not None:
+                return
+            self._thread = threading.Thread(target=self._run, name='debug-log', daemon=True)
+        self._thread.start()
+
+    def _run(self) -> None:
+        while True:
+            try:
+                self.refresh()
+            except Exception as e:
+                logger.error(f"Error following {self.path}: {str(e)}", exc_info=True)
+            time.sleep(self.interval)
+
+    def refresh(self) -> None:
+        try:
+            stat = os.stat(self.path)
+        except FileNotFoundError:
+            stat = None
+
+        with self._cond:
+            inode = stat.st_ino if stat else None
+            size = stat.st_size if stat else 0
+            if inode != self._inode or size < self._size:
+                if self._inode is not None:
+                    logger.info(f"{self.path} was rotated or truncated, re-indexing")
+                self._reset(inode)
+                self.generation += 1
+                self._cond.notify_all()
+            if size == self._size:
+                return
+
+        self._extend_index(size)
+        with self._cond:
+            self._size = size
+            self._cond.notify_all()
+
+    def _extend_index(self, size: int) -> None:
+        # Samples the first full line after every stride boundary that is now complete
+        try:
+            with open(self.path, 'rb') as f:
+                while self._next_sample + _PROBE_SIZE <= size or (self._next_sample == 0 and size):
+                    offset = self._next_sample
+                    f.seek(offset)
+                    probe = f.read(_PROBE_SIZE)
+                    if offset:
+                        newline = probe.find(b'\n')
+                        if newline < 0:
+                            break  # a monster line – try again once the file has grown
+                        offset += newline + 1
+                        probe = probe[newline + 1:]
+                    timestamp = parse_time(probe)
+                    with self._cond:
+                        if timestamp is not None and (not self._index_times or timestamp >= self._index_times[-1]):
+                            self._index.append((timestamp, offset))
+                            self._index_times.append(timestamp)
+                        self._next_sample += self._stride
+                        if len(self._index) > self.max_entries:
+                            self._thin()
+        except OSError as e:
+            logger.error(f"Failed to index {self.path}: {e}")
+
+    def _thin(self) -> None:
+        self._index = self._index[::2]
+        self._index_times = [timestamp for timestamp, _ in self._index]
+        self._stride *= 2
+        logger.debug(f"debug.log index thinned, stride now {self._stride} bytes")
+
+    def status(self) -> Dict[str, Any]:
+        with self._cond:
+            return {
+                'size': self._size,
+                'generation': self.generation,
+                'indexed_points': len(self._index),
+                'stride': self._stride
+            }
+
+    def wait_for_change(self, size: int, generation: int, timeout: float) -> bool:
+        # Blocks until the file grows past `size` or is replaced; False on timeout
+        with self._cond:
+            return self._cond.wait_for(lambda: self._size > size or self.generation != generation, timeout)
+
+    def read_from(self, offset: int, generation: int, max_bytes: int = 64 * 1024) -> Tuple[List[Dict[str, Any]], int, int]:
+        # Complete lines after `offset`, up to max_bytes; returns (lines, next offset, generation)
+        with self._cond:
+            size, current = self._size, self.generation
+        if generation != current or offset > size:
+            offset = 0
+        if offset >= size:
+            return [], offset, current
+
+        try:
+            with open(self.path, 'rb') as f:
+                f.seek(offset)
+                data = f.read(min(size - offset, max_bytes))
+        except OSError as e:
+            logger.error(f"Failed to read {self.path}: {e}")
+            return [], offset, current
+
+        end = data.rfind(b'\n') + 1
+        if end == 0:
+            if len(data) < max_bytes:
+                return [], offset, current  # line still being written
+            end = len(data)  # a single line longer than max_bytes – hand it over in pieces
+        lines = []
+        position = offset
+        for raw in data[:end].split(b'\n'):
+            if position >= offset + end:
+                break
+            lines.append(self._line(raw, position))
+            position += len(raw) + 1
+        return lines, offset + end, current
+
+    def tail(self, count: int) -> Tuple[List[Dict[str, Any]], int, int]:
+        # The last `count` lines plus the cursor to continue streaming from
+        with self._cond:
+            size, generation = self._size, self.generation
+        lines = self.search(limit=count, before=size)['lines']
+        if lines and not self._ends_with_newline(size):
+            # The newest line is still being written – the stream sends it once it's complete
+            size = lines.pop(0)['offset']
+        return list(reversed(lines)), size, generation
+
+    def _ends_with_newline(self, size: int) -> bool:
+        try:
+            with open(self.path, 'rb') as f:
+                f.seek(size - 1)
+                return f.read(1) == b'\n'
+        except OSError:
+            return True
+
+    # --- searching ---
+
+    def _offset_for_time(self, timestamp: float) -> int:
+        # Byte offset from which every line at or after `timestamp` lies (rounded down)
+        with self._cond:
+            i = bisect.bisect_right(self._index_times, timestamp) - 1
+            return self._index[i][1] if i >= 0 else 0
+
+    def _offset_after_time(self, timestamp: float) -> Optional[int]:
+        # Byte offset from which every line is past `timestamp`, if the index knows one
+        with self._cond:
+            i = bisect.bisect_right(self._index_times, timestamp)
+            return self._index[i][1] if i < len(self._index) else None
+
+    @staticmethod
+    def _line(raw: bytes, offset: int) -> Dict[str, Any]:
+        text = raw.rstrip(b'\r\n')[:MAX_LINE_LENGTH].decode('utf-8', 'replace')
+        return {'offset': offset, 'time': parse_time(raw), 'text': text}
+
+    def search(self, pattern: Optional[str] = None, category: Optional[str] = None,
+               start: Optional[float] = None, end: Optional[float] = None,
+               before: Optional[int] = None, limit: int = 100) -> Dict[str, Any]:
+        # Newest-first matching lines older than byte offset `before`. Pass the returned
+        # `next_before` back in to get the next (older) page; None means there is no more.
+        regex = re.compile(pattern.encode(), re.M) if pattern else None
+        category_regex = _category_re(category) if category else None
+
+        with self._cond:
+            size, generation = self._size, self.generation
+        hi = size if before is None else min(before, size)
+        lo = 0
+        if start is not None:
+            lo = self._offset_for_time(start)
+        if end is not None:
+            after = self._offset_after_time(end)
+            if after is not None:
+                hi = min(hi, after)
+
+        lines: List[Dict[str, Any]] = []
+        next_before = None
+        if hi <= lo or size == 0:
+            return {'lines': lines, 'next_before': None, 'generation': generation, 'size': size}
+
+        try:
+            with open(self.path, 'rb') as f, mmap.mmap(f.fileno(), size, access=mmap.ACCESS_READ) as mm:
+                block_hi = hi
+                while block_hi > lo and next_before is None:
+                    block_lo = max(block_hi - _SEARCH_BLOCK, lo)
+                    if block_lo > lo:
+                        # Start the block on a line boundary
+                        block_lo = mm.rfind(b'\n', lo, block_lo) + 1 or lo
+
+                    found = self._scan_block(mm, block_lo, block_hi, regex, category_regex, start, end)
+                    for line in reversed(found):
+                        if len(lines) == limit:
+                            next_before = lines[-1]['offset']
+                            break
+                        lines.append(line)
+                    if block_lo <= lo:
+                        break
+                    block_hi = block_lo
+        except (OSError, ValueError) as e:
+            # ValueError: the file shrank under us between stat and mmap
+            logger.error(f"Failed to search {self.path}: {e}")
+
+        return {'lines': lines, 'next_before': next_before, 'generation': generation, 'size': size}
+
+    def _scan_block(self, mm: mmap.mmap, lo: int, hi: int, regex, category_regex,
+                    start: Optional[float], end: Optional[float]) -> List[Dict[str, Any]]:
+        # Matching lines in [lo, hi), oldest first. The most selective regex finds candidate
+        # lines straight from the mmap; the rest of the filters then look at those lines only.
+        finder = regex or category_regex
+        if finder is not None:
+            starts = []
+            for match in finder.finditer(mm, lo, hi):
+                line_start = mm.rfind(b'\n', lo, match.start()) + 1 or lo
+                if not starts or starts[-1] != line_start:
+                    starts.append(line_start)
+        else:
+            starts = None
+
+        result = []
+        position = lo
+        candidates = iter(starts) if starts is not None else None
+        while position < hi:
+            if candidates is not None:
+                position = next(candidates, None)
+                if position is None:
+                    break
+            line_end = mm.find(b'\n', position, hi)
+            line_end = hi if line_end < 0 else line_end + 1
+            raw = mm[position:min(line_end, position + MAX_LINE_LENGTH)]
+
+            if category_regex is not None and finder is not category_regex and not category_regex.match(raw):
+                pass
+            elif (start is not None or end is not None) and not self._in_range(raw, start, end):
+                pass
+            else:
+                result.append(self._line(raw, position))
+            position = line_end
+        return result
+
+    @staticmethod
+    def _in_range(raw: bytes, start: Optional[float], end: Optional[float]) -> bool:
+        timestamp = parse_time(raw)
+        if timestamp is None:
+            return False
+        return (start is None or timestamp >= start) and (end is None or timestamp <= end)
+
+
+debug_log = DebugLog()
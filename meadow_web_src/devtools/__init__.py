@@ -0,0 +1 @@
+# Development helpers (stub servers, benchmarks) – not used by the running web app
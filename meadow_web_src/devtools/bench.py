@@ -0,0 +1,509 @@
+import argparse
+import http.client
+import json
+import os
+import platform
+import shutil
+import signal
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.parse
+from http.cookies import SimpleCookie
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional
+
+# Latency/concurrency benchmark for the web app.
+#
+#   python -m meadow_web.devtools.bench run --concurrency 8 --duration 10
+#   python -m meadow_web.devtools.bench compare before.json after.json
+#
+# `run` builds a throwaway root (SQLite DB, SCRIPTS_DIR with stub scripts, an
+# "installed" Bitcoin Core whose bitcoind is the fake from fake_bitcoind.py, data dir)
+# and boots the app in a child process against it, with every absolute path from
+# config.py moved under that root. The child is gunicorn with the device's
+# gunicorn.conf.py, so what's measured is what the device serves (minus nginx in front).
+# Client threads then hammer one endpoint per scenario over keep-alive connections.
+# CPU time comes from /proc for the gunicorn master and its worker, so "CPU per
+# request" is the server's cost alone. Results are written as JSON, to be compared
+# between commits with `compare`.
+
+BENCH_PASSWORD = 'bench-password'
+SCENARIOS = ['status', 'info', 'dashboard', 'login', 'startstop']
+_CLK_TCK = os.sysconf('SC_CLK_TCK')
+
+
+# --- the server side (runs in the child process) ---
+
+def _relocate_config(root: Path, rpc_port: int) -> None:
+    # Must run before anything else imports meadow_web.config values
+    from meadow_web import config
+
+    for name in dir(config):
+        value = getattr(config, name)
+        if isinstance(value, Path) and value.is_absolute() and not value.is_relative_to(config.BASE_DIR):
+            setattr(config, name, root / value.relative_to('/'))
+    config.SQLALCHEMY_DATABASE_URI = f"sqlite:///{root / 'users.db'}"
+    config.BITCOIN_RPC_PORT = rpc_port
+    config.DEBUG = False
+
+
+def serve(root: Path, port: int, rpc_port: int) -> None:
+    _relocate_config(root, rpc_port)
+    from gunicorn.app.base import Application
+
+    class BenchApplication(Application):
+        # The device's gunicorn.conf.py (gthread, one worker, WEB_THREADS threads, keep-alive,
+        # app imported in the worker) with only the plumbing changed: TCP instead of the unix
+        # socket nginx uses, in the foreground, logging to stderr
+        def load_config(self):
+            self.load_config_from_file(str(Path(__file__).resolve().parent.parent / 'gunicorn.conf.py'))
+            self.cfg.set('bind', [f'127.0.0.1:{port}'])
+            self.cfg.set('daemon', False)
+            self.cfg.set('pidfile', None)
+            self.cfg.set('errorlog', '-')
+            self.cfg.set('capture_output', False)
+            self.cfg.set('loglevel', 'warning')
+            self.cfg.set('post_worker_init', lambda worker: print(
+                f"ready gunicorn {self.cfg.worker_class_str}, {self.cfg.workers} worker(s) x "
+                f"{self.cfg.threads} threads", flush=True))
+
+        def load(self):
+            from meadow_web.app import create_app
+            return create_app()
+
+    BenchApplication().run()
+
+
+# --- fixtures ---
+
+def _write_script(path: Path, body: str) -> None:
+    path.write_text('#!/bin/sh\n' + body)
+    path.chmod(0o755)
+
+
+def build_root(root: Path, rpc_port: int, rpc_delay: float) -> None:
+    from meadow_web import config
+
+    def moved(path: Path) -> Path:
+        return root / path.relative_to('/')
+
+    scripts = moved(config.SCRIPTS_DIR)
+    scripts.mkdir(parents=True)
+    # The real one daemonizes bitcoind; ours backgrounds the fake with its output detached
+    # (the app waits for the script's stdout/stderr to close)
+    _write_script(scripts / 'start-bitcoind.sh', f'''
+for arg in "$@"; do
+  case $arg in
+    -datadir=*) DATADIR="${{arg#*=}}" ;;
+    -bitcoin_dir=*) BITCOIN_DIR="${{arg#*=}}" ;;
+  esac
+done
+"$BITCOIN_DIR/bin/bitcoind" -m meadow_web.devtools.fake_bitcoind -datadir="$DATADIR" \\
+    -rpcport={rpc_port} -rpcdelay={rpc_delay} >/dev/null 2>&1 </dev/null &
+''')
+    _write_script(scripts / 'create-user.sh', 'exit 0\n')
+
+    # An "installed" release whose bitcoind is the Python interpreter under another name
+    version_dir = moved(config.BITCOIN_VERSIONS_DIR) / '28.1' / 'bin'
+    version_dir.mkdir(parents=True)
+    os.symlink(os.path.realpath(sys.executable), version_dir / 'bitcoind')
+    install_dir = moved(config.BITCOIN_INSTALL_DIR)
+    install_dir.parent.mkdir(parents=True, exist_ok=True)
+    os.symlink(version_dir.parent, install_dir)
+
+    moved(config.BITCOIN_DATA_DIR).mkdir(parents=True)
+
+
+def _package_parent() -> str:
+    import meadow_web
+    return str(Path(meadow_web.__file__).resolve().parent.parent)
+
+
+# --- the client side ---
+
+class Client:
+    # One keep-alive connection with its own session cookie
+
+    def __init__(self, port: int):
+        self.port = port
+        self.cookie: Optional[str] = None
+        self.conn = http.client.HTTPConnection('127.0.0.1', port, timeout=60)
+
+    def request(self, method: str, path: str, form: Optional[Dict[str, str]] = None) -> http.client.HTTPResponse:
+        headers = {}
+        body = None
+        if self.cookie:
+            headers['Cookie'] = self.cookie
+        if form is not None:
+            body = urllib.parse.urlencode(form)
+            headers['Content-Type'] = 'application/x-www-form-urlencoded'
+        try:
+            self.conn.request(method, path, body=body, headers=headers)
+            response = self.conn.getresponse()
+        except (http.client.HTTPException, OSError):
+            # Server closed the keep-alive connection – reconnect once
+            self.conn.close()
+            self.conn = http.client.HTTPConnection('127.0.0.1', self.port, timeout=60)
+            self.conn.request(method, path, body=body, headers=headers)
+            response = self.conn.getresponse()
+        for header in response.headers.get_all('Set-Cookie') or []:
+            cookie = SimpleCookie(header)
+            if 'session' in cookie:
+                self.cookie = f"session={cookie['session'].value}"
+        return response
+
+    def call(self, method: str, path: str, form: Optional[Dict[str, str]] = None) -> int:
+        response = self.request(method, path, form)
+        response.read()
+        return response.status
+
+    def json(self, method: str, path: str) -> Any:
+        response = self.request(method, path)
+        return json.loads(response.read())
+
+    def login(self) -> None:
+        status = self.call('POST', '/login', {'password': BENCH_PASSWORD})
+        if status != 302 or not self.cookie:
+            raise RuntimeError(f"Login failed (HTTP {status})")
+
+    def wait_for_job(self, job_id: str) -> Dict[str, Any]:
+        # Follows the node job's SSE stream until it finishes
+        response = self.request('GET', f'/api/bitcoin/node/{job_id}/progress')
+        state = None
+        try:
+            for raw in response:
+                line = raw.decode().strip()
+                if line.startswith('data: '):
+                    state = json.loads(line[6:])
+                    if state['status'] != 'running':
+                        return state
+        finally:
+            self.conn.close()  # the stream owns this connection now
+            self.conn = http.client.HTTPConnection('127.0.0.1', self.port, timeout=60)
+        raise RuntimeError(f"Progress stream for job {job_id} ended early")
+
+    def node_operation(self, path: str) -> float:
+        started = time.perf_counter()
+        response = self.request('POST', path)
+        reply = json.loads(response.read())
+        if response.status != 202:
+            raise RuntimeError(f"{path}: HTTP {response.status} {reply.get('message')}")
+        state = self.wait_for_job(reply['job']['id'])
+        if state['status'] != 'succeeded':
+            raise RuntimeError(f"{path}: {state['message']}")
+        return time.perf_counter() - started
+
+
+def _process_tree(pid: int) -> List[int]:
+    # The process and its descendants – the gunicorn master and its worker
+    pids = [pid]
+    for parent in pids:
+        try:
+            with open(f'/proc/{parent}/task/{parent}/children') as f:
+                pids += [int(child) for child in f.read().split()]
+        except OSError:
+            pass
+    return pids
+
+
+def _process_cpu(pid: int) -> float:
+    # utime + stime of the process tree, in seconds
+    total = 0
+    for member in _process_tree(pid):
+        try:
+            with open(f'/proc/{member}/stat') as f:
+                fields = f.read().rsplit(')', 1)[1].split()
+        except OSError:
+            continue
+        total += int(fields[11]) + int(fields[12])
+    return total / _CLK_TCK
+
+
+def _process_rss_mb(pid: int) -> Optional[float]:
+    # Resident memory of the process tree
+    total = None
+    for member in _process_tree(pid):
+        try:
+            with open(f'/proc/{member}/status') as f:
+                for line in f:
+                    if line.startswith('VmRSS:'):
+                        total = (total or 0) + int(line.split()[1]) / 1024
+        except OSError:
+            pass
+    return total
+
+
+def _percentile(sorted_values: List[float], fraction: float) -> float:
+    if not sorted_values:
+        return 0.0
+    i = min(len(sorted_values) - 1, max(0, int(round(fraction * len(sorted_values) + 0.5)) - 1))
+    return sorted_values[i]
+
+
+def _summarise(latencies: List[float], errors: int, elapsed: float, cpu: float, concurrency: int) -> Dict[str, Any]:
+    values = sorted(latencies)
+    count = len(values)
+    ms = lambda seconds: round(seconds * 1000, 3)
+    return {
+        'requests': count,
+        'errors': errors,
+        'concurrency': concurrency,
+        'seconds': round(elapsed, 3),
+        'throughput_rps': round(count / elapsed, 2) if elapsed else 0.0,
+        'latency_ms': {
+            'p50': ms(_percentile(values, 0.50)),
+            'p95': ms(_percentile(values, 0.95)),
+            'p99': ms(_percentile(values, 0.99)),
+            'mean': ms(sum(values) / count) if count else 0.0,
+            'max': ms(values[-1]) if values else 0.0
+        },
+        'cpu_ms_per_request': round(cpu * 1000 / count, 3) if count else None
+    }
+
+
+def _load(port: int, server_pid: int, concurrency: int, duration: float,
+          make_client: Callable[[], Client], request: Callable[[Client], int]) -> Dict[str, Any]:
+    # `concurrency` threads issue back-to-back requests for `duration` seconds
+    clients = [make_client() for _ in range(concurrency)]
+    results = [([], [0]) for _ in range(concurrency)]
+    deadline = time.perf_counter() + duration
+    barrier = threading.Barrier(concurrency + 1)
+
+    def worker(client: Client, latencies: List[float], errors: List[int]) -> None:
+        barrier.wait()
+        while time.perf_counter() < deadline:
+            started = time.perf_counter()
+            try:
+                status = request(client)
+            except (OSError, http.client.HTTPException):
+                status = 0
+            if status >= 400 or status == 0:
+                errors[0] += 1
+            else:
+                latencies.append(time.perf_counter() - started)
+
+    threads = [threading.Thread(target=worker, args=(client, *result), daemon=True)
+               for client, result in zip(clients, results)]
+    for thread in threads:
+        thread.start()
+    cpu_before = _process_cpu(server_pid)
+    started = time.perf_counter()
+    barrier.wait()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+    cpu = _process_cpu(server_pid) - cpu_before
+
+    latencies = [value for result in results for value in result[0]]
+    errors = sum(result[1][0] for result in results)
+    return _summarise(latencies, errors, elapsed, cpu, concurrency)
+
+
+def run_benchmarks(port: int, server_pid: int, scenarios: List[str], concurrency: int,
+                   duration: float, cycles: int) -> Dict[str, Any]:
+    admin = Client(port)
+    if admin.call('POST', '/register', {'username': 'bench', 'password': BENCH_PASSWORD,
+                                        'confirm_password': BENCH_PASSWORD}) != 302:
+        raise RuntimeError("Registering the benchmark user failed")
+    admin.login()
+
+    def logged_in() -> Client:
+        client = Client(port)
+        client.login()
+        return client
+
+    # Endpoints are measured against a running (fake) node, as on a live device
+    admin.node_operation('/api/bitcoin/start')
+    time.sleep(1)  # let the status monitor and caches settle
+
+    def get(path: str) -> Callable[[Client], int]:
+        return lambda client: client.call('GET', path)
+
+    def login(client: Client) -> int:
+        # Forget the session each time, so every request checks the password
+        client.cookie = None
+        return client.call('POST', '/login', {'password': BENCH_PASSWORD})
+
+    results: Dict[str, Any] = {}
+    plain = {
+        'status': (logged_in, get('/api/bitcoin/status')),
+        'info': (logged_in, get('/api/bitcoin/info')),
+        'dashboard': (logged_in, get('/dashboard')),
+        'login': (lambda: Client(port), login)
+    }
+    for name in scenarios:
+        if name in plain:
+            print(f"  {name}: {concurrency} clients for {duration:g}s", file=sys.stderr)
+            results[name] = _load(port, server_pid, concurrency, duration, *plain[name])
+
+    if 'startstop' in scenarios:
+        # Sequential by nature – the app allows one start/stop at a time
+        print(f"  startstop: {cycles} stop/start cycles", file=sys.stderr)
+        # Latency is the whole operation: POST until the job reports success
+        operations = {'node_stop': '/api/bitcoin/stop', 'node_start': '/api/bitcoin/start'}
+        timings = {name: ([], [0.0]) for name in operations}
+        for _ in range(cycles):
+            for name, path in operations.items():
+                cpu_before = _process_cpu(server_pid)
+                timings[name][0].append(admin.node_operation(path))
+                timings[name][1][0] += _process_cpu(server_pid) - cpu_before
+        for name, (latencies, cpu) in timings.items():
+            results[name] = _summarise(latencies, 0, sum(latencies), cpu[0], 1)
+
+    admin.node_operation('/api/bitcoin/stop')
+    return results
+
+
+def _git_revision() -> Dict[str, Any]:
+    cwd = Path(_package_parent())
+    try:
+        commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=cwd, capture_output=True,
+                                text=True, check=True).stdout.strip()
+        dirty = bool(subprocess.run(['git', 'status', '--porcelain', '--untracked-files=no'], cwd=cwd,
+                                    capture_output=True, text=True).stdout.strip())
+        return {'commit': commit, 'dirty': dirty}
+    except (OSError, subprocess.CalledProcessError):
+        return {'commit': None, 'dirty': None}
+
+
+def _free_port() -> int:
+    import socket
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def _kill_fake_node(root: Path) -> None:
+    from meadow_web import config
+    pidfile = root / config.BITCOIN_DATA_DIR.relative_to('/') / 'bitcoind.pid'
+    try:
+        os.kill(int(pidfile.read_text()), signal.SIGTERM)
+    except (OSError, ValueError):
+        pass
+
+
+def run(args) -> Dict[str, Any]:
+    root = Path(tempfile.mkdtemp(prefix='meadow-bench-'))
+    port, rpc_port = _free_port(), _free_port()
+    build_root(root, rpc_port, args.rpc_delay)
+
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join(filter(None, [_package_parent(), os.getenv('PYTHONPATH')])))
+    spawned = time.perf_counter()
+    server = subprocess.Popen([sys.executable, '-m', 'meadow_web.devtools.bench', 'serve', '--root', str(root),
+                               '--port', str(port), '--rpc-port', str(rpc_port)],
+                              env=env, stdout=subprocess.PIPE, text=True)
+    try:
+        ready_line = server.stdout.readline().strip()
+        if not ready_line.startswith('ready'):
+            raise RuntimeError("Benchmark server failed to start")
+        server_kind = ready_line[len('ready'):].strip()
+        # Cold start: process spawn to app ready, and to the first page served
+        ready = time.perf_counter() - spawned
+        Client(port).request('GET', '/login').read()
+        startup = {'ready': round(ready * 1000, 1), 'first_response': round((time.perf_counter() - spawned) * 1000, 1)}
+        print(f"Benchmarking against {root} ({server_kind}, server PID {server.pid})", file=sys.stderr)
+        scenarios = run_benchmarks(port, server.pid, args.scenarios, args.concurrency, args.duration, args.cycles)
+        rss = _process_rss_mb(server.pid)
+    finally:
+        _kill_fake_node(root)
+        server.terminate()
+        try:
+            server.wait(10)
+        except subprocess.TimeoutExpired:
+            server.kill()
+        if not args.keep:
+            shutil.rmtree(root, ignore_errors=True)
+
+    return {
+        **_git_revision(),
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime()),
+        'python': platform.python_version(),
+        'machine': platform.machine(),
+        'cpus': os.cpu_count(),
+        'settings': {'concurrency': args.concurrency, 'duration': args.duration,
+                     'cycles': args.cycles, 'rpc_delay': args.rpc_delay},
+        'server': server_kind,
+        'server_rss_mb': round(rss, 1) if rss else None,
+        'startup_ms': startup,
+        'scenarios': scenarios
+    }
+
+
+def compare(before: Dict[str, Any], after: Dict[str, Any]) -> str:
+    # Side-by-side table of the headline numbers, with relative change
+    def change(old, new):
+        if not old or new is None:
+            return ''
+        return f"{(new - old) / old * 100:+.0f}%"
+
+    lines = [f"{before.get('commit')} -> {after.get('commit')}",
+             f"{'scenario':<12} {'metric':<10} {'before':>10} {'after':>10} {'change':>8}"]
+    # Results from before the bench ran under gunicorn were taken with werkzeug's threaded server
+    servers = [result.get('server') or 'werkzeug (threaded)' for result in (before, after)]
+    if servers[0] != servers[1]:
+        lines.insert(1, f"server: {servers[0]} -> {servers[1]} – not a like-for-like comparison")
+    # Results from before startup timing was recorded have no startup_ms
+    for key, label in (('ready', 'ready_ms'), ('first_response', 'first_ms')):
+        a, b = (before.get('startup_ms') or {}).get(key), (after.get('startup_ms') or {}).get(key)
+        lines.append(f"{'startup':<12} {label:<10} {a if a is not None else '-':>10} {b if b is not None else '-':>10} {change(a, b):>8}")
+    for name in sorted(set(before['scenarios']) | set(after['scenarios'])):
+        old, new = before['scenarios'].get(name), after['scenarios'].get(name)
+        if not old or not new:
+            lines.append(f"{name:<12} (only in {'after' if new else 'before'})")
+            continue
+        metrics = [(key, old['latency_ms'][key], new['latency_ms'][key]) for key in ('p50', 'p95', 'p99')]
+        metrics += [('rps', old['throughput_rps'], new['throughput_rps']),
+                    ('cpu_ms', old['cpu_ms_per_request'], new['cpu_ms_per_request'])]
+        for key, a, b in metrics:
+            lines.append(f"{name:<12} {key:<10} {a if a is not None else '-':>10} {b if b is not None else '-':>10} {change(a, b):>8}")
+    return '\n'.join(lines)
+
+
+def main(argv=None) -> None:
+    parser = argparse.ArgumentParser(description="Meadow web app benchmarks")
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    run_parser = commands.add_parser('run', help="run the benchmark suite")
+    run_parser.add_argument('--concurrency', type=int, default=4, help="client threads per scenario")
+    run_parser.add_argument('--duration', type=float, default=10, help="seconds per scenario")
+    run_parser.add_argument('--cycles', type=int, default=3, help="stop/start cycles in the startstop scenario")
+    run_parser.add_argument('--rpc-delay', type=float, default=0.0, help="stub RPC latency (seconds)")
+    run_parser.add_argument('--scenarios', type=lambda value: value.split(','), default=SCENARIOS,
+                            help=f"comma-separated subset of {','.join(SCENARIOS)}")
+    run_parser.add_argument('--output', type=Path, help="results file (default: bench-<commit>-<time>.json)")
+    run_parser.add_argument('--keep', action='store_true', help="keep the temporary root for inspection")
+
+    compare_parser = commands.add_parser('compare', help="compare two results files")
+    compare_parser.add_argument('before', type=Path)
+    compare_parser.add_argument('after', type=Path)
+
+    serve_parser = commands.add_parser('serve', help=argparse.SUPPRESS)
+    serve_parser.add_argument('--root', type=Path, required=True)
+    serve_parser.add_argument('--port', type=int, required=True)
+    serve_parser.add_argument('--rpc-port', type=int, required=True)
+
+    args = parser.parse_args(argv)
+    if args.command == 'serve':
+        serve(args.root, args.port, args.rpc_port)
+    elif args.command == 'compare':
+        print(compare(json.loads(args.before.read_text()), json.loads(args.after.read_text())))
+    else:
+        unknown = set(args.scenarios) - set(SCENARIOS)
+        if unknown:
+            parser.error(f"unknown scenarios: {', '.join(sorted(unknown))}")
+        results = run(args)
+        output = args.output or Path(f"bench-{results['commit'] or 'unknown'}-{time.strftime('%Y%m%d-%H%M%S')}.json")
+        output.write_text(json.dumps(results, indent=2) + '\n')
+        for name, result in results['scenarios'].items():
+            latency = result['latency_ms']
+            print(f"{name:<12} {result['throughput_rps']:>8} req/s  p50 {latency['p50']}ms  p95 {latency['p95']}ms  "
+                  f"p99 {latency['p99']}ms  cpu {result['cpu_ms_per_request']}ms/req  errors {result['errors']}")
+        print(f"startup      ready {results['startup_ms']['ready']}ms  first response {results['startup_ms']['first_response']}ms")
+        print(f"Results written to {output}")
+
+
+if __name__ == '__main__':
+    main()
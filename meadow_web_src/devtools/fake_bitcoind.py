@@ -0,0 +1,72 @@
+import argparse
+import os
+import signal
+import threading
+import time
+from pathlib import Path
+from meadow_web.devtools.rpc_stub import RPCStubServer, RPCStubError
+
+# A process that looks enough like bitcoind for the web app's start/stop paths.
+#
+# The benchmark harness installs a symlink to the Python interpreter as bin/bitcoind and
+# runs `bin/bitcoind -m meadow_web.devtools.fake_bitcoind -datadir=...`, so /proc shows
+# an argv[0] named bitcoind and the process probe recognises it. It writes a pidfile,
+# serves the stub RPC (answering -28 "Loading block index…" during warmup) and shuts
+# down on RPC `stop` or SIGTERM after a configurable flush delay, like the real thing.
+# Given -zmqpubhashblock/-zmqpubrawtx (and pyzmq), it also "mines" a block every
+# -blockinterval seconds and publishes -txrate transactions a second, see zmq_publisher.py.
+
+
+def main(argv=None) -> None:
+    parser = argparse.ArgumentParser(prefix_chars='-', description="Fake bitcoind for benchmarks")
+    parser.add_argument('-datadir', required=True)
+    parser.add_argument('-rpcport', type=int, default=8332)
+    parser.add_argument('-warmup', type=float, default=0.5, help="seconds answering RPC_IN_WARMUP")
+    parser.add_argument('-shutdown', type=float, default=0.2, help="seconds spent 'flushing' on stop")
+    parser.add_argument('-rpcdelay', type=float, default=0.0, help="seconds to sleep before each RPC reply")
+    parser.add_argument('-zmqpubhashblock')
+    parser.add_argument('-zmqpubrawtx')
+    parser.add_argument('-blockinterval', type=float, default=0.0, help="seconds between fake blocks (0 = none)")
+    parser.add_argument('-txrate', type=float, default=0.0, help="fake transactions per second")
+    args, _ = parser.parse_known_args(argv)  # ignore real bitcoind options such as -daemon
+
+    data_dir = Path(args.datadir)
+    stopping = threading.Event()
+    started = time.monotonic()
+
+    def getblockcount():
+        if time.monotonic() - started < args.warmup:
+            raise RPCStubError(-28, 'Loading block index…')
+        return stub.state['blocks']
+
+    def stop():
+        stopping.set()
+        return 'Bitcoin Core stopping'
+
+    stub = RPCStubServer(data_dir, port=args.rpcport, delay=args.rpcdelay,
+                         handlers={'getblockcount': getblockcount, 'stop': stop})
+    signal.signal(signal.SIGTERM, lambda signum, frame: stopping.set())
+    signal.signal(signal.SIGINT, lambda signum, frame: stopping.set())
+
+    publisher = None
+    if args.zmqpubhashblock or args.zmqpubrawtx:
+        from meadow_web.devtools.zmq_publisher import ZmqPublisherStub
+        publisher = ZmqPublisherStub(args.zmqpubhashblock or args.zmqpubrawtx, args.zmqpubrawtx or args.zmqpubhashblock)
+        threading.Thread(target=publisher.run, args=(args.blockinterval, args.txrate, stopping, stub.add_block),
+                         name='zmq-publisher', daemon=True).start()
+
+    pidfile = data_dir / 'bitcoind.pid'
+    pidfile.write_text(f"{os.getpid()}\n")
+    stub.start()
+    try:
+        stopping.wait()
+        time.sleep(args.shutdown)
+    finally:
+        stub.stop()
+        if publisher is not None:
+            publisher.close()
+        pidfile.unlink(missing_ok=True)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,249 @@
+import argparse
+import hashlib
+import io
+import os
+import re
+import shutil
+import sys
+import tarfile
+import tempfile
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import List, Optional
+
+# A local stand-in for bitcoincore.org's release folder, to exercise the installer's
+# download/resume/verify path without the network.
+#
+#   python -m meadow_web.devtools.release_server serve --port 8000
+#   python -m meadow_web.devtools.release_server check
+#
+# It serves one small release tarball (bitcoin-<version>/bin/bitcoind, random bytes) and
+# a SHA256SUMS listing it, honours "Range: bytes=N-" with 206 answers, and can cut the
+# connection after a number of bytes to fake a dropped transfer. `check` runs the real
+# installer against it into a throwaway root: a transfer dropped mid-way resumes with a
+# Range request, a .part left by an earlier interrupted run is resumed rather than
+# fetched again, and a tarball that doesn't match SHA256SUMS is rejected and thrown away.
+
+RELEASE_VERSION = '28.1'
+ARCHIVE_NAME = f'bitcoin-{RELEASE_VERSION}-aarch64-linux-gnu.tar.gz'
+
+_RANGE = re.compile(r'^bytes=(\d+)-$')
+
+
+def build_release(size: int = 2 * 1024 * 1024) -> bytes:
+    # A gzipped tarball laid out like a Bitcoin Core release; random contents so it
+    # doesn't compress to nothing and the download takes several chunks
+    payload = os.urandom(size)
+    buffer = io.BytesIO()
+    with tarfile.open(fileobj=buffer, mode='w:gz') as tar:
+        info = tarfile.TarInfo(f'bitcoin-{RELEASE_VERSION}/bin/bitcoind')
+        info.size = len(payload)
+        info.mode = 0o755
+        tar.addfile(info, io.BytesIO(payload))
+    return buffer.getvalue()
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        server: FakeReleaseServer = self.server.release
+        name = self.path.rsplit('/', 1)[-1]
+        if name == 'SHA256SUMS':
+            self._send_body(server.sha256sums.encode())
+            return
+        if name != ARCHIVE_NAME:
+            self.send_error(404)
+            return
+
+        data = server.archive
+        range_header = self.headers.get('Range')
+        server.ranges.append(range_header)
+        match = _RANGE.match(range_header or '') if server.supports_range else None
+        start = int(match.group(1)) if match else 0
+        if start >= len(data) and match:
+            self.send_response(416)
+            self.send_header('Content-Range', f'bytes */{len(data)}')
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+            return
+
+        if match:
+            self.send_response(206)
+            self.send_header('Content-Range', f'bytes {start}-{len(data) - 1}/{len(data)}')
+        else:
+            self.send_response(200)
+        self.send_header('Content-Type', 'application/gzip')
+        self.send_header('Content-Length', str(len(data) - start))
+        self.end_headers()
+
+        body = data[start:]
+        drop_after = server.take_drop()
+        if drop_after is not None and drop_after < len(body):
+            # Promise the whole file, send part of it, hang up
+            self.wfile.write(body[:drop_after])
+            self.wfile.flush()
+            self.close_connection = True
+            return
+        self.wfile.write(body)
+
+    def _send_body(self, body: bytes) -> None:
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/plain')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+class _Server(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def handle_error(self, request, client_address):
+        # The dropped transfers are on purpose
+        pass
+
+
+class FakeReleaseServer:
+    def __init__(self, host: str = '127.0.0.1', port: int = 0, archive: Optional[bytes] = None,
+                 supports_range: bool = True):
+        self.archive = archive if archive is not None else build_release()
+        self.sha256sums = f"{hashlib.sha256(self.archive).hexdigest()}  {ARCHIVE_NAME}\n"
+        self.supports_range = supports_range
+        self.ranges: List[Optional[str]] = []  # Range header of every tarball request, None if absent
+        self._drops: List[int] = []
+        self._lock = threading.Lock()
+
+        self.httpd = _Server((host, port), _Handler)
+        self.httpd.release = self
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def url(self) -> str:
+        host, port = self.httpd.server_address[:2]
+        return f'http://{host}:{port}/bin/bitcoin-core-{RELEASE_VERSION}/{ARCHIVE_NAME}'
+
+    def drop_next(self, after_bytes: int) -> None:
+        # The next tarball request gets cut off after this many bytes
+        with self._lock:
+            self._drops.append(after_bytes)
+
+    def take_drop(self) -> Optional[int]:
+        with self._lock:
+            return self._drops.pop(0) if self._drops else None
+
+    def corrupt_checksum(self) -> None:
+        # SHA256SUMS lists a digest the tarball doesn't have
+        self.sha256sums = f"{'0' * 64}  {ARCHIVE_NAME}\n"
+
+    def start(self) -> 'FakeReleaseServer':
+        self._thread = threading.Thread(target=self.httpd.serve_forever, name='release-server', daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def __enter__(self) -> 'FakeReleaseServer':
+        return self.start()
+
+    def __exit__(self, *exc_info) -> None:
+        self.stop()
+
+
+# --- check: the installer against the fixture ---
+
+def check() -> bool:
+    # Must run before the installer is imported: it binds these config values at import time
+    from meadow_web import config
+    root = Path(tempfile.mkdtemp(prefix='meadow-release-check-'))
+    config.INSTALL_DOWNLOAD_DIR = root / 'downloads'
+    config.BITCOIN_CONF_TEMPLATE = root / 'bitcoin.conf.template'
+    config.BITCOIN_CONF_TEMPLATE.write_text('server=1\n')
+
+    from meadow_web import installer
+    from meadow_web.version_store import VersionStore
+
+    def install(server: FakeReleaseServer, name: str):
+        store = VersionStore(root / name / 'versions', root / name / 'bitcoin', root / name / 'cache', 2)
+        return installer.install_bitcoin_core(server.url, root / name / 'data', store=store), store
+
+    part_path = config.INSTALL_DOWNLOAD_DIR / f'{ARCHIVE_NAME}.part'
+    results = []
+
+    def report(name: str, ok: bool, detail: str) -> None:
+        results.append(ok)
+        print(f"{'ok  ' if ok else 'FAIL'} {name}: {detail}")
+
+    try:
+        with FakeReleaseServer() as server:
+            # A transfer cut off half-way is picked up where it stopped
+            server.drop_next(len(server.archive) // 2)
+            (success, message), store = install(server, 'dropped')
+            binary = store.version_dir(RELEASE_VERSION) / 'bin' / 'bitcoind'
+            report('resume after a dropped transfer',
+                   success and binary.exists() and server.ranges == [None, f'bytes={len(server.archive) // 2}-'],
+                   f"{message}; requests: {server.ranges}")
+
+        with FakeReleaseServer() as server:
+            # What an earlier run that died mid-download leaves behind
+            config.INSTALL_DOWNLOAD_DIR.mkdir(parents=True, exist_ok=True)
+            offset = len(server.archive) // 3
+            part_path.write_bytes(server.archive[:offset])
+            (success, message), _ = install(server, 'partial')
+            report('resume a .part from an earlier run',
+                   success and server.ranges == [f'bytes={offset}-'], f"{message}; requests: {server.ranges}")
+
+        with FakeReleaseServer(supports_range=False) as server:
+            # A server that ignores Range: the bytes we already have are skipped, not duplicated
+            part_path.write_bytes(server.archive[:1000])
+            (success, message), _ = install(server, 'norange')
+            report('resume against a server without Range support', success, message)
+
+        with FakeReleaseServer() as server:
+            server.corrupt_checksum()
+            (success, message), store = install(server, 'badsum')
+            rejected = (not success and 'Checksum mismatch' in message and not part_path.exists()
+                        and not store.has_version(RELEASE_VERSION))
+            report('reject a tarball that fails its checksum', rejected, message)
+    finally:
+        shutil.rmtree(root, ignore_errors=True)
+
+    return all(results)
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Local Bitcoin Core release server for installer tests")
+    commands = parser.add_subparsers(dest='command', required=True)
+    serve_parser = commands.add_parser('serve', help="serve the fake release until interrupted")
+    serve_parser.add_argument('--port', type=int, default=8000)
+    serve_parser.add_argument('--drop-after', type=int, help="cut the first tarball transfer off after this many bytes")
+    serve_parser.add_argument('--no-range', action='store_true', help="ignore Range headers")
+    serve_parser.add_argument('--bad-checksum', action='store_true', help="list a wrong digest in SHA256SUMS")
+    commands.add_parser('check', help="run the installer against the fixture (resume and checksum cases)")
+    args = parser.parse_args(argv)
+
+    if args.command == 'check':
+        return 0 if check() else 1
+
+    server = FakeReleaseServer(port=args.port, supports_range=not args.no_range)
+    if args.drop_after is not None:
+        server.drop_next(args.drop_after)
+    if args.bad_checksum:
+        server.corrupt_checksum()
+    print(f"Serving {server.url} (and SHA256SUMS next to it)")
+    try:
+        server.httpd.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.httpd.server_close()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
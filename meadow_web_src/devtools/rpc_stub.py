@@ -0,0 +1,205 @@
+import argparse
+import base64
+import json
+import secrets
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Any, Callable, Dict, Optional
+
+# A tiny stand-in for bitcoind's JSON-RPC server, for development and tests.
+#
+# It writes a .cookie into the given data directory just like bitcoind does, checks
+# Basic auth against it, speaks single and batch JSON-RPC over keep-alive HTTP/1.1,
+# and answers from a table of handlers you can override or extend.
+
+
+class RPCStubError(Exception):
+    # Raise from a handler to send a JSON-RPC error back
+    def __init__(self, code: int, message: str):
+        super().__init__(message)
+        self.code = code
+        self.message = message
+
+
+def default_handlers(stub: 'RPCStubServer') -> Dict[str, Callable[..., Any]]:
+    # Canned answers shaped like bitcoind 28.x during IBD
+    def getblockheader(block_hash, verbose=True):
+        if block_hash not in stub.block_heights:
+            raise RPCStubError(-5, 'Block not found')
+        height = stub.block_heights[block_hash]
+        return {'hash': block_hash, 'height': height, 'confirmations': stub.state['blocks'] - height + 1,
+                'time': int(stub.started_at) + height, 'mediantime': int(stub.started_at) + height - 1}
+
+    return {
+        'getblockchaininfo': lambda: {
+            'chain': 'main',
+            'blocks': stub.state['blocks'],
+            'headers': stub.state['headers'],
+            'bestblockhash': '00' * 32,
+            'verificationprogress': stub.state['blocks'] / max(stub.state['headers'], 1),
+            'initialblockdownload': stub.state['blocks'] < stub.state['headers'],
+            'size_on_disk': stub.state['blocks'] * 1_000_000,
+            'pruned': False
+        },
+        'getchainstates': lambda: {
+            'headers': stub.state['headers'],
+            'chainstates': [{'blocks': stub.state['blocks'], 'bestblockhash': '00' * 32,
+                             'verificationprogress': stub.state['blocks'] / max(stub.state['headers'], 1),
+                             'coins_db_cache_bytes': 8 << 20, 'coins_tip_cache_bytes': 400 << 20,
+                             'validated': True}]
+        },
+        'getnetworkinfo': lambda: {'version': 280100, 'subversion': '/Satoshi:28.1.0/', 'connections': 8,
+                                   'connections_in': 0, 'connections_out': 8},
+        'getmempoolinfo': lambda: {'loaded': True, 'size': 1200, 'bytes': 800_000, 'usage': 4_000_000},
+        'getblockcount': lambda: stub.state['blocks'],
+        'getblockheader': getblockheader,
+        'getconnectioncount': lambda: 8,
+        'uptime': lambda: int(time.time() - stub.started_at),
+        'stop': lambda: 'Bitcoin Core stopping',
+    }
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'  # keep-alive, like bitcoind
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send(self, status: int, payload: Any) -> None:
+        body = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_POST(self):
+        stub: RPCStubServer = self.server.stub
+        length = int(self.headers.get('Content-Length', 0))
+        body = self.rfile.read(length)
+
+        if self.headers.get('Authorization') != stub.auth_header:
+            self.send_response(401)
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+            return
+
+        stub.request_count += 1
+        if stub.delay:
+            time.sleep(stub.delay)
+
+        try:
+            request = json.loads(body)
+        except ValueError:
+            self._send(500, {'result': None, 'error': {'code': -32700, 'message': 'Parse error'}, 'id': None})
+            return
+
+        if isinstance(request, list):
+            self._send(200, [stub.dispatch(item) for item in request])
+        else:
+            reply = stub.dispatch(request)
+            # Like bitcoind's JSON-RPC 1.0 mode: errors come back with HTTP 500/404
+            status = 200
+            if reply['error']:
+                status = 404 if reply['error']['code'] == -32601 else 500
+            self._send(status, reply)
+
+
+class _Server(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def handle_error(self, request, client_address):
+        # Clients hanging up mid-reply (e.g. timeout tests) are expected, not worth a traceback
+        pass
+
+
+class RPCStubServer:
+    def __init__(self, data_dir: Path, host: str = '127.0.0.1', port: int = 0,
+                 handlers: Optional[Dict[str, Callable[..., Any]]] = None, delay: float = 0.0):
+        self.data_dir = Path(data_dir)
+        self.delay = delay
+        self.started_at = time.time()
+        self.request_count = 0
+        self.state = {'blocks': 800_000, 'headers': 870_000}
+        self.block_heights: Dict[str, int] = {}  # hashes of blocks "mined" with add_block()
+        self.calls: Dict[str, int] = {}
+
+        self.handlers = default_handlers(self)
+        self.handlers.update(handlers or {})
+
+        self.httpd = _Server((host, port), _Handler)
+        self.httpd.stub = self
+        self._thread: Optional[threading.Thread] = None
+        self.rotate_cookie()
+
+    @property
+    def port(self) -> int:
+        return self.httpd.server_address[1]
+
+    def rotate_cookie(self) -> None:
+        # What bitcoind does on every restart
+        cookie = f'__cookie__:{secrets.token_hex(32)}'
+        self.data_dir.mkdir(parents=True, exist_ok=True)
+        (self.data_dir / '.cookie').write_text(cookie)
+        self.auth_header = 'Basic ' + base64.b64encode(cookie.encode()).decode()
+
+    def dispatch(self, request: Dict[str, Any]) -> Dict[str, Any]:
+        method = request.get('method')
+        self.calls[method] = self.calls.get(method, 0) + 1
+        handler = self.handlers.get(method)
+        reply = {'result': None, 'error': None, 'id': request.get('id')}
+        if handler is None:
+            reply['error'] = {'code': -32601, 'message': 'Method not found'}
+            return reply
+        try:
+            reply['result'] = handler(*request.get('params', []))
+        except RPCStubError as e:
+            reply['error'] = {'code': e.code, 'message': e.message}
+        return reply
+
+    def add_block(self) -> str:
+        # A new tip: the chain grows by one and getblockheader knows its (random) hash
+        self.state['blocks'] += 1
+        self.state['headers'] = max(self.state['headers'], self.state['blocks'])
+        block_hash = secrets.token_hex(32)
+        self.block_heights[block_hash] = self.state['blocks']
+        return block_hash
+
+    def start(self) -> 'RPCStubServer':
+        self._thread = threading.Thread(target=self.httpd.serve_forever, name='rpc-stub', daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self.httpd.shutdown()
+        self.httpd.server_close()
+        (self.data_dir / '.cookie').unlink(missing_ok=True)
+
+    def __enter__(self) -> 'RPCStubServer':
+        return self.start()
+
+    def __exit__(self, *exc_info) -> None:
+        self.stop()
+
+
+def main(argv=None) -> None:
+    parser = argparse.ArgumentParser(description="Stub bitcoind JSON-RPC server")
+    parser.add_argument('--datadir', required=True, help="where to write the .cookie file")
+    parser.add_argument('--port', type=int, default=18332)
+    parser.add_argument('--delay', type=float, default=0.0, help="seconds to sleep before each reply")
+    args = parser.parse_args(argv)
+
+    stub = RPCStubServer(Path(args.datadir), port=args.port, delay=args.delay)
+    print(f"Stub RPC server on 127.0.0.1:{stub.port}, cookie in {stub.data_dir / '.cookie'}")
+    try:
+        stub.httpd.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        stub.stop()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,118 @@
+import argparse
+import secrets
+import struct
+import threading
+import time
+from typing import Callable, Dict, Optional
+
+import zmq
+
+# A stand-in for bitcoind's ZMQ notifications, for development and tests.
+#
+# Binds PUB sockets like bitcoind's -zmqpubhashblock/-zmqpubrawtx and sends the same
+# three-part messages: topic, body (block hash / serialized transaction), and a 4-byte
+# little-endian sequence number counting up per topic. Run it on its own:
+#
+#   python -m meadow_web.devtools.zmq_publisher --block-interval 10 --tx-rate 5
+#
+# or let fake_bitcoind.py run one next to its stub RPC, so getblockheader knows the blocks.
+
+
+def _varint(n: int) -> bytes:
+    if n < 0xfd:
+        return bytes([n])
+    if n <= 0xffff:
+        return b'\xfd' + struct.pack('<H', n)
+    return b'\xfe' + struct.pack('<I', n)
+
+
+def fake_tx(inputs: int = 1, outputs: int = 2, segwit: bool = True) -> bytes:
+    # A well-formed (but unspendable) transaction: P2WPKH-shaped inputs and outputs
+    tx = struct.pack('<i', 2)
+    if segwit:
+        tx += b'\x00\x01'
+    tx += _varint(inputs)
+    for _ in range(inputs):
+        tx += secrets.token_bytes(32) + struct.pack('<I', 0) + _varint(0) + struct.pack('<I', 0xfffffffd)
+    tx += _varint(outputs)
+    for _ in range(outputs):
+        tx += struct.pack('<q', 10_000) + _varint(22) + b'\x00\x14' + secrets.token_bytes(20)
+    if segwit:
+        for _ in range(inputs):
+            tx += _varint(2) + _varint(71) + secrets.token_bytes(71) + _varint(33) + secrets.token_bytes(33)
+    return tx + struct.pack('<I', 0)
+
+
+class ZmqPublisherStub:
+
+    def __init__(self, hashblock_endpoint: str = 'tcp://127.0.0.1:28332',
+                 rawtx_endpoint: str = 'tcp://127.0.0.1:28333'):
+        self._context = zmq.Context.instance()
+        # bitcoind allows several topics on one address, so sockets are per endpoint
+        self._sockets: Dict[str, zmq.Socket] = {}
+        self._endpoints = {b'hashblock': hashblock_endpoint, b'rawtx': rawtx_endpoint}
+        for endpoint in set(self._endpoints.values()):
+            socket = self._context.socket(zmq.PUB)
+            socket.bind(endpoint)
+            self._sockets[endpoint] = socket
+        self._sequence: Dict[bytes, int] = {}
+        self._lock = threading.Lock()
+
+    def _publish(self, topic: bytes, body: bytes) -> None:
+        with self._lock:
+            sequence = self._sequence.get(topic, 0)
+            self._sequence[topic] = (sequence + 1) & 0xffffffff
+            self._sockets[self._endpoints[topic]].send_multipart([topic, body, struct.pack('<I', sequence)])
+
+    def publish_block(self, block_hash: Optional[str] = None) -> str:
+        # block_hash as RPC shows it (hex, most significant byte first), which is how bitcoind sends it
+        block_hash = block_hash or secrets.token_hex(32)
+        self._publish(b'hashblock', bytes.fromhex(block_hash))
+        return block_hash
+
+    def publish_tx(self, raw: Optional[bytes] = None) -> None:
+        self._publish(b'rawtx', raw or fake_tx())
+
+    def skip(self, topic: bytes, count: int = 1) -> None:
+        # Pretend `count` notifications were lost (bitcoind's send queue overflowed)
+        with self._lock:
+            self._sequence[topic] = (self._sequence.get(topic, 0) + count) & 0xffffffff
+
+    def run(self, block_interval: float, tx_rate: float, stop: threading.Event,
+            next_block: Callable[[], Optional[str]] = lambda: None) -> None:
+        # Publishes a block every block_interval seconds and tx_rate transactions per
+        # second (either may be 0) until `stop` is set. next_block() names the new tip
+        next_block_at = time.monotonic() + block_interval if block_interval else None
+        tx_gap = 1 / tx_rate if tx_rate else 1.0
+        while not stop.wait(tx_gap if tx_rate else 0.2):
+            if tx_rate:
+                self.publish_tx()
+            if next_block_at is not None and time.monotonic() >= next_block_at:
+                self.publish_block(next_block())
+                next_block_at += block_interval
+
+    def close(self) -> None:
+        for socket in self._sockets.values():
+            socket.close(linger=0)
+
+
+def main(argv=None) -> None:
+    parser = argparse.ArgumentParser(description="Stub bitcoind ZMQ publisher")
+    parser.add_argument('--hashblock', default='tcp://127.0.0.1:28332')
+    parser.add_argument('--rawtx', default='tcp://127.0.0.1:28333')
+    parser.add_argument('--block-interval', type=float, default=10.0, help="seconds between blocks (0 = none)")
+    parser.add_argument('--tx-rate', type=float, default=2.0, help="transactions per second (0 = none)")
+    args = parser.parse_args(argv)
+
+    publisher = ZmqPublisherStub(args.hashblock, args.rawtx)
+    print(f"Publishing hashblock on {args.hashblock}, rawtx on {args.rawtx}")
+    try:
+        publisher.run(args.block_interval, args.tx_rate, threading.Event())
+    except KeyboardInterrupt:
+        pass
+    finally:
+        publisher.close()
+
+
+if __name__ == '__main__':
+    main()
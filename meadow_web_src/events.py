@@ -0,0 +1,89 @@
+import threading
+import logging
+from collections import deque
+from typing import Any, Deque, List, Set, Tuple
+from meadow_web.config import EVENT_QUEUE_SIZE
+
+logger = logging.getLogger(__name__)
+
+# Fan-out of server-side events (status changes, new blocks, mempool activity) to every
+# open dashboard, over its one status stream.
+#
+# Each stream subscribes and gets its own queue, capped at EVENT_QUEUE_SIZE. Publishing
+# never blocks on a client: when a queue is full its backlog is thrown away and the
+# client is told to resync (fetch the current state once) – so a stalled browser costs
+# a bounded amount of memory however many events go by.
+
+
+class Subscription:
+
+    def __init__(self, hub: 'EventHub', max_events: int):
+        self._hub = hub
+        self._cond = threading.Condition()
+        self._events: Deque[Tuple[str, Any]] = deque()
+        self._lagged = False
+        self.max_events = max_events
+        self.dropped = 0
+
+    def push(self, event: str, data: Any) -> None:
+        with self._cond:
+            if len(self._events) >= self.max_events:
+                self.dropped += len(self._events)
+                self._events.clear()
+                self._lagged = True
+            self._events.append((event, data))
+            self._cond.notify()
+
+    def get(self, timeout: float) -> Tuple[List[Tuple[str, Any]], bool]:
+        # Waits up to `timeout` for events. Returns ([(event, data), ...], lagged) –
+        # lagged means some were dropped since the last call and the client must resync
+        with self._cond:
+            if not self._events and not self._lagged:
+                self._cond.wait(timeout)
+            events = list(self._events)
+            self._events.clear()
+            lagged, self._lagged = self._lagged, False
+            return events, lagged
+
+    def close(self) -> None:
+        self._hub._unsubscribe(self)
+
+    def __enter__(self) -> 'Subscription':
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+
+class EventHub:
+
+    def __init__(self, max_events: int = EVENT_QUEUE_SIZE):
+        self.max_events = max_events
+        self._lock = threading.Lock()
+        self._subscribers: Set[Subscription] = set()
+
+    def subscribe(self) -> Subscription:
+        subscription = Subscription(self, self.max_events)
+        with self._lock:
+            self._subscribers.add(subscription)
+        return subscription
+
+    def _unsubscribe(self, subscription: Subscription) -> None:
+        with self._lock:
+            self._subscribers.discard(subscription)
+        if subscription.dropped:
+            logger.debug(f"Event stream closed after dropping {subscription.dropped} events for a slow client")
+
+    def publish(self, event: str, data: Any) -> None:
+        with self._lock:
+            subscribers = list(self._subscribers)
+        for subscription in subscribers:
+            subscription.push(event, data)
+
+    @property
+    def subscriber_count(self) -> int:
+        with self._lock:
+            return len(self._subscribers)
+
+
+event_hub = EventHub()
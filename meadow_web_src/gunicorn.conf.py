@@ -0,0 +1,54 @@
+# gunicorn settings for the device – S50meadowweb runs
+#   gunicorn -c /usr/share/meadow_web/gunicorn.conf.py "meadow_web.app:create_app()"
+# nginx talks to it over a unix socket with keep-alive (see /etc/nginx/nginx.conf)
+import os
+import sys
+from pathlib import Path
+
+# Same trick as app.py: make the meadow_web package importable from its parent folder
+project_root = str(Path(__file__).absolute().parent.parent)
+if project_root not in sys.path:
+    sys.path.insert(0, project_root)
+
+from meadow_web.config import (
+    WEB_SOCKET,
+    WEB_PIDFILE,
+    WEB_THREADS,
+    WEB_GRACEFUL_TIMEOUT,
+    WEB_KEEPALIVE,
+    WEB_LOG
+)
+
+bind = f'unix:{WEB_SOCKET}'
+umask = 0o022  # applies to every file the app writes (gunicorn's default is 0)
+pidfile = WEB_PIDFILE
+daemon = True
+
+# A single worker with threads: background threads (status monitor, sampler, jobs,
+# supervisor) must exist exactly once – which is also why S50meadowweb never reloads with
+# HUP (old and new worker overlap). SSE streams park a thread each while they wait,
+# which gthread handles fine; the worker heartbeat doesn't care how long a response runs.
+workers = 1
+worker_class = 'gthread'
+threads = WEB_THREADS
+# Import the app in the worker, not the master – threads don't survive fork()
+preload_app = False
+
+timeout = 60  # a worker that stops heart-beating this long is restarted
+graceful_timeout = WEB_GRACEFUL_TIMEOUT
+keepalive = WEB_KEEPALIVE
+
+# nginx is the only client; it passes on where the request really came from
+forwarded_allow_ips = '*'
+
+errorlog = WEB_LOG
+loglevel = 'info'
+capture_output = True  # the app's own log output ends up in WEB_LOG too
+accesslog = None  # nginx already logs every request
+
+
+def when_ready(server):
+    # nginx's workers run as nobody and need to connect to the socket
+    for address in server.cfg.bind:
+        if address.startswith('unix:'):
+            os.chmod(address[len('unix:'):], 0o666)
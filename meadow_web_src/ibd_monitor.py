@@ -0,0 +1,159 @@
+import threading
+import time
+import logging
+from collections import Counter, deque
+from typing import Any, Dict, Optional
+from meadow_web.config import (
+    IBD_CORE_BOUND_PERCENT,
+    IBD_CPU_BOUND_PERCENT,
+    IBD_DISK_BOUND_PERCENT,
+    IBD_IOWAIT_BOUND_PERCENT,
+    IBD_MEMORY_BOUND_PERCENT,
+    IBD_SWAP_BOUND_MB_PER_SEC,
+    IBD_RATE_SMOOTHING,
+    IBD_BOTTLENECK_WINDOW
+)
+
+logger = logging.getLogger(__name__)
+
+# What is holding the initial block download back during one sample interval
+BOTTLENECK_CPU = 'cpu'      # signature/script validation keeps the cores busy
+BOTTLENECK_DISK = 'disk'    # the chainstate database is waiting on the data disk
+BOTTLENECK_MEMORY = 'memory'  # dbcache has squeezed out the page cache, or the box is swapping
+BOTTLENECK_PEERS = 'peers'  # nothing is saturated – we're waiting for blocks to arrive
+
+
+def classify(cpu_percent: Optional[float], iowait_percent: Optional[float],
+             disk_percent: Optional[float], core_percent: Optional[float] = None,
+             memory_percent: Optional[float] = None, swap_mb_per_sec: Optional[float] = None) -> str:
+    # Whichever resource is closest to (or past) its saturation threshold wins;
+    # if none reaches it, the node is idling on the network. CPU counts as saturated
+    # when all cores are busy, or – if given – when the busiest single core is pegged.
+    scores = {
+        BOTTLENECK_DISK: max((disk_percent or 0) / IBD_DISK_BOUND_PERCENT,
+                             (iowait_percent or 0) / IBD_IOWAIT_BOUND_PERCENT),
+        BOTTLENECK_MEMORY: max((memory_percent or 0) / IBD_MEMORY_BOUND_PERCENT,
+                               (swap_mb_per_sec or 0) / IBD_SWAP_BOUND_MB_PER_SEC),
+        BOTTLENECK_CPU: max((cpu_percent or 0) / IBD_CPU_BOUND_PERCENT,
+                            (core_percent or 0) / IBD_CORE_BOUND_PERCENT),
+    }
+    # On a tie the earlier one wins: disk, then memory, then CPU
+    verdict = max(scores, key=scores.get)
+    return verdict if scores[verdict] >= 1 else BOTTLENECK_PEERS
+
+
+class IBDMonitor:
+    # Turns successive getblockchaininfo samples plus /proc resource readings into
+    # sync throughput (blocks/s, MB/s of validated chain), a smoothed ETA and a
+    # per-interval bottleneck verdict.
+    #
+    # It doesn't sample anything itself – the sampler feeds it every interval.
+
+    def __init__(self, smoothing: float = IBD_RATE_SMOOTHING, window: int = IBD_BOTTLENECK_WINDOW):
+        self.smoothing = smoothing
+        self._lock = threading.Lock()
+        self._verdicts = deque(maxlen=window)
+        self._reset()
+
+    def _reset(self) -> None:
+        self._last: Optional[Dict[str, Any]] = None
+        self._blocks_per_sec: Optional[float] = None
+        self._mb_per_sec: Optional[float] = None
+        self._state: Dict[str, Any] = {}
+        self._verdicts.clear()
+
+    def _smooth(self, current: Optional[float], sample: float) -> float:
+        if current is None:
+            return sample
+        return self.smoothing * sample + (1 - self.smoothing) * current
+
+    def observe(self, now: float, chain: Optional[Dict[str, Any]], peers: Optional[int] = None,
+                cpu_percent: Optional[float] = None, iowait_percent: Optional[float] = None,
+                disk_percent: Optional[float] = None, core_percent: Optional[float] = None,
+                memory_percent: Optional[float] = None,
+                swap_mb_per_sec: Optional[float] = None) -> Dict[str, Any]:
+        # Feeds one sample; returns this interval's raw rates and verdict (empty when
+        # there's nothing to compare against yet)
+        with self._lock:
+            if not chain or chain.get('blocks') is None:
+                # Node is down or still warming up – rates across a restart mean nothing
+                self._reset()
+                return {}
+
+            blocks = chain['blocks']
+            headers = chain.get('headers') or blocks
+            size = chain.get('size_on_disk') or 0
+            in_ibd = bool(chain.get('initialblockdownload'))
+
+            interval: Dict[str, Any] = {}
+            last = self._last
+            if last and now > last['time'] and blocks >= last['blocks']:
+                elapsed = now - last['time']
+                interval['blocks_per_sec'] = (blocks - last['blocks']) / elapsed
+                # size_on_disk shrinks when a pruned node deletes old block files
+                interval['mb_per_sec'] = max(size - last['size'], 0) / elapsed / 1e6
+                self._blocks_per_sec = self._smooth(self._blocks_per_sec, interval['blocks_per_sec'])
+                self._mb_per_sec = self._smooth(self._mb_per_sec, interval['mb_per_sec'])
+
+                if in_ibd:
+                    interval['bottleneck'] = classify(cpu_percent, iowait_percent, disk_percent, core_percent,
+                                                      memory_percent, swap_mb_per_sec)
+                    self._verdicts.append(interval['bottleneck'])
+            elif last and blocks < last['blocks']:
+                # Reindex or a switch to a different chain – start over
+                self._reset()
+
+            if not in_ibd:
+                self._verdicts.clear()
+
+            self._last = {'time': now, 'blocks': blocks, 'size': size}
+
+            remaining = max(headers - blocks, 0)
+            eta = None
+            if remaining == 0:
+                eta = 0
+            elif self._blocks_per_sec:
+                # Later blocks are bigger than early ones, so this errs on the optimistic side
+                eta = remaining / self._blocks_per_sec
+
+            self._state = {
+                'updated': now,
+                'initial_block_download': in_ibd,
+                'blocks': blocks,
+                'headers': headers,
+                'remaining_blocks': remaining,
+                'verification_progress': chain.get('verificationprogress'),
+                'blocks_per_sec': self._blocks_per_sec,
+                'mb_per_sec': self._mb_per_sec,
+                'eta': eta,
+                'bottleneck': interval.get('bottleneck'),
+                'peers': peers,
+                'cpu_percent': cpu_percent,
+                'core_percent': core_percent,
+                'iowait_percent': iowait_percent,
+                'disk_percent': disk_percent,
+                'memory_percent': memory_percent,
+                'swap_mb_per_sec': swap_mb_per_sec
+            }
+            return interval
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            if not self._state:
+                return {'available': False}
+            state = dict(self._state)
+            counts = Counter(self._verdicts)
+
+        # How the recent intervals split up, e.g. {'disk': 0.7, 'cpu': 0.3, 'peers': 0.0}
+        total = sum(counts.values())
+        state['bottleneck_share'] = {
+            verdict: (counts[verdict] / total if total else 0.0)
+            for verdict in (BOTTLENECK_CPU, BOTTLENECK_DISK, BOTTLENECK_MEMORY, BOTTLENECK_PEERS)
+        }
+        state['dominant_bottleneck'] = counts.most_common(1)[0][0] if counts else None
+        state['available'] = True
+        state['age'] = time.time() - state['updated']
+        return state
+
+
+ibd_monitor = IBDMonitor()
@@ -0,0 +1,379 @@
+import argparse
+import hashlib
+import http.client
+import logging
+import os
+import shutil
+import sys
+import tarfile
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+from pathlib import Path
+from typing import Callable, Dict, Optional, Tuple
+from meadow_web.config import (
+    BITCOIN_INSTALL_URL,
+    BITCOIN_INSTALL_DIR,
+    BITCOIN_VERSIONS_DIR,
+    BITCOIN_ARTIFACT_CACHE_DIR,
+    BITCOIN_ARTIFACT_CACHE_KEEP,
+    BITCOIN_DATA_DIR,
+    BITCOIN_CONF_TEMPLATE,
+    INSTALL_DOWNLOAD_DIR
+)
+from meadow_web.conf_tuner import apply_tuning
+from meadow_web.version_store import VersionStore, version_store, version_from_archive
+
+logger = logging.getLogger(__name__)
+
+# Streaming installer for Bitcoin Core.
+#
+# The release tarball is read from the network exactly once: every chunk goes to the
+# SHA256 hasher, to a .part file (so an interrupted download can resume with an HTTP
+# Range request) and straight into tarfile's streaming mode, which unpacks into a
+# staging directory. No gunzipped copy, no second extraction copy.
+#
+# Each release gets its own directory in the version store and the verified tarball
+# is cached, so reinstalling or going back to an older release needs no network.
+
+CHUNK_SIZE = 256 * 1024
+HTTP_TIMEOUT = 30
+MAX_RETRIES = 5
+
+# Don't flood the job registry (and every progress stream) with an update per chunk
+_PROGRESS_INTERVAL = 1.0
+
+
+class InstallError(Exception):
+    pass
+
+
+class CorruptArchiveError(InstallError):
+    pass
+
+
+def sha256sums_url(url: str) -> str:
+    # Bitcoin Core publishes SHA256SUMS next to the release archives
+    return url.rsplit('/', 1)[0] + '/SHA256SUMS'
+
+
+def fetch_sha256sums(url: str) -> Dict[str, str]:
+    # Parses a SHA256SUMS file into {filename: hex digest}
+    with urllib.request.urlopen(url, timeout=HTTP_TIMEOUT) as response:
+        text = response.read().decode('utf-8', 'replace')
+
+    sums = {}
+    for line in text.splitlines():
+        parts = line.split()
+        if len(parts) == 2:
+            digest, name = parts
+            sums[name.lstrip('*')] = digest.lower()
+    return sums
+
+
+class HashingReader:
+    # Read-only file object for tarfile's 'r|gz' mode that hashes (and reports) every byte read
+
+    def __init__(self, fileobj, progress: Callable[..., None], total: Optional[int] = None):
+        self.progress = progress
+        self.sha256 = hashlib.sha256()
+        self.offset = 0
+        self.total = total
+        self._fileobj = fileobj
+        self._reported_at = 0.0
+
+    def read(self, size: int = -1) -> bytes:
+        if size is None or size < 0:
+            size = CHUNK_SIZE
+        data = self._fileobj.read(size)
+        self._consume(data)
+        return data
+
+    def _consume(self, data: bytes) -> None:
+        self.sha256.update(data)
+        self.offset += len(data)
+        now = time.monotonic()
+        if now - self._reported_at >= _PROGRESS_INTERVAL:
+            self._reported_at = now
+            self.progress(bytes_done=self.offset, bytes_total=self.total)
+
+    def drain(self) -> None:
+        # tarfile stops at the end-of-archive marker; hash whatever trails it too
+        while self.read(CHUNK_SIZE):
+            pass
+        self.progress(bytes_done=self.offset, bytes_total=self.total)
+
+    def close(self) -> None:
+        self._fileobj.close()
+
+
+class ResumableDownload(HashingReader):
+    # HashingReader over an HTTP download.
+    #
+    # Bytes already in the .part file are replayed from disk first, then the rest is
+    # fetched with a Range request. Dropped connections are retried from the current
+    # offset.
+
+    def __init__(self, url: str, part_path: Path, progress: Callable[..., None]):
+        super().__init__(None, progress)
+        self.url = url
+        self.part_path = part_path
+
+        self._response = None
+        self._retries = 0
+        self._replay = None
+        if part_path.exists() and part_path.stat().st_size > 0:
+            logger.info(f"Resuming download of {url} at byte {part_path.stat().st_size}")
+            self._replay = open(part_path, 'rb')
+        self._sink = open(part_path, 'ab')
+
+    def read(self, size: int = -1) -> bytes:
+        if size is None or size < 0:
+            size = CHUNK_SIZE
+
+        if self._replay is not None:
+            data = self._replay.read(size)
+            if data:
+                self._consume(data)
+                return data
+            self._replay.close()
+            self._replay = None
+
+        while True:
+            if self._response is None:
+                if self.total is not None and self.offset >= self.total:
+                    return b''
+                if not self._open():
+                    continue
+
+            try:
+                data = self._response.read(size)
+            except (OSError, http.client.HTTPException) as e:
+                self._retry(e)
+                continue
+
+            if not data:
+                if self.total is not None and self.offset < self.total:
+                    self._retry(InstallError("connection closed early"))
+                    continue
+                return b''
+
+            self._retries = 0
+            self._sink.write(data)
+            self._consume(data)
+            return data
+
+    def _open(self) -> bool:
+        request = urllib.request.Request(self.url)
+        if self.offset:
+            request.add_header('Range', f'bytes={self.offset}-')
+
+        try:
+            response = urllib.request.urlopen(request, timeout=HTTP_TIMEOUT)
+        except urllib.error.HTTPError as e:
+            if e.code == 416 and self.offset:
+                # We already have the whole file – the previous run died after the download
+                self.total = self.offset
+                return False
+            raise InstallError(f"Download failed: HTTP {e.code} {e.reason}")
+        except (OSError, http.client.HTTPException) as e:
+            self._retry(e)
+            return False
+
+        if response.status == 206:
+            content_range = response.headers.get('Content-Range', '')
+            total = content_range.rsplit('/', 1)[-1]
+            self.total = int(total) if total.isdigit() else None
+        else:
+            length = response.headers.get('Content-Length')
+            self.total = int(length) if length else None
+            if self.offset:
+                # Server ignored the Range header: skip what we already have
+                logger.warning("Server does not support resume, skipping already downloaded bytes")
+                self._skip(response, self.offset)
+
+        self._response = response
+        return True
+
+    def _skip(self, response, count: int) -> None:
+        while count > 0:
+            data = response.read(min(count, CHUNK_SIZE))
+            if not data:
+                raise InstallError("Download ended before the resume point")
+            count -= len(data)
+
+    def _retry(self, error: Exception) -> None:
+        self._close_response()
+        self._retries += 1
+        if self._retries > MAX_RETRIES:
+            raise InstallError(f"Download failed after {MAX_RETRIES} retries: {error}")
+        delay = min(2 ** self._retries, 30)
+        logger.warning(f"Download interrupted at byte {self.offset} ({error}), retrying in {delay}s")
+        time.sleep(delay)
+
+    def _close_response(self) -> None:
+        if self._response is not None:
+            self._response.close()
+            self._response = None
+
+    def close(self) -> None:
+        self._close_response()
+        if self._replay is not None:
+            self._replay.close()
+        self._sink.close()
+
+
+def _extract_stream(tar: tarfile.TarFile, staging: Path) -> None:
+    # Unpacks members as they stream past, dropping the top-level bitcoin-x.y/ folder
+    for member in tar:
+        parts = member.name.split('/', 1)
+        if len(parts) < 2 or not parts[1]:
+            continue
+        member.name = parts[1]
+        if member.islnk():
+            member.linkname = member.linkname.split('/', 1)[-1]
+        if hasattr(tarfile, 'data_filter'):
+            tar.extract(member, staging, filter='data')
+        else:
+            tar.extract(member, staging)
+
+
+def _unpack(reader: HashingReader, staging: Path) -> None:
+    try:
+        with tarfile.open(fileobj=reader, mode='r|gz') as tar:
+            _extract_stream(tar, staging)
+        reader.drain()
+    except tarfile.TarError as e:
+        raise CorruptArchiveError(f"archive is corrupt ({e})")
+
+
+def _unpack_cached(store: VersionStore, archive_name: str, version: str,
+                   progress: Callable[..., None]) -> bool:
+    # Unpacks a tarball from the local cache – no network at all. False if there is none.
+    cached = store.cached_archive(archive_name)
+    if cached is None:
+        return False
+    path, expected = cached
+
+    progress(phase='extract', message=f"Unpacking cached {archive_name}")
+    reader = HashingReader(open(path, 'rb'), progress, total=path.stat().st_size)
+    try:
+        _unpack(reader, store.staging_dir(version))
+    except CorruptArchiveError:
+        store.forget_archive(archive_name)
+        raise
+    finally:
+        reader.close()
+
+    progress(phase='verify', message="Verifying SHA256 checksum")
+    digest = reader.sha256.hexdigest()
+    if digest != expected:
+        store.forget_archive(archive_name)
+        raise InstallError(f"Cached {archive_name} is damaged (checksum mismatch), removed it")
+    return True
+
+
+def _download_and_unpack(store: VersionStore, url: str, archive_name: str, version: str,
+                         progress: Callable[..., None]) -> None:
+    progress(phase='download', message=f"Downloading and unpacking {archive_name}")
+
+    # Get the expected hash first – no point downloading 50 MB we can't verify
+    expected = fetch_sha256sums(sha256sums_url(url)).get(archive_name)
+    if expected is None:
+        raise InstallError(f"{archive_name} is not listed in SHA256SUMS")
+
+    INSTALL_DOWNLOAD_DIR.mkdir(parents=True, exist_ok=True)
+    part_path = INSTALL_DOWNLOAD_DIR / f'{archive_name}.part'
+
+    download = ResumableDownload(url, part_path, progress)
+    try:
+        _unpack(download, store.staging_dir(version))
+    except CorruptArchiveError:
+        # A broken archive means the partial download is garbage too – start fresh next time
+        part_path.unlink()
+        raise
+    finally:
+        download.close()
+
+    progress(phase='verify', message="Verifying SHA256 checksum")
+    digest = download.sha256.hexdigest()
+    if digest != expected:
+        part_path.unlink()
+        raise InstallError(f"Checksum mismatch for {archive_name}: expected {expected}, got {digest}")
+
+    # Keep the verified tarball so a reinstall or rollback never needs the network
+    store.store_archive(part_path, archive_name, digest)
+
+
+def install_bitcoin_core(url: str = BITCOIN_INSTALL_URL, data_dir: Path = BITCOIN_DATA_DIR,
+                         progress: Optional[Callable[..., None]] = None,
+                         store: VersionStore = version_store) -> Tuple[bool, str]:
+    # Installs the release at `url` into its own version directory and makes it the active one.
+    # `progress` gets keyword updates (phase, bytes_done, bytes_total, message) – Job.update fits.
+    progress = progress or (lambda **kwargs: None)
+    data_dir = Path(data_dir)
+    archive_name = os.path.basename(urllib.parse.urlparse(url).path)
+    version = version_from_archive(archive_name)
+    staging = store.staging_dir(version) if version else None
+
+    try:
+        if version is None:
+            raise InstallError(f"Can't tell the Bitcoin Core version from {archive_name}")
+        logger.info(f"Installing Bitcoin Core {version} from {url}")
+
+        if store.has_version(version):
+            progress(phase='move', message=f"Bitcoin Core {version} is already installed, switching to it")
+        else:
+            shutil.rmtree(staging, ignore_errors=True)
+            staging.mkdir(parents=True)
+            if not _unpack_cached(store, archive_name, version, progress):
+                _download_and_unpack(store, url, archive_name, version, progress)
+            progress(phase='move', message=f"Installing Bitcoin Core {version}")
+            store.commit_staging(version)
+
+        store.activate(version)
+
+        # Stock template, sized for this box (previous file kept for rollback)
+        progress(phase='config', message=f"Writing a bitcoin.conf tuned for this hardware to {data_dir}")
+        tuned, tune_msg = apply_tuning(data_dir=data_dir, base=BITCOIN_CONF_TEMPLATE)
+        if not tuned:
+            raise InstallError(tune_msg)
+
+        success_msg = f"Bitcoin Core {version} installed successfully to {store.active_link}"
+        logger.info(success_msg)
+        return True, success_msg
+
+    except (InstallError, OSError, ValueError, urllib.error.URLError) as e:
+        # The .part file stays around (unless it failed verification) so a retry can resume
+        if staging is not None:
+            shutil.rmtree(staging, ignore_errors=True)
+        error_msg = f"Installation failed: {str(e)}"
+        logger.error(error_msg)
+        return False, error_msg
+
+
+def main(argv=None) -> int:
+    # Same arguments as the old install-bitcoin.sh, so the wrapper script can hand them straight over
+    parser = argparse.ArgumentParser(description="Download, verify and install Bitcoin Core")
+    parser.add_argument('--url', default=BITCOIN_INSTALL_URL)
+    parser.add_argument('--dest', default=str(BITCOIN_INSTALL_DIR),
+                        help="symlink that points at the active version")
+    parser.add_argument('--versions_dir', default=str(BITCOIN_VERSIONS_DIR))
+    parser.add_argument('--data_dir_dest', default=str(BITCOIN_DATA_DIR))
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format='[bitcoin-install] %(message)s')
+
+    def report(phase=None, message=None, **kwargs):
+        if message:
+            print(f"[bitcoin-install] {message}", flush=True)
+
+    store = VersionStore(Path(args.versions_dir), Path(args.dest),
+                         BITCOIN_ARTIFACT_CACHE_DIR, BITCOIN_ARTIFACT_CACHE_KEEP)
+    success, _ = install_bitcoin_core(args.url, Path(args.data_dir_dest), report, store)
+    return 0 if success else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,185 @@
+import threading
+import time
+import uuid
+import logging
+from collections import OrderedDict
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Smoothing factor for the transfer rate behind ETA estimates – lower is steadier
+_RATE_SMOOTHING = 0.3
+
+
+class Job:
+    # A long-running operation (install, export, ...) running on its own thread.
+    #
+    # The worker reports progress through update(); everyone else only reads
+    # to_dict() or waits for the version number to change.
+
+    def __init__(self, kind: str, registry: 'JobRegistry'):
+        self.id = uuid.uuid4().hex[:12]
+        self.kind = kind
+        self.status = 'running'  # running -> succeeded | failed
+        self.phase: Optional[str] = None
+        self.message = ''
+        self.bytes_done = 0
+        self.bytes_total: Optional[int] = None
+        self.rate: Optional[float] = None  # bytes/sec, smoothed
+        self.started_at = time.time()
+        self.finished_at: Optional[float] = None
+        self.version = 0
+
+        self._registry = registry
+        self._last_sample: Optional[Tuple[float, int]] = None
+
+    def update(self, phase: Optional[str] = None, bytes_done: Optional[int] = None,
+               bytes_total: Optional[int] = None, message: Optional[str] = None) -> None:
+        with self._registry._cond:
+            if phase is not None and phase != self.phase:
+                self.phase = phase
+                self.bytes_done = 0
+                self.bytes_total = None
+                self.rate = None
+                self._last_sample = None
+            if bytes_total is not None:
+                self.bytes_total = bytes_total
+            if bytes_done is not None:
+                self._sample_rate(bytes_done)
+                self.bytes_done = bytes_done
+            if message is not None:
+                self.message = message
+            self.version += 1
+            self._registry._cond.notify_all()
+
+    def _sample_rate(self, bytes_done: int) -> None:
+        now = time.monotonic()
+        if self._last_sample is not None:
+            last_time, last_bytes = self._last_sample
+            elapsed = now - last_time
+            if elapsed < 0.5:
+                return  # too close together to say anything about speed
+            rate = (bytes_done - last_bytes) / elapsed
+            self.rate = rate if self.rate is None else (
+                _RATE_SMOOTHING * rate + (1 - _RATE_SMOOTHING) * self.rate)
+        self._last_sample = (now, bytes_done)
+
+    @property
+    def eta(self) -> Optional[float]:
+        # Seconds left in the current phase, if we know the size and the speed
+        if not self.bytes_total or not self.rate or self.rate <= 0:
+            return None
+        return max(self.bytes_total - self.bytes_done, 0) / self.rate
+
+    @property
+    def finished(self) -> bool:
+        return self.status != 'running'
+
+    def to_dict(self) -> Dict[str, Any]:
+        with self._registry._cond:
+            return {
+                'id': self.id,
+                'kind': self.kind,
+                'status': self.status,
+                'phase': self.phase,
+                'message': self.message,
+                'bytes_done': self.bytes_done,
+                'bytes_total': self.bytes_total,
+                'rate': self.rate,
+                'eta': self.eta,
+                'started_at': self.started_at,
+                'finished_at': self.finished_at,
+                'version': self.version
+            }
+
+
+class JobRegistry:
+    # Keeps track of running and recently finished jobs.
+    #
+    # Only one job of a given kind can run at a time, which is what makes
+    # double-start protection exact – no lock files, no process scans.
+
+    def __init__(self, keep_finished: int = 20):
+        self.keep_finished = keep_finished
+        self._cond = threading.Condition()
+        self._jobs: 'OrderedDict[str, Job]' = OrderedDict()
+        self._listeners: List[Callable[[Job], None]] = []
+
+    def add_listener(self, callback: Callable[[Job], None]) -> None:
+        # Called (on the job's thread) whenever a job starts or finishes
+        self._listeners.append(callback)
+
+    def _notify(self, job: Job) -> None:
+        for callback in self._listeners:
+            try:
+                callback(job)
+            except Exception as e:
+                logger.error(f"Job listener failed: {str(e)}", exc_info=True)
+
+    def start(self, kind: str, target: Callable[..., Tuple[bool, str]], *args) -> Tuple[bool, Job]:
+        # Runs target(job, *args) in the background. Returns (False, running_job)
+        # if a job of the same kind is already underway.
+        with self._cond:
+            running = self.active(kind)
+            if running is not None:
+                return False, running
+
+            job = Job(kind, self)
+            self._jobs[job.id] = job
+            self._prune()
+
+        thread = threading.Thread(target=self._run, args=(job, target, args),
+                                  name=f'job-{kind}-{job.id}', daemon=True)
+        thread.start()
+        logger.info(f"Started {kind} job {job.id}")
+        self._notify(job)
+        return True, job
+
+    def _run(self, job: Job, target: Callable[..., Tuple[bool, str]], args: tuple) -> None:
+        try:
+            success, message = target(job, *args)
+        except Exception as e:
+            logger.error(f"{job.kind} job {job.id} crashed: {str(e)}", exc_info=True)
+            success, message = False, f"Unexpected error: {str(e)}"
+
+        with self._cond:
+            job.status = 'succeeded' if success else 'failed'
+            job.message = message
+            job.finished_at = time.time()
+            job.version += 1
+            self._cond.notify_all()
+
+        logger.info(f"{job.kind} job {job.id} {job.status}: {message}")
+        self._notify(job)
+
+    def _prune(self) -> None:
+        # Forget the oldest finished jobs so the registry can't grow forever
+        finished = [job_id for job_id, job in self._jobs.items() if job.finished]
+        for job_id in finished[:max(len(finished) - self.keep_finished, 0)]:
+            del self._jobs[job_id]
+
+    def get(self, job_id: str) -> Optional[Job]:
+        with self._cond:
+            return self._jobs.get(job_id)
+
+    def active(self, kind: str) -> Optional[Job]:
+        with self._cond:
+            for job in self._jobs.values():
+                if job.kind == kind and not job.finished:
+                    return job
+        return None
+
+    def latest(self, kind: str) -> Optional[Job]:
+        with self._cond:
+            for job in reversed(self._jobs.values()):
+                if job.kind == kind:
+                    return job
+        return None
+
+    def wait_for_change(self, job: Job, version: int, timeout: float) -> bool:
+        # Blocks until the job moves past `version`; False on timeout
+        with self._cond:
+            return self._cond.wait_for(lambda: job.version > version, timeout)
+
+
+job_registry = JobRegistry()
@@ -0,0 +1,272 @@
+import subprocess
+import threading
+import time
+import logging
+from contextlib import contextmanager
+from typing import Dict, List, Sequence, Tuple
+from flask import g, has_request_context, before_render_template, template_rendered
+from sqlalchemy import event
+
+logger = logging.getLogger(__name__)
+
+# In-process counters and latency histograms, served as Prometheus text on /metrics.
+#
+# No client library: a Pi has no use for a registry with exemplars and multiprocess
+# modes, and all we need is "how often, how long" for a handful of things. Everything
+# lives in plain dicts behind a lock per metric; observing is a dict lookup and a few adds.
+
+# Seconds – from a cached JSON answer (~1ms) to a slow RPC during IBD
+DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+
+def _escape(value: str) -> str:
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _labels(names: Sequence[str], values: Sequence[str], extra: str = '') -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+class Counter:
+
+    def __init__(self, name: str, help_text: str, labels: Sequence[str] = ()):
+        self.name = name
+        self.help_text = help_text
+        self.label_names = tuple(labels)
+        self._lock = threading.Lock()
+        self._values: Dict[Tuple[str, ...], float] = {}
+
+    def inc(self, amount: float = 1, **labels) -> None:
+        key = tuple(str(labels[name]) for name in self.label_names)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def render(self) -> List[str]:
+        lines = [f'# HELP {self.name} {self.help_text}', f'# TYPE {self.name} counter']
+        with self._lock:
+            for key, value in sorted(self._values.items()):
+                lines.append(f'{self.name}{_labels(self.label_names, key)} {value:g}')
+        return lines
+
+
+class Histogram:
+
+    def __init__(self, name: str, help_text: str, labels: Sequence[str] = (),
+                 buckets: Sequence[float] = DEFAULT_BUCKETS):
+        self.name = name
+        self.help_text = help_text
+        self.label_names = tuple(labels)
+        self.buckets = tuple(sorted(buckets))
+        self._lock = threading.Lock()
+        # label values -> [count per bucket (non-cumulative, +Inf last), sum]
+        self._values: Dict[Tuple[str, ...], list] = {}
+
+    def observe(self, value: float, **labels) -> None:
+        key = tuple(str(labels[name]) for name in self.label_names)
+        i = 0
+        while i < len(self.buckets) and value > self.buckets[i]:
+            i += 1
+        with self._lock:
+            entry = self._values.get(key)
+            if entry is None:
+                entry = self._values[key] = [[0] * (len(self.buckets) + 1), 0.0]
+            entry[0][i] += 1
+            entry[1] += value
+
+    @contextmanager
+    def time(self, **labels):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started, **labels)
+
+    def render(self) -> List[str]:
+        lines = [f'# HELP {self.name} {self.help_text}', f'# TYPE {self.name} histogram']
+        with self._lock:
+            items = [(key, list(counts), total) for key, (counts, total) in sorted(self._values.items())]
+        for key, counts, total in items:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float('inf'),), counts):
+                cumulative += count
+                le = 'le="+Inf"' if bound == float('inf') else f'le="{bound:g}"'
+                lines.append(f'{self.name}_bucket{_labels(self.label_names, key, le)} {cumulative}')
+            lines.append(f'{self.name}_sum{_labels(self.label_names, key)} {total:.6f}')
+            lines.append(f'{self.name}_count{_labels(self.label_names, key)} {cumulative}')
+        return lines
+
+
+class Gauge:
+
+    def __init__(self, name: str, help_text: str, labels: Sequence[str] = ()):
+        self.name = name
+        self.help_text = help_text
+        self.label_names = tuple(labels)
+        self._lock = threading.Lock()
+        self._values: Dict[Tuple[str, ...], float] = {}
+
+    def set(self, value: float, **labels) -> None:
+        key = tuple(str(labels[name]) for name in self.label_names)
+        with self._lock:
+            self._values[key] = value
+
+    def render(self) -> List[str]:
+        lines = [f'# HELP {self.name} {self.help_text}', f'# TYPE {self.name} gauge']
+        with self._lock:
+            for key, value in sorted(self._values.items()):
+                lines.append(f'{self.name}{_labels(self.label_names, key)} {value:g}')
+        return lines
+
+
+class Registry:
+
+    def __init__(self):
+        self._metrics = []
+
+    def counter(self, *args, **kwargs) -> Counter:
+        metric = Counter(*args, **kwargs)
+        self._metrics.append(metric)
+        return metric
+
+    def histogram(self, *args, **kwargs) -> Histogram:
+        metric = Histogram(*args, **kwargs)
+        self._metrics.append(metric)
+        return metric
+
+    def gauge(self, *args, **kwargs) -> Gauge:
+        metric = Gauge(*args, **kwargs)
+        self._metrics.append(metric)
+        return metric
+
+    def render(self) -> str:
+        lines = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        return '\n'.join(lines) + '\n'
+
+
+registry = Registry()
+
+http_request_duration = registry.histogram(
+    'meadow_http_request_duration_seconds', 'Time from request start to response, per endpoint',
+    ('endpoint', 'method', 'status'))
+http_request_db_queries = registry.histogram(
+    'meadow_http_request_db_queries', 'SQL statements run while handling one request',
+    ('endpoint',), buckets=(0, 1, 2, 3, 5, 10, 25, 50))
+subprocess_duration = registry.histogram(
+    'meadow_subprocess_duration_seconds', 'Wall time of external commands (outcome: ok, failed, timeout, error)',
+    ('command', 'outcome'))
+template_render_duration = registry.histogram(
+    'meadow_template_render_seconds', 'Jinja template render time', ('template',))
+db_query_duration = registry.histogram(
+    'meadow_db_query_duration_seconds', 'SQL statement execution time', ('statement',))
+db_errors = registry.counter(
+    'meadow_db_errors_total', 'SQL statements that raised', ('statement',))
+startup_duration = registry.gauge(
+    'meadow_startup_seconds', 'Cold start: time per startup phase, to app ready and to the first response',
+    ('phase',))
+storage_bytes = registry.gauge(
+    'meadow_storage_bytes', 'Data disk usage per component (blocks, chainstate, each index, ...) and free space',
+    ('component',))
+
+
+def record_startup(report: dict) -> None:
+    # Copies a StartupTimer report (see startup.py) into meadow_startup_seconds
+    for phase, seconds in report['phases'].items():
+        startup_duration.set(seconds, phase=phase)
+    if report['ready'] is not None:
+        startup_duration.set(report['ready'], phase='ready')
+    first = report['first_response']
+    if first:
+        startup_duration.set(first['since_process_start'], phase='first_response')
+        if first['since_boot'] is not None:
+            startup_duration.set(first['since_boot'], phase='boot_to_first_response')
+
+
+# --- subprocesses ---
+
+@contextmanager
+def timed_subprocess(command: str):
+    # Times whatever runs in the block as `command`; yields a dict whose 'outcome' the
+    # caller can overwrite (e.g. 'failed' for a non-zero exit). Exceptions count too.
+    state = {'outcome': 'ok'}
+    started = time.perf_counter()
+    try:
+        yield state
+    except subprocess.TimeoutExpired:
+        state['outcome'] = 'timeout'
+        raise
+    except subprocess.CalledProcessError:
+        state['outcome'] = 'failed'
+        raise
+    except BaseException:
+        state['outcome'] = 'error'
+        raise
+    finally:
+        subprocess_duration.observe(time.perf_counter() - started, command=command, outcome=state['outcome'])
+
+
+def run_subprocess(command: str, args, **kwargs) -> subprocess.CompletedProcess:
+    # subprocess.run(args, **kwargs), recorded under the short name `command`
+    with timed_subprocess(command) as state:
+        result = subprocess.run(args, **kwargs)
+        if result.returncode != 0:
+            state['outcome'] = 'failed'
+        return result
+
+
+# --- templates ---
+
+_render_starts = threading.local()
+
+
+def _template_started(sender, template, context, **extra):
+    stack = getattr(_render_starts, 'stack', None)
+    if stack is None:
+        stack = _render_starts.stack = []
+    stack.append(time.perf_counter())
+
+
+def _template_rendered(sender, template, context, **extra):
+    stack = getattr(_render_starts, 'stack', None)
+    if stack:
+        template_render_duration.observe(time.perf_counter() - stack.pop(), template=template.name or 'string')
+
+
+def instrument_templates(app) -> None:
+    # Flask's render signals fire around every render_template(), includes not counted separately
+    before_render_template.connect(_template_started, app)
+    template_rendered.connect(_template_rendered, app)
+
+
+# --- database ---
+
+def _statement_kind(statement: str) -> str:
+    return statement.lstrip().split(None, 1)[0].upper() if statement.strip() else 'OTHER'
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault('meadow_query_started', []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    started = conn.info['meadow_query_started'].pop()
+    db_query_duration.observe(time.perf_counter() - started, statement=_statement_kind(statement))
+    if has_request_context():
+        g.meadow_db_queries = g.get('meadow_db_queries', 0) + 1
+
+
+def _handle_error(exception_context):
+    conn = exception_context.connection
+    if conn is not None and conn.info.get('meadow_query_started'):
+        conn.info['meadow_query_started'].pop()
+    db_errors.inc(statement=_statement_kind(exception_context.statement or ''))
+
+
+def instrument_engine(engine) -> None:
+    event.listen(engine, 'before_cursor_execute', _before_cursor_execute)
+    event.listen(engine, 'after_cursor_execute', _after_cursor_execute)
+    event.listen(engine, 'handle_error', _handle_error)
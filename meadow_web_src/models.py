@@ -1,7 +1,18 @@
+import threading
+import logging
+from typing import Optional
 from flask_login import UserMixin
+from sqlalchemy import event
+from sqlalchemy.orm import Session, object_session
 from werkzeug.security import generate_password_hash, check_password_hash
 from meadow_web.extensions import db, login_manager
 
+logger = logging.getLogger(__name__)
+
+# Bump this whenever a model changes. The DB file carries the version it was set up
+# with (SQLite's PRAGMA user_version), so a normal start skips create_all() entirely
+SCHEMA_VERSION = 1
+
 class User(UserMixin, db.Model):
     # Primary key for our users table
     id = db.Column(db.Integer, primary_key=True)
@@ -23,3 +34,75 @@ class User(UserMixin, db.Model):
     def __repr__(self):
         # Helpful for debugging/logs, won't leak sensitive info
         return f'<User {self.username}>'
+
+
+def ensure_schema() -> None:
+    # Creates missing tables, but only when the DB isn't stamped with SCHEMA_VERSION yet
+    # (a new DB, or one from before the last model change). Needs an app context.
+    with db.engine.connect() as conn:
+        version = conn.exec_driver_sql('PRAGMA user_version').scalar()
+    if version == SCHEMA_VERSION:
+        return
+    db.create_all()
+    with db.engine.begin() as conn:
+        conn.exec_driver_sql(f'PRAGMA user_version = {SCHEMA_VERSION}')
+    logger.info(f"Database schema checked and stamped (version {version} -> {SCHEMA_VERSION})")
+
+
+class UserCache:
+    # Meadow has exactly one user (or none before registration), and Flask-Login asks
+    # for it on every request. The row is loaded once and kept in memory, detached
+    # from any session and read-only; any write to a User drops it again.
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._loaded = False
+        self._user: Optional[User] = None
+        # Bumped on every invalidation, so a load that raced a write isn't kept
+        self._generation = 0
+
+    def get(self) -> Optional[User]:
+        with self._lock:
+            if self._loaded:
+                return self._user
+            generation = self._generation
+        user = User.query.first()
+        if user is not None:
+            db.session.expunge(user)
+        with self._lock:
+            if generation == self._generation:
+                self._user = user
+                self._loaded = True
+        return user
+
+    def get_by_id(self, user_id: int) -> Optional[User]:
+        user = self.get()
+        return user if user is not None and user.id == user_id else None
+
+    def invalidate(self) -> None:
+        with self._lock:
+            self._loaded = False
+            self._user = None
+            self._generation += 1
+
+
+user_cache = UserCache()
+
+
+# Dropped as soon as a write is flushed, and once more when it is committed (or rolled
+# back): another request may have reloaded the old row in between
+@event.listens_for(User, 'after_insert')
+@event.listens_for(User, 'after_update')
+@event.listens_for(User, 'after_delete')
+def _user_written(mapper, connection, target):
+    user_cache.invalidate()
+    session = object_session(target)
+    if session is not None:
+        session.info['meadow_user_written'] = True
+
+
+@event.listens_for(Session, 'after_commit')
+@event.listens_for(Session, 'after_rollback')
+def _session_ended(session):
+    if session.info.pop('meadow_user_written', False):
+        user_cache.invalidate()
@@ -0,0 +1,120 @@
+import shutil
+import logging
+from pathlib import Path
+from typing import Any, Callable, Dict, List
+from meadow_web.config import BITCOIN_DATA_DIR, NODE_INFO_TTLS
+from meadow_web.bitcoin_rpc import BitcoinRPC, bitcoin_rpc, BitcoinRPCError, RPCError, RPC_IN_WARMUP, RPC_METHOD_NOT_FOUND
+from meadow_web.utils.cache import CoalescingCache
+
+logger = logging.getLogger(__name__)
+
+# Which RPC call fills which cached field
+_RPC_FIELDS = {
+    'blockchain': 'getblockchaininfo',
+    'network': 'getnetworkinfo',
+    'mempool': 'getmempoolinfo',
+    'chainstates': 'getchainstates',
+}
+
+
+def make_loader(rpc: BitcoinRPC, data_dir: Path) -> Callable[[List[str]], Dict[str, Any]]:
+    # Cache loader for the node behind `rpc` (each node in nodes.py has its own cache)
+
+    def load(keys: List[str]) -> Dict[str, Any]:
+        # Refreshes the stale fields – all RPC-backed ones in a single batch round trip
+        values: Dict[str, Any] = {}
+
+        rpc_keys = [key for key in keys if key in _RPC_FIELDS]
+        if rpc_keys:
+            try:
+                results = rpc.batch([(_RPC_FIELDS[key], []) for key in rpc_keys])
+            except BitcoinRPCError as e:
+                results = [e] * len(rpc_keys)
+            values.update(zip(rpc_keys, results))
+
+        # bitcoind before 26.0 has no getchainstates – and so no snapshot chainstate either
+        chainstates = values.get('chainstates')
+        if isinstance(chainstates, RPCError) and chainstates.code == RPC_METHOD_NOT_FOUND:
+            values['chainstates'] = None
+
+        if 'disk' in keys:
+            try:
+                values['disk'] = shutil.disk_usage(data_dir)
+            except OSError as e:
+                values['disk'] = e
+
+        return values
+
+    return load
+
+
+node_info_cache = CoalescingCache(NODE_INFO_TTLS, make_loader(bitcoin_rpc, BITCOIN_DATA_DIR))
+
+
+def _error_text(error: Exception) -> str:
+    if isinstance(error, RPCError) and error.code == RPC_IN_WARMUP:
+        return f"Node is starting up: {error.message}"
+    return str(error)
+
+
+def get_node_info(cache: CoalescingCache = node_info_cache) -> Dict[str, Any]:
+    # Sync/health summary for the dashboard, served from the cache
+    cached = cache.get()
+    info: Dict[str, Any] = {'errors': {}}
+
+    for key, value in cached.items():
+        if isinstance(value, Exception):
+            info['errors'][key] = _error_text(value)
+
+    chain = cached.get('blockchain')
+    if isinstance(chain, dict):
+        info.update({
+            'chain': chain.get('chain'),
+            'blocks': chain.get('blocks'),
+            'headers': chain.get('headers'),
+            'verification_progress': chain.get('verificationprogress'),
+            'initial_block_download': chain.get('initialblockdownload'),
+            'size_on_disk': chain.get('size_on_disk'),
+            'pruned': chain.get('pruned')
+        })
+
+    network = cached.get('network')
+    if isinstance(network, dict):
+        info.update({
+            'peers': network.get('connections'),
+            'peers_in': network.get('connections_in'),
+            'peers_out': network.get('connections_out'),
+            'subversion': network.get('subversion')
+        })
+
+    mempool = cached.get('mempool')
+    if isinstance(mempool, dict):
+        info.update({
+            'mempool_tx': mempool.get('size'),
+            'mempool_bytes': mempool.get('bytes'),
+            'mempool_usage': mempool.get('usage')
+        })
+
+    # After an AssumeUTXO load: the snapshot chainstate syncing to the tip, and the
+    # background one validating the blocks below the snapshot
+    chainstates = cached.get('chainstates')
+    states = chainstates.get('chainstates', []) if isinstance(chainstates, dict) else []
+    snapshot = next((state for state in states if state.get('snapshot_blockhash') and not state.get('validated')), None)
+    if snapshot is not None:
+        background = next((state for state in states if state is not snapshot), None)
+        info['chainstates'] = {
+            'snapshot_blockhash': snapshot['snapshot_blockhash'],
+            'snapshot_blocks': snapshot.get('blocks'),
+            'snapshot_progress': snapshot.get('verificationprogress'),
+            'background_blocks': background.get('blocks') if background else None
+        }
+
+    disk = cached.get('disk')
+    if disk is not None and not isinstance(disk, Exception):
+        info.update({
+            'disk_total': disk.total,
+            'disk_used': disk.used,
+            'disk_free': disk.free
+        })
+
+    return info
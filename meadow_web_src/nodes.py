@@ -0,0 +1,382 @@
+import json
+import re
+import threading
+import logging
+from concurrent.futures import ThreadPoolExecutor, wait
+from pathlib import Path
+from typing import Any, Dict, List, NamedTuple, Optional, Tuple
+from meadow_web.config import (
+    BITCOIN_CPU_MAX,
+    BITCOIN_CGROUP,
+    BITCOIN_DATA_DIR,
+    BITCOIN_MEMORY_MAX_MB,
+    BITCOIN_RPC_HOST,
+    BITCOIN_RPC_PORT,
+    BITCOIN_SUPERVISED,
+    NODE_INFO_TTLS,
+    NODE_MIN_DBCACHE_MB,
+    NODE_PRIMARY_NAME,
+    NODE_REGISTRY_PATH,
+    NODE_STATUS_TIMEOUT,
+    NODE_STATUS_WORKERS
+)
+from meadow_web import conf_tuner
+from meadow_web.bitcoin_rpc import BitcoinRPC, bitcoin_rpc
+from meadow_web.jobs import job_registry
+from meadow_web.node_info import get_node_info, make_loader, node_info_cache
+from meadow_web.process_probe import ProcessProbe, bitcoind_probe, read_cmdline
+from meadow_web.supervisor import Supervisor, supervisor
+from meadow_web.utils.cache import CoalescingCache
+
+logger = logging.getLogger(__name__)
+
+# Node registry: the mainnet node in BITCOIN_DATA_DIR plus any extra chains listed in
+# NODE_REGISTRY_PATH, e.g.
+#
+#   {"nodes": [{"name": "signet", "chain": "signet", "data_dir": "/data/bitcoin-signet",
+#               "memory_max_mb": 1024, "autostart": true}]}
+#
+# Ports default to bitcoind's own for the chain; "rpc_port", "p2p_port", "conf" (a
+# bitcoin.conf outside the data dir), "memory_weight", "dbcache_max_mb", "cpu_max" and
+# "memory_max_mb" are optional. Every node gets its own RPC client, process probe, info
+# cache and – for the extra ones – supervisor, so nothing is shared between them.
+#
+# Status for all nodes is collected on a small thread pool, one node per worker, so a
+# node that's slow to answer (IBD, or stuck loading) doesn't hold up the others and the
+# dashboard takes as long as the slowest node, not the sum of all of them.
+#
+# bitcoind can't resize its caches while running, so the memory split happens at start:
+# the starting node gets its weighted share of the tuned dbcache/maxmempool among the
+# nodes running then – but never more than what's left of the budget next to what the
+# running nodes actually have (which may be all of it, e.g. the primary alone with its
+# IBD-sized dbcache). If too little is left, the node isn't started.
+
+# chain -> (folder bitcoind uses inside the data dir, RPC port, P2P port)
+CHAINS = {
+    'main': ('', 8332, 8333),
+    'test': ('testnet3', 18332, 18333),
+    'testnet4': ('testnet4', 48332, 48333),
+    'signet': ('signet', 38332, 38333),
+    'regtest': ('regtest', 18443, 18444),
+}
+
+# Test chains have a tiny UTXO set, so mainnet gets most of the cache by default
+_DEFAULT_WEIGHTS = {'main': 4.0}
+
+# bitcoind's own defaults (MB) when neither the command line nor bitcoin.conf sets them
+_DEFAULT_MEMORY = {'dbcache': 450, 'maxmempool': 300}
+
+_NAME = re.compile(r'^[a-z0-9][a-z0-9-]{0,31}$')
+
+
+class NodeSpec(NamedTuple):
+    name: str
+    chain: str
+    data_dir: Path
+    rpc_port: int
+    p2p_port: int
+    conf: Optional[Path] = None
+    memory_weight: float = 1.0
+    dbcache_max_mb: Optional[int] = None
+    cpu_max: Optional[float] = None
+    memory_max_mb: Optional[int] = None
+    autostart: bool = False
+    primary: bool = False
+
+
+def primary_spec() -> NodeSpec:
+    # The node config.py describes – what the web app managed before there was a registry
+    return NodeSpec(
+        name=NODE_PRIMARY_NAME, chain='main', data_dir=BITCOIN_DATA_DIR, rpc_port=BITCOIN_RPC_PORT,
+        p2p_port=CHAINS['main'][2], memory_weight=_DEFAULT_WEIGHTS['main'],
+        cpu_max=BITCOIN_CPU_MAX, memory_max_mb=BITCOIN_MEMORY_MAX_MB, primary=True)
+
+
+def parse_spec(entry: Dict[str, Any]) -> NodeSpec:
+    # One registry entry; raises ValueError if it's incomplete or doesn't make sense
+    name, chain = entry.get('name'), entry.get('chain')
+    if not isinstance(name, str) or not _NAME.match(name):
+        raise ValueError(f"invalid node name {name!r} (lowercase letters, digits and dashes)")
+    if chain not in CHAINS:
+        raise ValueError(f"node {name}: unknown chain {chain!r} (one of {', '.join(CHAINS)})")
+    if not entry.get('data_dir'):
+        raise ValueError(f"node {name}: data_dir is missing")
+    _, rpc_port, p2p_port = CHAINS[chain]
+    try:
+        return NodeSpec(
+            name=name, chain=chain, data_dir=Path(entry['data_dir']),
+            rpc_port=int(entry.get('rpc_port') or rpc_port),
+            p2p_port=int(entry.get('p2p_port') or p2p_port),
+            conf=Path(entry['conf']) if entry.get('conf') else None,
+            memory_weight=float(entry.get('memory_weight') or _DEFAULT_WEIGHTS.get(chain, 1.0)),
+            dbcache_max_mb=int(entry['dbcache_max_mb']) if entry.get('dbcache_max_mb') else None,
+            cpu_max=float(entry['cpu_max']) if entry.get('cpu_max') else None,
+            memory_max_mb=int(entry['memory_max_mb']) if entry.get('memory_max_mb') else None,
+            autostart=bool(entry.get('autostart', False)))
+    except (TypeError, ValueError) as e:
+        raise ValueError(f"node {name}: {str(e)}")
+
+
+class Node:
+    # One bitcoind: its spec plus the clients that talk to it
+
+    def __init__(self, spec: NodeSpec, rpc: BitcoinRPC, probe: ProcessProbe,
+                 supervisor: Optional[Supervisor], info_cache: CoalescingCache):
+        self.spec = spec
+        self.rpc = rpc
+        self.probe = probe
+        self.supervisor = supervisor  # None: started with the start script (primary, classic mode)
+        self.info_cache = info_cache
+
+    @classmethod
+    def create(cls, spec: NodeSpec) -> 'Node':
+        # An extra node: bitcoind keeps its .cookie and pidfile in the chain's folder
+        net_dir = spec.data_dir / CHAINS[spec.chain][0]
+        rpc = BitcoinRPC(net_dir, host=BITCOIN_RPC_HOST, port=spec.rpc_port, timeout=NODE_STATUS_TIMEOUT)
+        probe = ProcessProbe(spec.data_dir, pidfile_name=str(Path(CHAINS[spec.chain][0]) / 'bitcoind.pid'))
+        node_supervisor = Supervisor(data_dir=spec.data_dir, probe=probe, name=f'bitcoind-{spec.name}',
+                                     cgroup=f'{BITCOIN_CGROUP}-{spec.name}' if BITCOIN_CGROUP else None,
+                                     cpu_max=spec.cpu_max, memory_max_mb=spec.memory_max_mb)
+        return cls(spec, rpc, probe, node_supervisor, CoalescingCache(NODE_INFO_TTLS, make_loader(rpc, net_dir)))
+
+    @property
+    def name(self) -> str:
+        return self.spec.name
+
+    @property
+    def job_kind(self) -> str:
+        # The primary node keeps the job kind it always had
+        return 'node' if self.spec.primary else f'node:{self.spec.name}'
+
+    def changed(self) -> None:
+        # Cached PIDs, RPC connections and node info all belong to the old process
+        self.probe.invalidate()
+        self.rpc.close()
+        self.info_cache.invalidate()
+
+    def launch_args(self, memory: Optional[Dict[str, int]]) -> List[str]:
+        # bitcoind arguments beyond -datadir: where an extra node listens, and its memory share
+        args = []
+        if not self.spec.primary:
+            args += [f'-chain={self.spec.chain}', f'-port={self.spec.p2p_port}', f'-rpcport={self.spec.rpc_port}',
+                     f'-rpcbind={BITCOIN_RPC_HOST}', f'-rpcallowip={BITCOIN_RPC_HOST}']
+            if self.spec.conf:
+                args.append(f'-conf={self.spec.conf}')
+        if memory:
+            args += [f"-dbcache={memory['dbcache']}", f"-maxmempool={memory['maxmempool']}"]
+        return args
+
+    def started_with(self, option: str) -> Optional[int]:
+        # A numeric -option=value the running bitcoind got on its command line
+        pid = self.probe.get_pid()
+        for arg in (read_cmdline(pid) or []) if pid else []:
+            if arg.startswith(f'-{option}='):
+                value = arg.split('=', 1)[1]
+                return int(value) if value.isdigit() else None
+        return None
+
+    def conf_value(self, option: str) -> Optional[int]:
+        # A numeric option from the node's bitcoin.conf (top level or its chain's section)
+        path = self.spec.conf or self.spec.data_dir / conf_tuner.CONF_NAME
+        value, section = None, None
+        try:
+            with open(path, 'r') as f:
+                for line in f:
+                    line = line.split('#', 1)[0].strip()
+                    if line.startswith('[') and line.endswith(']'):
+                        section = line[1:-1].strip()
+                    elif '=' in line and section in (None, self.spec.chain):
+                        key, raw = (part.strip() for part in line.split('=', 1))
+                        if key == option and raw.isdigit():
+                            value = int(raw)
+        except OSError:
+            pass
+        return value
+
+    def checks_all_scripts(self) -> bool:
+        # assumevalid=0 (command line or bitcoin.conf): every script is verified, on -par threads
+        started = self.started_with('assumevalid')
+        return (started if started is not None else self.conf_value('assumevalid')) == 0
+
+    def memory_in_use(self) -> Dict[str, int]:
+        # dbcache/maxmempool (MB) the running bitcoind actually has
+        return {option: self.started_with(option) or self.conf_value(option) or default
+                for option, default in _DEFAULT_MEMORY.items()}
+
+
+class NodeRegistry:
+
+    def __init__(self, path: Path = NODE_REGISTRY_PATH, workers: int = NODE_STATUS_WORKERS):
+        self.path = Path(path)
+        self._lock = threading.Lock()
+        self._nodes: Optional[Dict[str, Node]] = None
+        self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='node-status')
+
+    def _load(self) -> Dict[str, Node]:
+        primary = Node(primary_spec(), bitcoin_rpc, bitcoind_probe,
+                       supervisor if BITCOIN_SUPERVISED else None, node_info_cache)
+        nodes = {primary.name: primary}
+        try:
+            with open(self.path, 'r') as f:
+                entries = json.load(f).get('nodes', [])
+        except FileNotFoundError:
+            return nodes
+        except (OSError, ValueError, AttributeError) as e:
+            logger.error(f"Failed to read the node registry {self.path}: {str(e)}")
+            return nodes
+
+        for entry in entries:
+            try:
+                spec = parse_spec(entry)
+            except ValueError as e:
+                logger.error(f"Skipping node in {self.path}: {str(e)}")
+                continue
+            # Two nodes on one data dir or port would fight over it
+            clash = next((node.name for node in nodes.values()
+                          if node.spec.name == spec.name
+                          or node.spec.data_dir.resolve() == spec.data_dir.resolve()
+                          or {node.spec.rpc_port, node.spec.p2p_port} & {spec.rpc_port, spec.p2p_port}), None)
+            if clash:
+                logger.error(f"Skipping node {spec.name} in {self.path}: its name, data dir or ports clash with {clash}")
+                continue
+            nodes[spec.name] = Node.create(spec)
+        return nodes
+
+    def _all(self) -> Dict[str, Node]:
+        with self._lock:
+            if self._nodes is None:
+                self._nodes = self._load()
+                if len(self._nodes) > 1:
+                    logger.info(f"Managing {len(self._nodes)} nodes: {', '.join(self._nodes)}")
+            return self._nodes
+
+    def nodes(self) -> List[Node]:
+        return list(self._all().values())
+
+    def get(self, name: str) -> Optional[Node]:
+        return self._all().get(name)
+
+    @property
+    def primary(self) -> Node:
+        return self._all()[NODE_PRIMARY_NAME]
+
+    def start(self) -> None:
+        # Supervisors for the extra nodes (adopting any still running), and autostart
+        for node in self.nodes():
+            if node.spec.primary:
+                continue
+            node.supervisor.start_thread()
+            if node.spec.autostart and not node.probe.is_running(max_age=0):
+                memory, error = self.memory_share(node)
+                if error:
+                    logger.error(f"Not autostarting {node.name}: {error}")
+                    continue
+                node.supervisor.extra_args = node.launch_args(memory)
+                node.supervisor.start()
+
+    # --- memory ---
+
+    def memory_shares(self, starting: Optional[Node] = None) -> Dict[str, Dict[str, int]]:
+        # {name: {'dbcache', 'maxmempool'}} in MB for the running nodes (plus `starting`),
+        # the tuned budget split by memory_weight
+        running = [node for node in self.nodes() if node is starting or node.probe.is_running()]
+        if not running:
+            return {}
+        dbcache, maxmempool = conf_tuner.memory_budget(self.primary.spec.data_dir)
+        total_weight = sum(node.spec.memory_weight for node in running)
+        shares = {}
+        for node in running:
+            part = node.spec.memory_weight / total_weight
+            share = max(int(dbcache * part), conf_tuner.MIN_DBCACHE_MB)
+            if node.spec.dbcache_max_mb:
+                share = min(share, node.spec.dbcache_max_mb)
+            shares[node.name] = {
+                'dbcache': share,
+                'maxmempool': max(int(maxmempool * part), conf_tuner.MIN_MAXMEMPOOL_MB)
+            }
+        return shares
+
+    def memory_share(self, node: Node) -> Tuple[Optional[Dict[str, int]], Optional[str]]:
+        # (what `node` should start with, error). The share is None for a primary node
+        # running alone, which just uses its bitcoin.conf; the error says why it can't start.
+        others = [other for other in self.nodes() if other is not node and other.probe.is_running()]
+        if node.spec.primary and not others:
+            return None, None
+
+        dbcache, maxmempool = conf_tuner.memory_budget(self.primary.spec.data_dir)
+        for other in others:
+            in_use = other.memory_in_use()
+            dbcache -= in_use['dbcache']
+            maxmempool -= in_use['maxmempool']
+        if dbcache < NODE_MIN_DBCACHE_MB:
+            running = ', '.join(other.name for other in others)
+            return None, (f"Not enough memory left to start {node.name} next to {running} "
+                          f"({max(dbcache, 0)} MB of dbcache left) – stop a node first")
+
+        share = self.memory_shares(starting=node)[node.name]
+        return {
+            'dbcache': min(share['dbcache'], dbcache),
+            'maxmempool': max(min(share['maxmempool'], maxmempool), conf_tuner.MIN_MAXMEMPOOL_MB)
+        }, None
+
+    # --- status ---
+
+    def status(self, node: Node) -> Dict[str, Any]:
+        spec = node.spec
+        status: Dict[str, Any] = {
+            'name': spec.name,
+            'chain': spec.chain,
+            'primary': spec.primary,
+            'data_dir': str(spec.data_dir),
+            'rpc_port': spec.rpc_port,
+            'p2p_port': spec.p2p_port,
+            'running': node.probe.is_running(),
+        }
+        job = job_registry.active(node.job_kind)
+        status['operation'] = {'id': job.id, 'phase': job.phase} if job else None
+        if node.supervisor is not None:
+            sup = node.supervisor.state()
+            status['supervisor'] = {key: sup[key] for key in ('state', 'restarts', 'next_restart_at', 'last_exit')}
+        if status['running']:
+            info = get_node_info(node.info_cache)
+            status.update({key: info.get(key) for key in (
+                'blocks', 'headers', 'verification_progress', 'initial_block_download', 'peers',
+                'size_on_disk', 'pruned')})
+            status['errors'] = info['errors']
+            status['dbcache_mb'] = node.started_with('dbcache')
+        return status
+
+    def statuses(self) -> List[Dict[str, Any]]:
+        # Every node's status, asked in parallel; a node that doesn't answer within
+        # NODE_STATUS_TIMEOUT is reported as unknown rather than holding up the rest
+        nodes = self.nodes()
+        futures = [self._pool.submit(self.status, node) for node in nodes]
+        wait(futures, timeout=NODE_STATUS_TIMEOUT)
+        shares = self.memory_shares()
+
+        results = []
+        for node, future in zip(nodes, futures):
+            if not future.done():
+                future.cancel()
+                status = {'name': node.name, 'chain': node.spec.chain, 'primary': node.spec.primary,
+                          'running': None, 'errors': {'status': f"No answer within {NODE_STATUS_TIMEOUT}s"}}
+            elif future.exception() is not None:
+                logger.error(f"Failed to get the status of node {node.name}: {future.exception()}")
+                status = {'name': node.name, 'chain': node.spec.chain, 'primary': node.spec.primary,
+                          'running': None, 'errors': {'status': str(future.exception())}}
+            else:
+                status = future.result()
+            # A running node's share of the budget – one whose dbcache_mb differs picks it up
+            # on its next restart. A stopped one: what it would start with now, or why it can't
+            if node.name in shares:
+                status['dbcache_share_mb'] = shares[node.name]['dbcache']
+            elif status.get('running') is False:
+                share, error = self.memory_share(node)
+                status['dbcache_share_mb'] = share['dbcache'] if share else None
+                if error:
+                    status['memory_warning'] = error
+            results.append(status)
+        return results
+
+
+node_registry = NodeRegistry()
@@ -0,0 +1,253 @@
+import os
+import select
+import threading
+import time
+import logging
+from pathlib import Path
+from typing import List, Optional, Tuple
+from meadow_web.config import BITCOIN_DATA_DIR, PROCESS_PROBE_TTL
+
+logger = logging.getLogger(__name__)
+
+PROC_DIR = Path('/proc')
+
+# Clock ticks per second – /proc/<pid>/stat reports start times in these units
+_CLK_TCK = os.sysconf('SC_CLK_TCK') if hasattr(os, 'sysconf') else 100
+
+# Pidfile timestamps have coarse resolution and bitcoind writes the file a moment
+# after it starts, so allow a little slack when comparing the two
+_START_TIME_SLACK = 2.0
+
+_boot_time: Optional[float] = None
+
+
+def _get_boot_time() -> float:
+    # Seconds since epoch when the system booted – read once, it never changes
+    global _boot_time
+    if _boot_time is None:
+        try:
+            with open(PROC_DIR / 'stat', 'r') as f:
+                for line in f:
+                    if line.startswith('btime '):
+                        _boot_time = float(line.split()[1])
+                        break
+        except OSError as e:
+            logger.error(f"Failed to read boot time: {e}")
+        if _boot_time is None:
+            _boot_time = 0.0
+    return _boot_time
+
+
+def read_cmdline(pid: int) -> Optional[List[str]]:
+    # Argument vector of a process, or None if it is gone (or a kernel thread)
+    try:
+        with open(PROC_DIR / str(pid) / 'cmdline', 'rb') as f:
+            raw = f.read()
+    except OSError:
+        return None
+    if not raw:
+        return None
+    return [arg.decode('utf-8', 'replace') for arg in raw.rstrip(b'\0').split(b'\0')]
+
+
+def read_start_time(pid: int) -> Optional[float]:
+    # Process start time as seconds since epoch, taken from field 22 of /proc/<pid>/stat
+    # (None once the process has exited)
+    try:
+        with open(PROC_DIR / str(pid) / 'stat', 'r') as f:
+            stat = f.read()
+    except OSError:
+        return None
+    # The command name (field 2) may contain spaces and parens, so split after the last ')'
+    fields = stat[stat.rfind(')') + 2:].split()
+    if fields and fields[0] in ('Z', 'X'):
+        return None  # exited, just not reaped yet by its parent – as good as gone
+    try:
+        start_ticks = int(fields[19])
+    except (IndexError, ValueError):
+        return None
+    return _get_boot_time() + start_ticks / _CLK_TCK
+
+
+def find_pids(needle: str) -> List[int]:
+    # Procfs equivalent of `pgrep -f <needle>` – no fork, just a directory walk
+    pids = []
+    own_pid = os.getpid()
+    try:
+        entries = os.listdir(PROC_DIR)
+    except OSError as e:
+        logger.error(f"Failed to list {PROC_DIR}: {e}")
+        return pids
+
+    for entry in entries:
+        if not entry.isdigit():
+            continue
+        pid = int(entry)
+        if pid == own_pid:
+            continue
+        cmdline = read_cmdline(pid)
+        if cmdline and needle in ' '.join(cmdline):
+            pids.append(pid)
+    return pids
+
+
+def _read_pidfile(pidfile: Path) -> Tuple[Optional[int], Optional[float]]:
+    # Returns (pid, mtime) from a pidfile, or (None, None) if there is none
+    try:
+        with open(pidfile, 'r') as f:
+            pid = int(f.read().strip())
+        return pid, pidfile.stat().st_mtime
+    except (OSError, ValueError):
+        return None, None
+
+
+class ExitWatcher:
+    # Waits for one particular process to exit, without polling.
+    #
+    # Uses a pidfd (Linux 5.3+): it refers to the process itself rather than its number,
+    # so a recycled PID can never be mistaken for it, and poll() wakes up the moment it
+    # exits. Create the watcher *before* asking the process to stop. Where pidfds aren't
+    # available it falls back to checking /proc/<pid> a few times a second.
+
+    _FALLBACK_INTERVAL = 0.25
+
+    def __init__(self, pid: int):
+        self.pid = pid
+        self._pidfd: Optional[int] = None
+        self._start_time = read_start_time(pid)
+        if hasattr(os, 'pidfd_open'):
+            try:
+                self._pidfd = os.pidfd_open(pid)
+            except ProcessLookupError:
+                self._start_time = None  # already gone
+            except OSError as e:
+                logger.debug(f"pidfd_open({pid}) failed, falling back to /proc polling: {e}")
+
+    def _gone(self) -> bool:
+        return self._start_time is None or read_start_time(self.pid) != self._start_time
+
+    def wait(self, timeout: float) -> bool:
+        # True once the process has exited, False if it is still running after `timeout`
+        if self._pidfd is not None:
+            poller = select.poll()
+            poller.register(self._pidfd, select.POLLIN)
+            return bool(poller.poll(max(timeout, 0) * 1000))
+
+        deadline = time.monotonic() + timeout
+        while not self._gone():
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return False
+            time.sleep(min(self._FALLBACK_INTERVAL, remaining))
+        return True
+
+    def close(self) -> None:
+        if self._pidfd is not None:
+            os.close(self._pidfd)
+            self._pidfd = None
+
+    def __enter__(self) -> 'ExitWatcher':
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+
+class ProcessProbe:
+    # Finds a bitcoind process for one data directory without forking `ps`.
+    #
+    # Order of checks: the PID we saw last time (if its start time still matches),
+    # then bitcoind's pidfile, then a single procfs scan. The result is cached for
+    # `ttl` seconds and shared by every request thread.
+
+    def __init__(self, data_dir: Path, binary_name: str = 'bitcoind',
+                 pidfile_name: str = 'bitcoind.pid', ttl: float = PROCESS_PROBE_TTL):
+        self.data_dir = Path(data_dir)
+        self.binary_name = binary_name
+        self.pidfile = self.data_dir / pidfile_name
+        self.ttl = ttl
+
+        self._lock = threading.Lock()
+        self._checked_at = 0.0
+        self._pid: Optional[int] = None
+        self._start_time: Optional[float] = None
+
+    def _matches(self, cmdline: Optional[List[str]]) -> bool:
+        # Is this argv a bitcoind serving *our* data directory?
+        if not cmdline or os.path.basename(cmdline[0]) != self.binary_name:
+            return False
+        for arg in cmdline[1:]:
+            if arg.startswith('-datadir='):
+                return Path(arg.split('=', 1)[1]).resolve() == self.data_dir.resolve()
+        # No explicit datadir means bitcoind picked it up from its config – accept it
+        return True
+
+    def _check_known(self) -> bool:
+        # Cheap path: the process we found last time is still the same process
+        if self._pid is None:
+            return False
+        start_time = read_start_time(self._pid)
+        return start_time is not None and start_time == self._start_time
+
+    def _check_pidfile(self) -> Optional[Tuple[int, float]]:
+        pid, written_at = _read_pidfile(self.pidfile)
+        if pid is None:
+            return None
+
+        start_time = read_start_time(pid)
+        if start_time is None:
+            logger.debug(f"Pidfile {self.pidfile} points at dead PID {pid}")
+            return None
+
+        # A process that started after the pidfile was written has reused the PID
+        if start_time > written_at + _START_TIME_SLACK:
+            logger.debug(f"PID {pid} from {self.pidfile} was reused by a newer process")
+            return None
+
+        if not self._matches(read_cmdline(pid)):
+            logger.debug(f"PID {pid} from {self.pidfile} is not {self.binary_name}")
+            return None
+        return pid, start_time
+
+    def _scan(self) -> Optional[Tuple[int, float]]:
+        # Last resort, e.g. bitcoind is still starting and hasn't written its pidfile yet
+        for pid in find_pids(self.binary_name):
+            if self._matches(read_cmdline(pid)):
+                start_time = read_start_time(pid)
+                if start_time is not None:
+                    return pid, start_time
+        return None
+
+    def _refresh(self) -> None:
+        if self._check_known():
+            return
+
+        found = self._check_pidfile() or self._scan()
+        if found:
+            self._pid, self._start_time = found
+            logger.debug(f"Found {self.binary_name} process: PID {self._pid}")
+        else:
+            self._pid, self._start_time = None, None
+            logger.debug(f"No {self.binary_name} process found")
+
+    def get_pid(self, max_age: Optional[float] = None) -> Optional[int]:
+        # PID of the running process (or None), at most `max_age` seconds stale
+        max_age = self.ttl if max_age is None else max_age
+        with self._lock:
+            now = time.monotonic()
+            if now - self._checked_at >= max_age:
+                self._refresh()
+                self._checked_at = now
+            return self._pid
+
+    def is_running(self, max_age: Optional[float] = None) -> bool:
+        return self.get_pid(max_age) is not None
+
+    def invalidate(self) -> None:
+        # Forces the next lookup to hit /proc, e.g. right after a start/stop
+        with self._lock:
+            self._checked_at = 0.0
+
+
+# Shared probe for the node this web app manages
+bitcoind_probe = ProcessProbe(BITCOIN_DATA_DIR)
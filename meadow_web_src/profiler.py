@@ -0,0 +1,82 @@
+import os
+import sys
+import threading
+import time
+import logging
+from collections import Counter
+from pathlib import Path
+from typing import Optional
+from meadow_web.config import PROFILE_DIR, PROFILE_INTERVAL, PROFILE_KEEP
+
+logger = logging.getLogger(__name__)
+
+# On-demand sampling profiler for a single request.
+#
+# A helper thread looks at the request thread's current stack every PROFILE_INTERVAL
+# seconds (sys._current_frames, no tracing hooks – the request runs at full speed) and
+# counts identical stacks. The result is written in the "folded" format, one
+# `outer;inner;leaf count` line per stack, which flamegraph.pl, speedscope and
+# inferno all read directly.
+
+_MAX_DEPTH = 200
+
+
+def _frame_name(frame) -> str:
+    code = frame.f_code
+    module = frame.f_globals.get('__name__', '?')
+    name = getattr(code, 'co_qualname', code.co_name)
+    # ';' separates frames and the last ' ' separates the count in folded stacks
+    return f"{module}.{name}:{frame.f_lineno}".replace(';', ':').replace(' ', '_')
+
+
+class SamplingProfiler:
+
+    def __init__(self, thread_id: int, interval: float = PROFILE_INTERVAL):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks: Counter = Counter()
+        self.samples = 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name='profiler', daemon=True)
+
+    def start(self) -> 'SamplingProfiler':
+        self.started = time.perf_counter()
+        self._thread.start()
+        return self
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is None:
+                continue
+            names = []
+            while frame is not None and len(names) < _MAX_DEPTH:
+                names.append(_frame_name(frame))
+                frame = frame.f_back
+            self.stacks[';'.join(reversed(names))] += 1
+            self.samples += 1
+
+    def stop(self) -> float:
+        # Returns the profiled wall time in seconds
+        self._stop.set()
+        self._thread.join()
+        return time.perf_counter() - self.started
+
+    def folded(self) -> str:
+        return ''.join(f"{stack} {count}\n" for stack, count in self.stacks.most_common())
+
+    def save(self, label: str, directory: Path = PROFILE_DIR) -> Optional[Path]:
+        # Writes <time>-<label>.folded and drops the oldest files beyond PROFILE_KEEP
+        safe_label = ''.join(c if c.isalnum() or c in '-_.' else '_' for c in label)
+        path = directory / f"{time.strftime('%Y%m%d-%H%M%S')}-{safe_label}.folded"
+        try:
+            directory.mkdir(parents=True, exist_ok=True)
+            path.write_text(self.folded())
+            old = sorted(directory.glob('*.folded'), key=lambda p: p.stat().st_mtime)[:-PROFILE_KEEP]
+            for stale in old:
+                os.unlink(stale)
+        except OSError as e:
+            logger.error(f"Failed to save profile {path}: {e}")
+            return None
+        logger.info(f"Saved profile of {label} ({self.samples} samples) to {path}")
+        return path
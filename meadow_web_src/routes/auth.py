@@ -5,8 +5,9 @@ import subprocess
 import os
 
 from meadow_web.extensions import db
-from meadow_web.models import User
+from meadow_web.models import User, user_cache
 from meadow_web.config import SCRIPTS_DIR
+from meadow_web.metrics import run_subprocess
 
 # Auth blueprint for handling login/register/logout
 auth_bp = Blueprint('auth', __name__)
@@ -14,7 +15,7 @@ auth_bp = Blueprint('auth', __name__)
 @auth_bp.route('/register', methods=['GET', 'POST'])
 def register():
     # First-user-only registration – once one exists, block more
-    if User.query.first() is not None:
+    if user_cache.get() is not None:
         return redirect(url_for('auth.login'))
     
     if request.method == 'POST':
@@ -32,7 +33,7 @@ def register():
             flash('Passwords do not match', 'error')
             return redirect(url_for('auth.register'))
 
-        # All good, create user and save to DB
+        # All good, create user and save to DB (the commit drops the cached "no user yet")
         user = User(username=username)
         user.set_password(password)
         db.session.add(user)
@@ -42,7 +43,7 @@ def register():
         # Note: this gets removed after executing it, sort of like a one time use.
         try:
             script_path = os.path.join(SCRIPTS_DIR, 'create-user.sh')
-            subprocess.run([script_path, username, password], check=True)
+            run_subprocess('create-user', [script_path, username, password], check=True)
         except subprocess.CalledProcessError as e:
             flash(f'User created but system setup failed: {str(e)}', 'warning')
         except Exception as e:
@@ -61,16 +62,14 @@ def login():
         return redirect(url_for('dashboard.dashboard'))
     
     # No users yet? Redirect to registration
-    user_exists = User.query.first() is not None
-    if not user_exists:
+    # We assume single-user mode, so it's the only one – straight from memory, not SQLite
+    user = user_cache.get()
+    if user is None:
         return redirect(url_for('auth.register'))
     
     if request.method == 'POST':
         password = request.form.get('password')
 
-        # We assume single-user mode, so we grab the only one
-        user = User.query.first()
-
         # Validate password and log in
         if user and user.check_password(password):
             login_user(user)
@@ -1,88 +1,611 @@
-from flask import Blueprint, render_template, jsonify, request
+import json
+import re
+import time
+from pathlib import Path
+from flask import Blueprint, render_template, jsonify, request, Response
 from flask_login import login_required, current_user
 from meadow_web.bitcoin_utils import (
     is_bitcoin_installed,
-    is_bitcoin_running,
+    activate_bitcoin_version,
     start_bitcoin_node,
     stop_bitcoin_node,
-    is_installation_in_progress
+    is_installation_in_progress,
+    is_node_operation_in_progress
+)
+from meadow_web import assumeutxo, conf_tuner, datadir_clone
+from meadow_web.debug_log import debug_log
+from meadow_web.events import event_hub
+from meadow_web.ibd_monitor import ibd_monitor
+from meadow_web.jobs import job_registry
+from meadow_web.node_info import get_node_info, node_info_cache
+from meadow_web.nodes import node_registry
+from meadow_web.sampler import history
+from meadow_web.status_monitor import status_monitor
+from meadow_web.storage import storage_monitor, plan_budget, apply_budget
+from meadow_web.supervisor import supervisor
+from meadow_web.zmq_bridge import zmq_bridge
+from meadow_web.config import (
+    STATUS_STREAM_KEEPALIVE, BITCOIN_DATA_DIR, BITCOIN_SUPERVISED, LOG_PAGE_SIZE, LOG_PAGE_SIZE_MAX
 )
 
 # Blueprint for anything dashboard-related (UI + API endpoints)
 dashboard_bp = Blueprint('dashboard', __name__)
 
+def _sse(event, data, event_id=None):
+    # Formats one Server-Sent Event
+    prefix = f"id: {event_id}\n" if event_id is not None else ""
+    return f"{prefix}event: {event}\ndata: {json.dumps(data)}\n\n"
+
+def _event_stream_response(stream):
+    return Response(stream, mimetype='text/event-stream', headers={
+        'Cache-Control': 'no-cache',
+        'X-Accel-Buffering': 'no'  # tell nginx not to buffer the stream
+    })
+
+def _job_event_stream(job):
+    # Streams a job's progress until it finishes
+    def generate():
+        state = job.to_dict()
+        while True:
+            yield _sse('progress', state, state['version'])
+            if state['status'] != 'running':
+                return
+            while not job_registry.wait_for_change(job, state['version'], STATUS_STREAM_KEEPALIVE):
+                yield ": keep-alive\n\n"
+            state = job.to_dict()
+
+    return _event_stream_response(generate())
+
 @dashboard_bp.route('/dashboard')
 @login_required
 def dashboard():
-    # Renders the main dashboard and passes in the current Bitcoin status
+    # Renders the main dashboard with the monitor's latest view of the node
+    status = status_monitor.snapshot()
     return render_template(
         'dashboard.html',
         username=current_user.username,
-        bitcoin_installed=is_bitcoin_installed(),
-        bitcoin_running=is_bitcoin_running(),
-        bitcoin_installing=is_installation_in_progress()
+        bitcoin_installed=status.get('is_installed', False),
+        bitcoin_running=status.get('is_running', False),
+        bitcoin_installing=status.get('installing', False),
+        active_version=status.get('active_version'),
+        installed_versions=status.get('installed_versions', [])
     )
 
 @dashboard_bp.route('/api/bitcoin/install', methods=['POST'])
 @login_required
 def install_bitcoin():
-    """API: Kicks off Bitcoin Core installation (runs install script)"""
+    """API: Kicks off Bitcoin Core installation as a background job"""
     from meadow_web.bitcoin_utils import install_bitcoin as install_bitcoin_core
 
-    # Don't allow multiple installs at once – script isn't meant to be parallel-safe
-    if is_installation_in_progress():
+    # The registry refuses a second install job while one is running
+    started, job = job_registry.start('install', install_bitcoin_core)
+    if not started:
         return jsonify({
             'success': False,
             'message': "Bitcoin installation already in progress",
             'installed': False,
-            'installing': True
+            'installing': True,
+            'job': job.to_dict()
         })
-    
-    success, message = install_bitcoin_core()
+
     return jsonify({
-        'success': success,
-        'message': message,
-        'installed': success,  # if install worked, then it's installed now
-        'installing': is_installation_in_progress()  # might still be in progress if it’s slow
-    })
+        'success': True,
+        'message': "Bitcoin installation started",
+        'installed': False,
+        'installing': True,
+        'job': job.to_dict()
+    }), 202
 
 @dashboard_bp.route('/api/bitcoin/status', methods=['GET'])
 @login_required
 def bitcoin_status():
     """API: Gets live info on whether Bitcoin is installed/running/installing"""
+    # Served from the status monitor's snapshot – no system checks per request
+    status = status_monitor.snapshot()
+    etag = f'"status-{status["version"]}"'
+    if etag in request.headers.get('If-None-Match', ''):
+        return Response(status=304, headers={'ETag': etag})
+
+    response = jsonify({
+        'is_running': status.get('is_running', False),
+        'is_installed': status.get('is_installed', False),
+        'installing': status.get('installing', False),
+        'node_operation': status.get('node_operation'),
+        'supervisor': status.get('supervisor'),
+        'active_version': status.get('active_version'),
+        'installed_versions': status.get('installed_versions', [])
+    })
+    response.headers['ETag'] = etag
+    response.headers['Cache-Control'] = 'no-cache'
+    return response
+
+@dashboard_bp.route('/api/bitcoin/info', methods=['GET'])
+@login_required
+def bitcoin_info():
+    """API: Sync and health details (height, progress, peers, mempool, disk) for the dashboard"""
+    # No point asking RPC while the node is down
+    if not status_monitor.snapshot().get('is_running'):
+        return jsonify({'available': False, 'message': 'Bitcoin node is not running'})
+
+    # Served from a shared cache: concurrent pollers cost at most one RPC batch
+    info = get_node_info()
+    info['available'] = 'blockchain' not in info['errors']
+    # New blocks are pushed on the status stream while this is on
+    info['block_notifications'] = zmq_bridge.state()['connected']
+    # Background validation runs up to the snapshot's height, which only the snapshot list knows
+    if 'chainstates' in info:
+        snapshot = assumeutxo.known_snapshot(info['chainstates']['snapshot_blockhash'])
+        info['chainstates']['snapshot_height'] = snapshot['height'] if snapshot else None
+    return jsonify(info)
+
+@dashboard_bp.route('/api/bitcoin/ibd', methods=['GET'])
+@login_required
+def bitcoin_ibd():
+    """API: Initial sync throughput, ETA and what's currently limiting it (cpu, disk or peers)"""
+    # Updated by the sampler thread, so this never touches RPC or /proc itself
+    return jsonify(ibd_monitor.snapshot())
+
+@dashboard_bp.route('/api/history', methods=['GET'])
+@login_required
+def history_series():
+    """API: Recorded history for the charts, e.g. ?series=blocks,cpu_percent&start=...&points=300"""
+    now = time.time()
+    try:
+        end = float(request.args.get('end', now))
+        start = float(request.args.get('start', end - 3600))
+        max_points = min(int(request.args.get('points', 300)), 2000)
+    except ValueError:
+        return jsonify({'success': False, 'message': 'start, end and points must be numbers'}), 400
+
+    available = history.series_names()
+    requested = request.args.get('series')
+    names = [name for name in requested.split(',') if name in available] if requested else available
+
     return jsonify({
-        'is_running': is_bitcoin_running(),
-        'is_installed': is_bitcoin_installed(),
-        'installing': is_installation_in_progress()
+        'start': start,
+        'end': end,
+        'series': {name: history.query(name, start, end, max_points) for name in names},
+        'available': available
     })
 
+_LOG_CATEGORY_RE = re.compile(r'^[a-z0-9_]+$')
+
+@dashboard_bp.route('/api/bitcoin/log', methods=['GET'])
+@login_required
+def bitcoin_log():
+    """API: debug.log search, newest first, e.g. ?q=regex&category=net&start=...&end=...&before=<offset>&limit=100"""
+    # Page through older results by passing the returned next_before back as `before`
+    try:
+        start = float(request.args['start']) if request.args.get('start') else None
+        end = float(request.args['end']) if request.args.get('end') else None
+        before = int(request.args['before']) if request.args.get('before') else None
+        limit = max(1, min(int(request.args.get('limit', LOG_PAGE_SIZE)), LOG_PAGE_SIZE_MAX))
+    except ValueError:
+        return jsonify({'success': False, 'message': 'start, end, before and limit must be numbers'}), 400
+
+    category = request.args.get('category') or None
+    if category and not _LOG_CATEGORY_RE.match(category):
+        return jsonify({'success': False, 'message': 'Invalid category'}), 400
+    pattern = request.args.get('q') or None
+    if pattern:
+        try:
+            re.compile(pattern.encode())
+        except re.error as e:
+            return jsonify({'success': False, 'message': f'Invalid search pattern: {e}'}), 400
+
+    return jsonify(debug_log.search(pattern, category, start, end, before, limit))
+
+@dashboard_bp.route('/api/bitcoin/log/stream', methods=['GET'])
+@login_required
+def bitcoin_log_stream():
+    """API: Server-Sent Events stream of new debug.log lines"""
+    # Starts with the last page of the log; a reconnecting EventSource resumes from its
+    # Last-Event-ID ("generation:offset") so no line is sent twice or skipped
+    resume = request.headers.get('Last-Event-ID', '')
+    try:
+        generation, offset = (int(part) for part in resume.split(':'))
+    except ValueError:
+        generation = offset = None
+
+    def generate():
+        nonlocal generation, offset
+        if offset is None:
+            lines, offset, generation = debug_log.tail(LOG_PAGE_SIZE)
+            yield _sse('lines', {'lines': lines, 'reset': True}, f"{generation}:{offset}")
+        while True:
+            size = debug_log.status()['size']
+            lines, new_offset, current = debug_log.read_from(offset, generation)
+            if lines or current != generation:
+                # reset: the log was rotated or truncated, this is the top of the new file
+                yield _sse('lines', {'lines': lines, 'reset': current != generation}, f"{current}:{new_offset}")
+                generation, offset = current, new_offset
+                continue
+            if not debug_log.wait_for_change(size, generation, STATUS_STREAM_KEEPALIVE):
+                yield ": keep-alive\n\n"
+
+    return _event_stream_response(generate())
+
+@dashboard_bp.route('/api/bitcoin/status/stream', methods=['GET'])
+@login_required
+def bitcoin_status_stream():
+    """API: Server-Sent Events stream of node status changes, new blocks, mempool activity and disk alerts"""
+    # Events: 'status' (when it changes), 'block' and 'mempool' (from bitcoind's ZMQ
+    # notifications), 'storage' (disk alerts raised or cleared) and 'resync' when this
+    # client fell behind and events were dropped
+    def generate():
+        # Subscribed before the first snapshot, so no change can slip in between
+        with event_hub.subscribe() as subscription:
+            status = status_monitor.snapshot()
+            yield _sse('status', status, status['version'])
+            while True:
+                events, lagged = subscription.get(STATUS_STREAM_KEEPALIVE)
+                if lagged:
+                    status = status_monitor.snapshot()
+                    yield _sse('resync', {})
+                    yield _sse('status', status, status['version'])
+                for event, data in events:
+                    if event == 'status':
+                        if data['version'] <= status['version']:
+                            continue  # already sent
+                        status = data
+                        yield _sse(event, data, data['version'])
+                    else:
+                        yield _sse(event, data)
+                if not events and not lagged:
+                    # Nothing new – a comment line keeps nginx/Tor from closing the idle stream
+                    yield ": keep-alive\n\n"
+
+    return _event_stream_response(generate())
+
+# Jobs that need the node left alone (an export stops and restarts it by itself)
+_NODE_BUSY = {
+    'snapshot': 'A UTXO snapshot is being loaded – wait for it to finish',
+    'datadir': 'Chain data is being exported or imported – wait for it to finish'
+}
+
+def _start_node_job(target, verb, node=None, memory_check=False):
+    # Start and stop share the node's job kind ('node' for the primary one), so only one
+    # of them can run at a time
+    node = node or node_registry.primary
+    for kind, message in _NODE_BUSY.items() if node.spec.primary else ():
+        busy = job_registry.active(kind)
+        if busy is not None:
+            return jsonify({'success': False, 'message': message, 'job': busy.to_dict()}), 409
+    if memory_check and not node.probe.is_running():
+        # Refuse up front rather than in the job, so the dashboard shows why
+        _, error_msg = node_registry.memory_share(node)
+        if error_msg:
+            return jsonify({'success': False, 'message': error_msg}), 409
+    started, job = job_registry.start(node.job_kind, target, node)
+    if not started:
+        return jsonify({
+            'success': False,
+            'message': 'Another start/stop of the node is already in progress',
+            'job': job.to_dict()
+        }), 409
+    return jsonify({
+        'success': True,
+        'message': f'{verb} Bitcoin node' if node.spec.primary else f'{verb} the {node.name} node',
+        'job': job.to_dict()
+    }), 202
+
 @dashboard_bp.route('/api/bitcoin/start', methods=['POST'])
 @login_required
 def start_bitcoin():
-    """API: Starts the Bitcoin node using the shell script"""
-    success, message = start_bitcoin_node()
-    return jsonify({
-        'success': success,
-        'message': message,
-        'is_running': success  # If it started successfully, it should be running
-    })
+    """API: Starts the Bitcoin node in the background; done once RPC answers"""
+    return _start_node_job(start_bitcoin_node, 'Starting', memory_check=True)
 
 @dashboard_bp.route('/api/bitcoin/install/status', methods=['GET'])
 @login_required
 def installation_status():
-    """API: Gets current install progress (used for polling)"""
+    """API: Gets current install state, including the latest install job"""
+    job = job_registry.latest('install')
     return jsonify({
         'installing': is_installation_in_progress(),
-        'is_installed': is_bitcoin_installed()
+        'is_installed': is_bitcoin_installed(),
+        'job': job.to_dict() if job else None
     })
 
+@dashboard_bp.route('/api/bitcoin/install/<job_id>/progress', methods=['GET'])
+@login_required
+def installation_progress(job_id):
+    """API: Server-Sent Events stream of an install job's phase, bytes and ETA"""
+    job = job_registry.get(job_id)
+    if job is None or job.kind != 'install':
+        return jsonify({'success': False, 'message': 'Unknown installation job'}), 404
+    return _job_event_stream(job)
+
 @dashboard_bp.route('/api/bitcoin/stop', methods=['POST'])
 @login_required
 def stop_bitcoin():
-    """API: Gracefully stops the Bitcoin node via shell script"""
-    success, message = stop_bitcoin_node()
+    """API: Gracefully stops the Bitcoin node (RPC stop) in the background"""
+    return _start_node_job(stop_bitcoin_node, 'Stopping')
+
+@dashboard_bp.route('/api/bitcoin/node/<job_id>/progress', methods=['GET'])
+@login_required
+def node_operation_progress(job_id):
+    """API: Server-Sent Events stream of a node start/stop until it finishes"""
+    job = job_registry.get(job_id)
+    if job is None or not (job.kind == 'node' or job.kind.startswith('node:')):
+        return jsonify({'success': False, 'message': 'Unknown node operation'}), 404
+    return _job_event_stream(job)
+
+@dashboard_bp.route('/api/nodes', methods=['GET'])
+@login_required
+def nodes_status():
+    """API: Every registered node (one per chain) with its status, asked in parallel"""
+    return jsonify({'nodes': node_registry.statuses()})
+
+def _registered_node(name):
+    node = node_registry.get(name)
+    if node is None:
+        return None, (jsonify({'success': False, 'message': f'No node called {name}'}), 404)
+    return node, None
+
+@dashboard_bp.route('/api/nodes/<name>', methods=['GET'])
+@login_required
+def node_status(name):
+    """API: Status of one node"""
+    node, error = _registered_node(name)
+    return error or jsonify(node_registry.status(node))
+
+@dashboard_bp.route('/api/nodes/<name>/start', methods=['POST'])
+@login_required
+def start_node(name):
+    """API: Starts one node in the background, with its share of the memory budget"""
+    node, error = _registered_node(name)
+    return error or _start_node_job(start_bitcoin_node, 'Starting', node, memory_check=True)
+
+@dashboard_bp.route('/api/nodes/<name>/stop', methods=['POST'])
+@login_required
+def stop_node(name):
+    """API: Gracefully stops one node in the background"""
+    node, error = _registered_node(name)
+    return error or _start_node_job(stop_bitcoin_node, 'Stopping', node)
+
+@dashboard_bp.route('/api/bitcoin/snapshot', methods=['GET'])
+@login_required
+def snapshot_state():
+    """API: UTXO snapshot files found on the data disk/USB and the latest snapshot load"""
+    job = job_registry.latest('snapshot')
+    return jsonify({
+        'files': assumeutxo.find_snapshot_files(),
+        'job': job.to_dict() if job else None
+    })
+
+@dashboard_bp.route('/api/bitcoin/snapshot/load', methods=['POST'])
+@login_required
+def load_snapshot():
+    """API: Checks a UTXO snapshot and loads it into the node (loadtxoutset) in the background"""
+    path = (request.get_json(silent=True) or {}).get('path')
+    # Only files we found ourselves – this is not a way to hand bitcoind arbitrary paths
+    if path not in {found['path'] for found in assumeutxo.find_snapshot_files() if found['usable']}:
+        return jsonify({'success': False, 'message': 'Not a usable snapshot file'}), 400
+    if (not status_monitor.snapshot().get('is_running') or is_node_operation_in_progress()
+            or job_registry.active('datadir') is not None):
+        return jsonify({'success': False, 'message': 'The node has to be running'}), 409
+
+    started, job = job_registry.start('snapshot', assumeutxo.load_snapshot, path)
+    if not started:
+        return jsonify({
+            'success': False,
+            'message': 'A snapshot is already being loaded',
+            'job': job.to_dict()
+        }), 409
+    return jsonify({
+        'success': True,
+        'message': 'Loading UTXO snapshot',
+        'job': job.to_dict()
+    }), 202
+
+@dashboard_bp.route('/api/bitcoin/snapshot/<job_id>/progress', methods=['GET'])
+@login_required
+def snapshot_progress(job_id):
+    """API: Server-Sent Events stream of a snapshot load (checks, then coins loaded)"""
+    job = job_registry.get(job_id)
+    if job is None or job.kind != 'snapshot':
+        return jsonify({'success': False, 'message': 'Unknown snapshot job'}), 404
+    return _job_event_stream(job)
+
+@dashboard_bp.route('/api/bitcoin/datadir', methods=['GET'])
+@login_required
+def datadir_state():
+    """API: Chain data export/import – an unfinished import to resume and the latest job"""
+    job = job_registry.latest('datadir')
+    return jsonify({
+        'compression': datadir_clone.default_compression(),
+        'unfinished_import': datadir_clone.import_in_progress(),
+        'job': job.to_dict() if job else None
+    })
+
+def _start_datadir_job(target, *args):
+    if is_node_operation_in_progress() or job_registry.active('snapshot') is not None:
+        return jsonify({'success': False, 'message': 'Wait for the node operation to finish'}), 409
+    started, job = job_registry.start('datadir', target, *args)
+    if not started:
+        return jsonify({
+            'success': False,
+            'message': 'An export or import is already running',
+            'job': job.to_dict()
+        }), 409
+    return jsonify({'success': True, 'message': 'Started', 'job': job.to_dict()}), 202
+
+def _datadir_path(data, key):
+    # An absolute folder outside the data dir – an export inside it would archive its own
+    # chunks and fill the disk it's exporting, and an import from it would overwrite itself
+    path = (data.get(key) or '').strip()
+    if not path.startswith('/'):
+        return None, 'Give the export folder as an absolute path'
+    if Path(path).resolve().is_relative_to(BITCOIN_DATA_DIR.resolve()):
+        return None, f'The export folder has to be outside the node\'s data directory ({BITCOIN_DATA_DIR})'
+    return path, None
+
+@dashboard_bp.route('/api/bitcoin/datadir/export', methods=['POST'])
+@login_required
+def export_datadir():
+    """API: Exports blocks/ and chainstate/ into a folder (stops the node meanwhile) in the background"""
+    dest, error_msg = _datadir_path(request.get_json(silent=True) or {}, 'dest')
+    if dest is None:
+        return jsonify({'success': False, 'message': error_msg}), 400
+    return _start_datadir_job(datadir_clone.export_job, dest)
+
+@dashboard_bp.route('/api/bitcoin/datadir/import', methods=['POST'])
+@login_required
+def import_datadir():
+    """API: Imports an export's chain data into the (stopped) node in the background, resuming an earlier run"""
+    data = request.get_json(silent=True) or {}
+    source, error_msg = _datadir_path(data, 'source')
+    if source is None:
+        return jsonify({'success': False, 'message': error_msg}), 400
+    if status_monitor.snapshot().get('is_running'):
+        return jsonify({'success': False, 'message': 'Stop the node before importing chain data'}), 409
+    return _start_datadir_job(datadir_clone.import_job, source, bool(data.get('replace')))
+
+@dashboard_bp.route('/api/bitcoin/datadir/<job_id>/progress', methods=['GET'])
+@login_required
+def datadir_progress(job_id):
+    """API: Server-Sent Events stream of an export/import's bytes, throughput and ETA"""
+    job = job_registry.get(job_id)
+    if job is None or job.kind != 'datadir':
+        return jsonify({'success': False, 'message': 'Unknown export/import job'}), 404
+    return _job_event_stream(job)
+
+@dashboard_bp.route('/api/bitcoin/supervisor', methods=['GET'])
+@login_required
+def supervisor_state():
+    """API: Supervisor mode details – state, PID, restarts and recent exit codes"""
+    if not BITCOIN_SUPERVISED:
+        return jsonify({'enabled': False})
+    return jsonify(dict(supervisor.state(), enabled=True))
+
+@dashboard_bp.route('/api/bitcoin/versions', methods=['GET'])
+@login_required
+def bitcoin_versions():
+    """API: Lists installed Bitcoin Core releases and the active one"""
+    status = status_monitor.snapshot()
+    return jsonify({
+        'active_version': status.get('active_version'),
+        'installed_versions': status.get('installed_versions', [])
+    })
+
+@dashboard_bp.route('/api/bitcoin/versions/activate', methods=['POST'])
+@login_required
+def activate_version():
+    """API: Switches to another installed release (upgrade or rollback, no download)"""
+    version = (request.get_json(silent=True) or {}).get('version')
+    if not version:
+        return jsonify({'success': False, 'message': 'No version given'}), 400
+
+    success, message = activate_bitcoin_version(version)
+    status_monitor.refresh()
+    return jsonify({
+        'success': success,
+        'message': message
+    })
+
+def _suggested_profile():
+    # IBD settings while the node is catching up, steady-state ones after that
+    ibd = ibd_monitor.snapshot()
+    if ibd.get('available'):
+        return conf_tuner.PROFILE_IBD if ibd['initial_block_download'] else conf_tuner.PROFILE_STEADY
+    return conf_tuner.read_state().get('profile') or conf_tuner.PROFILE_IBD
+
+@dashboard_bp.route('/api/bitcoin/config', methods=['GET'])
+@login_required
+def bitcoin_config():
+    """API: Current tuning state plus what the tuner would change right now (dry run)"""
+    profile = request.args.get('profile') or _suggested_profile()
+    if profile not in conf_tuner.PROFILES:
+        return jsonify({'success': False, 'message': f'Unknown profile: {profile}'}), 400
+
+    try:
+        plan = conf_tuner.plan(profile)
+    except OSError as e:
+        return jsonify({'success': False, 'message': f'Failed to read bitcoin.conf: {str(e)}'}), 500
+    plan.pop('text')
+
+    return jsonify({
+        'success': True,
+        'state': conf_tuner.read_state(),
+        'plan': plan
+    })
+
+@dashboard_bp.route('/api/bitcoin/config/tune', methods=['POST'])
+@login_required
+def tune_config():
+    """API: Rewrites bitcoin.conf for this hardware (takes effect on the next node start)"""
+    if is_installation_in_progress():
+        return jsonify({'success': False, 'message': 'An installation is in progress'}), 409
+
+    requested = (request.get_json(silent=True) or {}).get('profile')
+    success, message = conf_tuner.apply_tuning(requested or _suggested_profile(), manual=bool(requested))
+    return jsonify({
+        'success': success,
+        'message': message,
+        'state': conf_tuner.read_state()
+    })
+
+@dashboard_bp.route('/api/bitcoin/config/rollback', methods=['POST'])
+@login_required
+def rollback_config():
+    """API: Puts the previous bitcoin.conf back"""
+    success, message = conf_tuner.rollback()
+    return jsonify({
+        'success': success,
+        'message': message,
+        'state': conf_tuner.read_state()
+    })
+
+def _cached_chain():
+    # Whatever getblockchaininfo said last – the planner works without it (node down)
+    chain = node_info_cache.peek('blockchain')
+    return chain if isinstance(chain, dict) else None
+
+def _budget_gb(value):
+    try:
+        budget = float(value)
+    except (TypeError, ValueError):
+        return None
+    return budget if budget > 0 else None
+
+@dashboard_bp.route('/api/storage', methods=['GET'])
+@login_required
+def storage_status():
+    """API: Data disk usage per component, growth, time-to-full, I/O pressure and alerts"""
+    # Measured by the sampler thread; this only reads the last results
+    return jsonify(storage_monitor.snapshot())
+
+@dashboard_bp.route('/api/storage/plan', methods=['GET'])
+@login_required
+def storage_plan():
+    """API: The prune target and index changes that fit a disk budget (dry run)"""
+    budget = _budget_gb(request.args.get('budget_gb'))
+    if budget is None:
+        return jsonify({'success': False, 'message': 'budget_gb must be a positive number'}), 400
+    usage = storage_monitor.usage()
+    if not usage:
+        return jsonify({'success': False, 'message': 'Disk usage has not been measured yet'}), 409
+
+    return jsonify({'success': True, 'plan': plan_budget(budget, usage, _cached_chain())})
+
+@dashboard_bp.route('/api/storage/budget', methods=['POST'])
+@login_required
+def storage_budget():
+    """API: Applies a disk budget to bitcoin.conf ({"budget_gb": null} removes it)"""
+    if is_installation_in_progress():
+        return jsonify({'success': False, 'message': 'An installation is in progress'}), 409
+
+    value = (request.get_json(silent=True) or {}).get('budget_gb')
+    budget = _budget_gb(value)
+    if value is not None and budget is None:
+        return jsonify({'success': False, 'message': 'budget_gb must be a positive number'}), 400
+    usage = storage_monitor.usage()
+    if budget is not None and not usage:
+        return jsonify({'success': False, 'message': 'Disk usage has not been measured yet'}), 409
+
+    success, message = apply_budget(budget, usage, _cached_chain())
     return jsonify({
         'success': success,
         'message': message,
-        'is_running': not success  # If stop worked, it should not be running anymore
+        'state': conf_tuner.read_state()
     })
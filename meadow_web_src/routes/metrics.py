@@ -0,0 +1,46 @@
+import hmac
+from flask import Blueprint, Response, jsonify, request, send_from_directory, abort
+from flask_login import login_required, current_user
+from meadow_web.metrics import registry
+from meadow_web.startup import startup_timer
+from meadow_web.config import METRICS_TOKEN, PROFILER_ENABLED, PROFILE_DIR
+
+# Blueprint for looking at the web app itself: metrics and request profiles
+metrics_bp = Blueprint('metrics', __name__)
+
+def _scraper_authorized() -> bool:
+    # A Prometheus scraper has no session cookie – it may present METRICS_TOKEN instead
+    if not METRICS_TOKEN:
+        return False
+    header = request.headers.get('Authorization', '')
+    return header.startswith('Bearer ') and hmac.compare_digest(header[7:], METRICS_TOKEN)
+
+@metrics_bp.route('/metrics', methods=['GET'])
+def metrics():
+    """API: Request, subprocess, template and SQL timings in Prometheus text format"""
+    if not (current_user.is_authenticated or _scraper_authorized()):
+        abort(401)
+    return Response(registry.render(), mimetype='text/plain; version=0.0.4')
+
+@metrics_bp.route('/api/debug/startup', methods=['GET'])
+@login_required
+def startup_report():
+    """API: How long the last cold start took, per phase, to app ready and to the first response"""
+    return jsonify({'success': True, **startup_timer.report()})
+
+@metrics_bp.route('/api/debug/profiles', methods=['GET'])
+@login_required
+def list_profiles():
+    """API: Saved request profiles (take one with ?_profile=1 on any URL when MEADOW_PROFILER=1)"""
+    if not PROFILER_ENABLED:
+        return jsonify({'success': False, 'message': 'Profiler is disabled (set MEADOW_PROFILER=1)'}), 404
+    files = sorted(PROFILE_DIR.glob('*.folded'), reverse=True) if PROFILE_DIR.is_dir() else []
+    return jsonify({'success': True, 'profiles': [path.name for path in files]})
+
+@metrics_bp.route('/api/debug/profiles/<name>', methods=['GET'])
+@login_required
+def download_profile(name):
+    """API: One profile as folded stacks – feed it to flamegraph.pl or speedscope"""
+    if not PROFILER_ENABLED:
+        abort(404)
+    return send_from_directory(PROFILE_DIR, name, mimetype='text/plain', as_attachment=True)
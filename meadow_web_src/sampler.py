@@ -0,0 +1,165 @@
+import atexit
+import threading
+import time
+import logging
+from typing import Dict, Optional
+from meadow_web.config import (
+    DATA_MOUNT_POINT,
+    TIMESERIES_LEVELS,
+    TIMESERIES_PATH,
+    TIMESERIES_SAMPLE_INTERVAL,
+    TIMESERIES_SAVE_INTERVAL
+)
+from meadow_web.conf_tuner import switch_after_ibd
+from meadow_web.ibd_monitor import ibd_monitor
+from meadow_web.node_info import node_info_cache
+from meadow_web.nodes import node_registry
+from meadow_web.process_probe import bitcoind_probe
+from meadow_web.storage import storage_monitor
+from meadow_web.system_stats import (
+    SECTOR_SIZE,
+    block_device_for,
+    busiest_core_percent,
+    cpu_percent,
+    disk_utilisation,
+    iowait_percent,
+    read_cpu_times,
+    read_diskstats,
+    read_meminfo
+)
+from meadow_web.timeseries import TimeSeriesStore
+
+logger = logging.getLogger(__name__)
+
+history = TimeSeriesStore(TIMESERIES_LEVELS, TIMESERIES_PATH)
+
+
+class Sampler:
+    # Background thread that records sync progress and resource usage into `history`
+    # every TIMESERIES_SAMPLE_INTERVAL seconds, and saves it to disk now and then.
+
+    def __init__(self, store: TimeSeriesStore, interval: float = TIMESERIES_SAMPLE_INTERVAL,
+                 save_interval: float = TIMESERIES_SAVE_INTERVAL):
+        self.store = store
+        self.interval = interval
+        self.save_interval = save_interval
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+
+        self._last_time: Optional[float] = None
+        self._last_cpu = None
+        self._last_swap = None
+        # Whether the node runs with assumevalid=0, read once per node run (None: not yet)
+        self._checks_all_scripts: Optional[bool] = None
+        # Whether the tuning has been checked since the node was last seen synced
+        self._synced_checked = False
+        self._last_disk = None
+
+    def start(self) -> None:
+        with self._lock:
+            if self._thread is not None:
+                return
+            self._thread = threading.Thread(target=self._run, name='sampler', daemon=True)
+        self.store.load()
+        atexit.register(self.store.save)
+        self._thread.start()
+        logger.info(f"Sampler started (every {self.interval}s)")
+
+    def _run(self) -> None:
+        saved_at = time.monotonic()
+        while True:
+            try:
+                self.sample()
+            except Exception as e:
+                logger.error(f"Error while sampling: {str(e)}", exc_info=True)
+
+            if time.monotonic() - saved_at >= self.save_interval:
+                self.store.save()
+                saved_at = time.monotonic()
+            time.sleep(self.interval)
+
+    def sample(self) -> Dict[str, Optional[float]]:
+        now = time.time()
+        elapsed = now - self._last_time if self._last_time else None
+        values: Dict[str, Optional[float]] = {}
+
+        cpu = read_cpu_times()
+        iowait = core_percent = None
+        if 'cpu' in cpu and self._last_cpu and 'cpu' in self._last_cpu:
+            values['cpu_percent'] = cpu_percent(self._last_cpu['cpu'], cpu['cpu'])
+            iowait = iowait_percent(self._last_cpu['cpu'], cpu['cpu'])
+        if self._last_cpu:
+            # Busiest single core – a one-thread sync is invisible in the all-core figure
+            core_percent = busiest_core_percent(self._last_cpu, cpu)
+        self._last_cpu = cpu
+
+        memory = read_meminfo()
+        if 'MemTotal' in memory and 'MemAvailable' in memory:
+            values['mem_used_percent'] = 100.0 * (1 - memory['MemAvailable'] / memory['MemTotal'])
+        # Swap growing between samples: the box is pushing memory out to make room
+        swap = memory['SwapTotal'] - memory['SwapFree'] if 'SwapTotal' in memory and 'SwapFree' in memory else None
+        swap_mb_per_sec = None
+        if swap is not None and self._last_swap is not None and elapsed:
+            swap_mb_per_sec = max(swap - self._last_swap, 0) / elapsed / 1e6
+        self._last_swap = swap
+
+        # The data disk S50data_partition mounted – that's where the chainstate lives
+        device = block_device_for(DATA_MOUNT_POINT)
+        disk = read_diskstats(device) if device else None
+        disk_percent = None
+        if disk and self._last_disk and elapsed:
+            values['disk_read_bps'] = (disk.sectors_read - self._last_disk.sectors_read) * SECTOR_SIZE / elapsed
+            values['disk_write_bps'] = (disk.sectors_written - self._last_disk.sectors_written) * SECTOR_SIZE / elapsed
+            disk_percent = disk_utilisation(self._last_disk, disk, elapsed)
+            values['disk_busy_percent'] = disk_percent
+            # Latency and queue depth for the disk budget manager's bottleneck alert
+            values.update(storage_monitor.observe_io(self._last_disk, disk, elapsed))
+        self._last_disk = disk
+
+        if storage_monitor.scan_due(now):
+            components = storage_monitor.scan(now)
+            values['disk_free_bytes'] = components.get('free')
+
+        chain = peers = None
+        if bitcoind_probe.is_running():
+            cached = node_info_cache.get()
+            chain = cached.get('blockchain')
+            network = cached.get('network')
+            if isinstance(network, dict):
+                peers = network.get('connections')
+        if not isinstance(chain, dict):
+            chain = None
+
+        # The busiest core only says something when scripts below assumevalid are skipped; with
+        # assumevalid=0 (the shipped bitcoin.conf) they're checked on all cores
+        if chain is None:
+            self._checks_all_scripts = None
+        elif self._checks_all_scripts is None:
+            self._checks_all_scripts = node_registry.primary.checks_all_scripts()
+        if self._checks_all_scripts:
+            core_percent = None
+
+        # Throughput and bottleneck verdict for the sync monitor
+        interval = ibd_monitor.observe(now, chain, peers, values.get('cpu_percent'), iowait, disk_percent,
+                                       core_percent, values.get('mem_used_percent'), swap_mb_per_sec)
+        if chain:
+            values['blocks'] = chain.get('blocks')
+            values['verification_progress'] = chain.get('verificationprogress')
+            values['blocks_per_sec'] = interval.get('blocks_per_sec')
+            values['mb_per_sec'] = interval.get('mb_per_sec')
+            # Node is synced – hand IBD-sized memory and cores back on the next restart. Checked
+            # against the saved profile once per synced stretch (so also on the first sample after
+            # the web app starts, in case the sync finished while it was down), not every sample
+            synced = chain.get('initialblockdownload') is False
+            if synced and not self._synced_checked:
+                switch_after_ibd()
+            self._synced_checked = synced
+        else:
+            self._synced_checked = False
+
+        self._last_time = now
+        self.store.record(now, values)
+        return values
+
+
+sampler = Sampler(history)
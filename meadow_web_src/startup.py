@@ -0,0 +1,110 @@
+import os
+import sys
+import threading
+import time
+import logging
+from typing import Any, Dict, List, Optional, Tuple
+from meadow_web.process_probe import read_start_time
+
+logger = logging.getLogger(__name__)
+
+# Where the time goes between "S50meadowweb start" and the first page served.
+#
+# app.py imports this before anything else, so the clock starts before Flask and
+# SQLAlchemy load. create_app() marks the end of each phase; the first response closes
+# the report, which is logged, exported on /metrics and served at /api/debug/startup.
+# Everything before our first import is worked out from process start times in /proc.
+# Under gunicorn (the app is imported in the worker, not the master) that's two phases:
+# 'gunicorn_master' from the master's start to forking the worker, and 'worker_startup'
+# from the fork to our first import. Run directly, it's one 'interpreter' phase.
+
+# A worker forked this long after the master started is a replacement for one that died,
+# not part of the service start – its report starts at the fork
+_RESPAWN_GAP = 60.0
+
+
+def _before_import() -> List[Tuple[str, float]]:
+    # Phases before this module was imported, from the process start times
+    now = time.time()
+    worker_started = read_start_time(os.getpid())
+    if worker_started is None:
+        return []
+    # A gunicorn worker is forked from the master with gunicorn already imported
+    master_started = read_start_time(os.getppid()) if 'gunicorn' in sys.modules else None
+    if master_started is None:
+        return [('interpreter', max(0.0, now - worker_started))]
+    phases = [('worker_startup', max(0.0, now - worker_started))]
+    if worker_started - master_started < _RESPAWN_GAP:
+        phases.insert(0, ('gunicorn_master', max(0.0, worker_started - master_started)))
+    return phases
+
+
+def _uptime() -> Optional[float]:
+    # Seconds since the system booted
+    try:
+        with open('/proc/uptime', 'r') as f:
+            return float(f.read().split()[0])
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+class StartupTimer:
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._started = time.perf_counter()
+        self._last = self._started
+        self.early_phases = _before_import()
+        self.phases: List[Tuple[str, float]] = []
+        self.ready_seconds: Optional[float] = None
+        self.first_response: Optional[Dict[str, Any]] = None
+
+    def _since_process_start(self, now: float) -> float:
+        return sum(seconds for _, seconds in self.early_phases) + now - self._started
+
+    def mark(self, phase: str) -> None:
+        # Ends `phase`: everything since the previous mark counts towards it
+        now = time.perf_counter()
+        with self._lock:
+            if self.ready_seconds is not None:
+                return  # only the first create_app() in this process counts
+            self.phases.append((phase, now - self._last))
+            self._last = now
+
+    def ready(self) -> None:
+        now = time.perf_counter()
+        with self._lock:
+            if self.ready_seconds is not None:
+                return
+            self.ready_seconds = self._since_process_start(now)
+        logger.info(f"App ready {self.ready_seconds:.2f}s after start ("
+                    + ', '.join(f"{phase} {seconds:.2f}s" for phase, seconds in self.phases) + ")")
+
+    def response_served(self, endpoint: str) -> bool:
+        # Called after every response; True only for the very first one
+        if self.first_response is not None:
+            return False
+        now = time.perf_counter()
+        with self._lock:
+            if self.first_response is not None:
+                return False
+            self.first_response = {
+                'endpoint': endpoint,
+                'since_process_start': round(self._since_process_start(now), 3),
+                'since_boot': _uptime()
+            }
+        boot = self.first_response['since_boot']
+        logger.info(f"First response ({endpoint}) {self.first_response['since_process_start']:.2f}s after start"
+                    + (f", {boot:.1f}s after boot" if boot is not None else ""))
+        return True
+
+    def report(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                'phases': {phase: round(seconds, 3) for phase, seconds in self.early_phases + self.phases},
+                'ready': round(self.ready_seconds, 3) if self.ready_seconds is not None else None,
+                'first_response': dict(self.first_response) if self.first_response else None
+            }
+
+
+startup_timer = StartupTimer()
@@ -0,0 +1,1082 @@
+// Dashboard: live node status, start/stop, install progress, config tuning, snapshot loading,
+// chain data export/import, other chains' nodes, the disk budget and the node log
+const NODE_PHASES = {
+    starting: 'Starting...',
+    warmup: 'Loading...',
+    stopping: 'Stopping...'
+};
+
+// Updates the status UI for the Bitcoin node. While a start/stop is underway
+// (`operation` set) the node shows as busy, not running – it only counts as
+// running once it answers RPC.
+function updateNodeStatus(isRunning, operation) {
+    const statusIndicator = document.querySelector('.status-indicator');
+    const statusText = document.querySelector('.status-text');
+    const startBtn = document.getElementById('startBitcoinBtn');
+    const stopBtn = document.getElementById('stopBitcoinBtn');
+
+    if (!statusIndicator || !statusText || !startBtn || !stopBtn) {
+        console.log('Bitcoin node UI elements not found, skipping update');
+        return;
+    }
+
+    const ready = isRunning && !operation;
+    const nodeInfo = document.getElementById('nodeInfo');
+    if (nodeInfo && nodeInfo.classList.contains('hidden') === ready) {
+        nodeInfo.classList.toggle('hidden', !ready);
+        if (ready) refreshNodeInfo();
+    }
+
+    if (operation) {
+        statusIndicator.className = 'status-indicator';
+        statusText.textContent = NODE_PHASES[operation.phase] || 'Working...';
+    } else if (isRunning) {
+        statusIndicator.className = 'status-indicator running';
+        statusText.textContent = 'Running';
+    } else {
+        statusIndicator.className = 'status-indicator';
+        statusText.textContent = 'Stopped';
+    }
+
+    const stopping = operation && operation.phase === 'stopping';
+    startBtn.classList.toggle('hidden', isRunning && !stopping);
+    stopBtn.classList.toggle('hidden', !isRunning || stopping);
+    startBtn.disabled = !!operation;
+    stopBtn.disabled = !!operation;
+}
+
+// Applies a status snapshot (from the stream or the JSON endpoint) to the page
+function applyStatus(data) {
+    if (document.getElementById('nodeStatus')) {
+        updateNodeStatus(data.is_running, data.node_operation);
+        // Supervisor mode: a crashed node is restarted after a backoff delay
+        const supervised = data.supervisor;
+        if (supervised && supervised.state === 'backoff' && !data.node_operation) {
+            const exit = supervised.last_exit || {};
+            const seconds = Math.max(0, Math.round(supervised.next_restart_at - Date.now() / 1000));
+            document.querySelector('.status-text').textContent = `Crashed (${exit.signal || 'exit code ' + exit.code}), restarting in ${seconds}s`;
+        }
+        // Also picks up a start/stop begun from another tab or before a reload
+        if (data.node_operation && data.node_operation.id !== followedNodeJob) {
+            followNodeJob(data.node_operation.id);
+        }
+    }
+
+    const activeVersion = document.getElementById('activeVersion');
+    if (activeVersion) {
+        activeVersion.textContent = data.active_version || 'unknown';
+    }
+
+    const installBtn = document.getElementById('installBitcoinBtn');
+    if (installBtn) {
+        if (data.installing) {
+            installBtn.disabled = true;
+            installBtn.classList.add('disabled');
+            installBtn.textContent = 'Installing...';
+        } else {
+            installBtn.disabled = false;
+            installBtn.classList.remove('disabled');
+            if (installBtn.textContent === 'Installing...') {
+                installBtn.textContent = 'Install Bitcoin';
+            }
+        }
+    }
+}
+
+// Polling interval for the sync/health panel – slower while new blocks are pushed to us
+const NODE_INFO_POLL_MS = 10000;
+const NODE_INFO_POLL_PUSHED_MS = 30000;
+
+async function pollNodeInfo() {
+    const info = await refreshNodeInfo();
+    setTimeout(pollNodeInfo, info && info.block_notifications ? NODE_INFO_POLL_PUSHED_MS : NODE_INFO_POLL_MS);
+}
+
+// Fills the sync/health panel; the server caches this, so polling it is cheap
+async function refreshNodeInfo() {
+    const panel = document.getElementById('nodeInfo');
+    if (!panel || panel.classList.contains('hidden')) return null;
+
+    try {
+        const response = await fetch('/api/bitcoin/info');
+        const info = await response.json();
+        const field = name => panel.querySelector(`[data-info="${name}"]`);
+
+        if (info.blocks != null) {
+            field('blocks').textContent = `${info.blocks.toLocaleString()} of ${info.headers.toLocaleString()} headers`;
+            const progress = (100 * info.verification_progress).toFixed(2);
+            field('progress').textContent = info.initial_block_download ? `${progress}% (initial sync)` : `${progress}%`;
+        }
+        // After an AssumeUTXO load the node runs two chainstates until the background one reaches the snapshot
+        const chainstates = info.chainstates;
+        panel.querySelectorAll('.chainstate-row').forEach(row => row.classList.toggle('hidden', !chainstates));
+        if (chainstates) {
+            field('snapshot-chain').textContent =
+                `${chainstates.snapshot_blocks.toLocaleString()} blocks, ${(100 * chainstates.snapshot_progress).toFixed(2)}%`;
+            const done = chainstates.background_blocks;
+            const target = chainstates.snapshot_height;
+            if (done == null) {
+                field('background-chain').textContent = 'starting...';
+            } else if (target) {
+                field('background-chain').textContent =
+                    `${done.toLocaleString()} of ${target.toLocaleString()} blocks (${(100 * done / target).toFixed(1)}%)`;
+            } else {
+                field('background-chain').textContent = `${done.toLocaleString()} blocks`;
+            }
+        }
+        if (info.peers != null) {
+            field('peers').textContent = `${info.peers} (${info.peers_out} out, ${info.peers_in} in)`;
+        }
+        if (info.mempool_tx != null) {
+            field('mempool').textContent = `${info.mempool_tx.toLocaleString()} tx, ${formatBytes(info.mempool_bytes)}`;
+        }
+        if (info.disk_total != null) {
+            field('disk').textContent = `${formatBytes(info.disk_free)} free of ${formatBytes(info.disk_total)}`;
+        }
+
+        const errors = Object.values(info.errors || {});
+        field('message').textContent = info.message || errors[0] || '';
+
+        await refreshSyncMonitor(panel, field);
+        return info;
+    } catch (error) {
+        console.error('Error fetching node info:', error);
+        return null;
+    }
+}
+
+// A new block (from bitcoind's ZMQ notifications, batched by the server). Once synced
+// the server has already patched its cached chain state, so re-reading it costs no RPC
+function applyBlockEvent(block) {
+    const panel = document.getElementById('nodeInfo');
+    if (!panel || panel.classList.contains('hidden')) return;
+    if (block.initial_block_download) return;  // the regular refresh keeps up during the initial sync
+    refreshNodeInfo();
+}
+
+function applyMempoolEvent(activity) {
+    const panel = document.getElementById('nodeInfo');
+    if (!panel) return;
+    panel.querySelectorAll('.zmq-row').forEach(row => row.classList.remove('hidden'));
+    const rate = activity.txs / Math.max(activity.seconds, 0.1);
+    panel.querySelector('[data-info="tx-rate"]').textContent =
+        `${rate.toFixed(1)} tx/s (${formatBytes(activity.vbytes / Math.max(activity.seconds, 0.1))}/s)`;
+}
+
+const BOTTLENECK_LABELS = {
+    cpu: 'CPU (validating blocks)',
+    disk: 'disk (database writes/reads)',
+    memory: 'memory (page cache squeezed out, or swapping)',
+    peers: 'peers (waiting for blocks)'
+};
+
+// Initial sync speed, ETA and bottleneck rows; only shown while the node is catching up
+async function refreshSyncMonitor(panel, field) {
+    const response = await fetch('/api/bitcoin/ibd');
+    const ibd = await response.json();
+    const syncing = ibd.available && ibd.initial_block_download;
+    panel.querySelectorAll('.ibd-row').forEach(row => row.classList.toggle('hidden', !syncing));
+    if (!syncing) return;
+
+    field('ibd-speed').textContent = ibd.blocks_per_sec != null
+        ? `${ibd.blocks_per_sec.toFixed(1)} blocks/s · ${ibd.mb_per_sec.toFixed(1)} MB/s`
+        : 'measuring...';
+    field('ibd-eta').textContent = ibd.eta != null
+        ? `about ${formatDuration(ibd.eta)} (${ibd.remaining_blocks.toLocaleString()} blocks)`
+        : 'estimating...';
+
+    const dominant = ibd.dominant_bottleneck;
+    field('ibd-bottleneck').textContent = dominant
+        ? `${BOTTLENECK_LABELS[dominant]}, ${Math.round(100 * ibd.bottleneck_share[dominant])}% of the last 10 min`
+        : 'measuring...';
+}
+
+// Fallback for browsers without EventSource: poll the JSON endpoint
+async function checkNodeStatus() {
+    try {
+        const response = await fetch('/api/bitcoin/status');
+        applyStatus(await response.json());
+    } catch (error) {
+        console.error('Error checking node status:', error);
+    }
+}
+
+// Subscribes to server-pushed status changes (the browser reconnects on its own)
+function watchNodeStatus() {
+    if (!window.EventSource) {
+        checkNodeStatus();
+        setInterval(checkNodeStatus, 3000);
+        return;
+    }
+
+    const source = new EventSource('/api/bitcoin/status/stream');
+    source.addEventListener('status', function(event) {
+        applyStatus(JSON.parse(event.data));
+    });
+    source.addEventListener('block', function(event) {
+        applyBlockEvent(JSON.parse(event.data));
+    });
+    source.addEventListener('mempool', function(event) {
+        applyMempoolEvent(JSON.parse(event.data));
+    });
+    source.addEventListener('storage', function(event) {
+        renderStorageAlerts(JSON.parse(event.data).alerts);
+    });
+    // We fell behind and the server dropped events for us – re-read the current state
+    source.addEventListener('resync', function() {
+        refreshNodeInfo();
+        loadStorageState();
+    });
+    source.onerror = function() {
+        console.log('Status stream interrupted, reconnecting...');
+    };
+}
+
+// When the page loads, start listening for status changes
+document.addEventListener('DOMContentLoaded', function() {
+    const nodeStatusElement = document.getElementById('nodeStatus');
+    if (nodeStatusElement) {
+        watchNodeStatus();
+        pollNodeInfo();
+
+        const installBtn = document.getElementById('installBitcoinBtn');
+        if (installBtn && installBtn.textContent.trim() === 'Installing...') {
+            installBtn.disabled = true;
+            installBtn.classList.add('disabled');
+        }
+    }
+});
+
+// Shows a floating message box for success/error/info
+function showNotification(message, type = 'info') {
+    const existing = document.querySelector('.notification');
+    if (existing) existing.remove();
+
+    const notification = document.createElement('div');
+    notification.className = `notification ${type}`;
+    notification.textContent = message;
+    document.body.appendChild(notification);
+
+    setTimeout(() => notification.classList.add('show'), 10);
+    setTimeout(() => {
+        notification.classList.remove('show');
+        setTimeout(() => notification.remove(), 300);
+    }, 5000);
+}
+
+// Shows a start/stop's progress messages (e.g. "Loading block index…") and its
+// outcome; the status stream takes care of the indicator and buttons
+let followedNodeJob = null;
+
+function followNodeJob(jobId) {
+    if (jobId === followedNodeJob) return;
+    followedNodeJob = jobId;
+    const detail = document.getElementById('nodeOperationMessage');
+    if (!window.EventSource) {
+        // The status poll keeps the page in sync; we just can't show the details
+        return;
+    }
+
+    const source = new EventSource(`/api/bitcoin/node/${jobId}/progress`);
+    source.addEventListener('progress', function(event) {
+        const job = JSON.parse(event.data);
+        if (job.status === 'running') {
+            if (detail) detail.textContent = job.message;
+            return;
+        }
+        source.close();
+        if (detail) detail.textContent = '';
+        showNotification(job.message, job.status === 'succeeded' ? 'success' : 'error');
+    });
+}
+
+// Start/stop run in the background on the server; both answer with the job to follow
+async function runNodeOperation(url, btn, pendingMessage) {
+    btn.disabled = true;
+    showNotification(pendingMessage, 'info');
+
+    try {
+        const response = await fetch(url, {
+            method: 'POST',
+            headers: { 'Content-Type': 'application/json' },
+        });
+        const result = await response.json();
+        if (!result.success) {
+            showNotification(result.message, 'info');
+        }
+        if (result.job) followNodeJob(result.job.id);
+    } catch (error) {
+        console.error('Error:', error);
+        showNotification('An error occurred while talking to the server.', 'error');
+        btn.disabled = false;
+    }
+}
+
+// Start node via backend API
+document.getElementById('startBitcoinBtn')?.addEventListener('click', function() {
+    runNodeOperation('/api/bitcoin/start', this,
+        'Starting Bitcoin node. Loading the block index can take a few minutes...');
+});
+
+// Stop node via backend API
+document.getElementById('stopBitcoinBtn')?.addEventListener('click', function() {
+    runNodeOperation('/api/bitcoin/stop', this,
+        'Stopping Bitcoin node. Writing its cache to disk may take a moment...');
+});
+
+// Switch to another installed Bitcoin Core release
+document.getElementById('switchVersionBtn')?.addEventListener('click', async function() {
+    const btn = this;
+    const version = document.getElementById('versionSelect').value;
+    btn.disabled = true;
+
+    try {
+        const response = await fetch('/api/bitcoin/versions/activate', {
+            method: 'POST',
+            headers: { 'Content-Type': 'application/json' },
+            body: JSON.stringify({ version: version })
+        });
+        const result = await response.json();
+        showNotification(result.message, result.success ? 'success' : 'error');
+    } catch (error) {
+        console.error('Error:', error);
+        showNotification('An error occurred while switching versions.', 'error');
+    } finally {
+        btn.disabled = false;
+    }
+});
+
+const PROFILE_LABELS = { ibd: 'tuned for initial sync', steady: 'tuned for a synced node' };
+
+// Shows which tuning profile bitcoin.conf has and what the last change did
+function renderConfigState(state) {
+    const panel = document.getElementById('configTuning');
+    if (!panel) return;
+    const field = name => panel.querySelector(`[data-config="${name}"]`);
+
+    let summary = PROFILE_LABELS[state.profile] || 'stock settings';
+    if (state.restart_required) summary += ' (restart the node to apply)';
+    field('summary').textContent = summary;
+
+    document.getElementById('rollbackConfigBtn').classList.toggle('hidden', !state.diff);
+    field('details').classList.toggle('hidden', !state.diff);
+    field('reasons').innerHTML = '';
+    (state.reasons || []).forEach(reason => {
+        const item = document.createElement('li');
+        item.textContent = reason;
+        field('reasons').appendChild(item);
+    });
+    field('diff').textContent = state.diff || '';
+}
+
+async function loadConfigState() {
+    if (!document.getElementById('configTuning')) return;
+    try {
+        const response = await fetch('/api/bitcoin/config');
+        const result = await response.json();
+        if (result.success) renderConfigState(result.state);
+    } catch (error) {
+        console.error('Error loading config state:', error);
+    }
+}
+
+async function changeConfig(btn, url) {
+    btn.disabled = true;
+    try {
+        const response = await fetch(url, {
+            method: 'POST',
+            headers: { 'Content-Type': 'application/json' }
+        });
+        const result = await response.json();
+        showNotification(result.message, result.success ? 'success' : 'error');
+        if (result.state) renderConfigState(result.state);
+    } catch (error) {
+        console.error('Error:', error);
+        showNotification('An error occurred while updating bitcoin.conf.', 'error');
+    } finally {
+        btn.disabled = false;
+    }
+}
+
+document.getElementById('tuneConfigBtn')?.addEventListener('click', function() {
+    changeConfig(this, '/api/bitcoin/config/tune');
+});
+
+document.getElementById('rollbackConfigBtn')?.addEventListener('click', function() {
+    changeConfig(this, '/api/bitcoin/config/rollback');
+});
+
+document.addEventListener('DOMContentLoaded', loadConfigState);
+
+// AssumeUTXO: snapshot files found on the server, each with a Load button, and the load's progress
+let followedSnapshotJob = null;
+
+function renderSnapshotFiles(files, loading) {
+    const list = document.getElementById('snapshotFiles');
+    list.innerHTML = '';
+    if (!files.length) {
+        list.innerHTML = '<li>No snapshot files found.</li>';
+        return;
+    }
+    files.forEach(file => {
+        const item = document.createElement('li');
+        item.textContent = file.usable
+            ? `${file.path} – block ${file.height.toLocaleString()}, ${file.coins.toLocaleString()} coins, ${formatBytes(file.size)} `
+            : `${file.path} – ${file.problem}`;
+        if (file.usable) {
+            const btn = document.createElement('button');
+            btn.className = 'btn';
+            btn.textContent = 'Load';
+            btn.disabled = loading;
+            btn.addEventListener('click', () => startSnapshotLoad(file.path));
+            item.appendChild(btn);
+        }
+        list.appendChild(item);
+    });
+}
+
+const SNAPSHOT_PHASES = {
+    checking: 'Checking',
+    verifying: 'Verifying',
+    loading: 'Loading'
+};
+
+function renderSnapshotProgress(job) {
+    const progress = document.getElementById('snapshotProgress');
+    let text = `${SNAPSHOT_PHASES[job.phase] || 'Preparing'}: ${job.message}`;
+    if (job.phase === 'verifying' && job.bytes_total) {
+        text += ` ${Math.floor(100 * job.bytes_done / job.bytes_total)}%`;
+    }
+    if (job.eta != null) {
+        text += ` · about ${formatDuration(job.eta)} left`;
+    }
+    progress.textContent = text;
+    progress.classList.remove('hidden');
+}
+
+function followSnapshotJob(jobId) {
+    if (jobId === followedSnapshotJob || !window.EventSource) return;
+    followedSnapshotJob = jobId;
+
+    const source = new EventSource(`/api/bitcoin/snapshot/${jobId}/progress`);
+    source.addEventListener('progress', function(event) {
+        const job = JSON.parse(event.data);
+        if (job.status === 'running') {
+            renderSnapshotProgress(job);
+            return;
+        }
+        source.close();
+        followedSnapshotJob = null;
+        document.getElementById('snapshotProgress').classList.add('hidden');
+        showNotification(job.message, job.status === 'succeeded' ? 'success' : 'error');
+        loadSnapshotState();
+        refreshNodeInfo();
+    });
+}
+
+async function loadSnapshotState() {
+    if (!document.getElementById('snapshotPanel')) return;
+    try {
+        const response = await fetch('/api/bitcoin/snapshot');
+        const state = await response.json();
+        const loading = !!(state.job && state.job.status === 'running');
+        renderSnapshotFiles(state.files, loading);
+        if (loading) {
+            renderSnapshotProgress(state.job);
+            followSnapshotJob(state.job.id);
+        }
+    } catch (error) {
+        console.error('Error loading snapshot files:', error);
+    }
+}
+
+async function startSnapshotLoad(path) {
+    document.querySelectorAll('#snapshotFiles button').forEach(btn => { btn.disabled = true; });
+    try {
+        const response = await fetch('/api/bitcoin/snapshot/load', {
+            method: 'POST',
+            headers: { 'Content-Type': 'application/json' },
+            body: JSON.stringify({ path: path })
+        });
+        const result = await response.json();
+        showNotification(result.message, result.success ? 'info' : 'error');
+        if (result.job) {
+            renderSnapshotProgress(result.job);
+            followSnapshotJob(result.job.id);
+        } else {
+            loadSnapshotState();
+        }
+    } catch (error) {
+        console.error('Error:', error);
+        showNotification('An error occurred while starting the snapshot load.', 'error');
+        loadSnapshotState();
+    }
+}
+
+// Files come and go with USB sticks, so the list is re-read whenever the panel is opened
+document.getElementById('snapshotPanel')?.addEventListener('toggle', function() {
+    if (this.open) loadSnapshotState();
+});
+
+document.addEventListener('DOMContentLoaded', loadSnapshotState);
+
+// Chain data export/import: one job at a time, with throughput and ETA
+let followedDatadirJob = null;
+
+const DATADIR_PHASES = {
+    stopping: 'Stopping the node',
+    exporting: 'Exporting',
+    importing: 'Importing',
+    starting: 'Restarting the node',
+    warmup: 'Restarting the node'
+};
+
+function renderDatadirProgress(job) {
+    const progress = document.getElementById('datadirProgress');
+    let text = DATADIR_PHASES[job.phase] || 'Preparing';
+    if (job.bytes_total) {
+        const percent = Math.floor(100 * job.bytes_done / job.bytes_total);
+        text += ` ${percent}% (${formatBytes(job.bytes_done)} of ${formatBytes(job.bytes_total)})`;
+    }
+    if (job.rate) {
+        text += ` · ${formatBytes(job.rate)}/s`;
+    }
+    if (job.eta != null) {
+        text += ` · about ${formatDuration(job.eta)} left`;
+    }
+    if (job.message) {
+        text += ` – ${job.message}`;
+    }
+    progress.textContent = text;
+    progress.classList.remove('hidden');
+}
+
+function setDatadirBusy(busy) {
+    document.querySelectorAll('.datadir-form button').forEach(btn => { btn.disabled = busy; });
+}
+
+function followDatadirJob(jobId) {
+    if (jobId === followedDatadirJob || !window.EventSource) return;
+    followedDatadirJob = jobId;
+    setDatadirBusy(true);
+
+    const source = new EventSource(`/api/bitcoin/datadir/${jobId}/progress`);
+    source.addEventListener('progress', function(event) {
+        const job = JSON.parse(event.data);
+        if (job.status === 'running') {
+            renderDatadirProgress(job);
+            return;
+        }
+        source.close();
+        followedDatadirJob = null;
+        setDatadirBusy(false);
+        document.getElementById('datadirProgress').classList.add('hidden');
+        showNotification(job.message, job.status === 'succeeded' ? 'success' : 'error');
+    });
+}
+
+async function loadDatadirState() {
+    if (!document.getElementById('datadirPanel')) return;
+    try {
+        const response = await fetch('/api/bitcoin/datadir');
+        const state = await response.json();
+        // An interrupted import continues from its last good chunk
+        if (state.unfinished_import && state.unfinished_import.source) {
+            document.querySelector('#datadirImportForm [name="source"]').value = state.unfinished_import.source;
+        }
+        if (state.job && state.job.status === 'running') {
+            renderDatadirProgress(state.job);
+            followDatadirJob(state.job.id);
+        }
+    } catch (error) {
+        console.error('Error loading export/import state:', error);
+    }
+}
+
+async function startDatadirJob(url, body) {
+    setDatadirBusy(true);
+    try {
+        const response = await fetch(url, {
+            method: 'POST',
+            headers: { 'Content-Type': 'application/json' },
+            body: JSON.stringify(body)
+        });
+        const result = await response.json();
+        if (!result.success) showNotification(result.message, 'error');
+        if (result.job) {
+            renderDatadirProgress(result.job);
+            followDatadirJob(result.job.id);
+        } else {
+            setDatadirBusy(false);
+        }
+    } catch (error) {
+        console.error('Error:', error);
+        showNotification('An error occurred while starting the export/import.', 'error');
+        setDatadirBusy(false);
+    }
+}
+
+document.getElementById('datadirExportForm')?.addEventListener('submit', function(event) {
+    event.preventDefault();
+    startDatadirJob('/api/bitcoin/datadir/export', { dest: this.dest.value.trim() });
+});
+
+document.getElementById('datadirImportForm')?.addEventListener('submit', function(event) {
+    event.preventDefault();
+    startDatadirJob('/api/bitcoin/datadir/import', { source: this.source.value.trim(), replace: this.replace.checked });
+});
+
+document.addEventListener('DOMContentLoaded', loadDatadirState);
+
+// Node registry: every chain this box runs, each with its own Start/Stop
+const NODES_REFRESH_MS = 15000;
+
+function describeNode(node) {
+    if (node.running === null) return `${node.name}: ${Object.values(node.errors || {})[0] || 'unknown'}`;
+    if (node.operation) return `${node.name} (${node.chain}): ${NODE_PHASES[node.operation.phase] || node.operation.phase}`;
+    if (!node.running) return `${node.name} (${node.chain}): stopped${node.memory_warning ? ` – ${node.memory_warning}` : ''} `;
+
+    let text = `${node.name} (${node.chain}): `;
+    text += node.blocks != null ? `${node.blocks.toLocaleString()} blocks` : 'starting';
+    if (node.initial_block_download && node.verification_progress != null) {
+        text += ` (${(node.verification_progress * 100).toFixed(1)}% synced)`;
+    }
+    if (node.peers != null) text += `, ${node.peers} peers`;
+    if (node.dbcache_mb != null) {
+        text += `, dbcache ${node.dbcache_mb} MB`;
+        if (node.dbcache_share_mb != null && node.dbcache_share_mb !== node.dbcache_mb) {
+            text += ` (${node.dbcache_share_mb} MB after a restart)`;
+        }
+    }
+    return text + ' ';
+}
+
+function renderNodes(nodes) {
+    const panel = document.getElementById('nodesPanel');
+    panel.classList.toggle('hidden', nodes.length < 2);
+    const list = document.getElementById('nodeList');
+    list.innerHTML = '';
+    nodes.forEach(node => {
+        const item = document.createElement('li');
+        item.textContent = describeNode(node);
+        if (node.running !== null && !node.operation) {
+            const btn = document.createElement('button');
+            btn.className = node.running ? 'btn btn-stop' : 'btn btn-start';
+            btn.textContent = node.running ? 'Stop' : 'Start';
+            btn.addEventListener('click', () => changeNode(btn, node.name, node.running ? 'stop' : 'start'));
+            item.appendChild(btn);
+        }
+        list.appendChild(item);
+    });
+}
+
+async function loadNodes() {
+    if (!document.getElementById('nodesPanel')) return;
+    try {
+        const response = await fetch('/api/nodes');
+        renderNodes((await response.json()).nodes);
+    } catch (error) {
+        console.error('Error loading nodes:', error);
+    }
+}
+
+async function changeNode(btn, name, action) {
+    btn.disabled = true;
+    try {
+        const response = await fetch(`/api/nodes/${encodeURIComponent(name)}/${action}`, { method: 'POST' });
+        const result = await response.json();
+        showNotification(result.message, result.success ? 'info' : 'error');
+    } catch (error) {
+        console.error('Error:', error);
+        showNotification(`An error occurred while trying to ${action} ${name}.`, 'error');
+    }
+    loadNodes();
+}
+
+document.addEventListener('DOMContentLoaded', function() {
+    if (!document.getElementById('nodesPanel')) return;
+    loadNodes();
+    setInterval(loadNodes, NODES_REFRESH_MS);
+});
+
+// Disk budget: usage per component, growth and I/O, plus planning and applying a budget
+const STORAGE_LABELS = {
+    blocks: 'Block files',
+    block_index: 'Block index',
+    chainstate: 'Chainstate',
+    txindex: 'Transaction index',
+    coinstatsindex: 'Coin stats index',
+    blockfilterindex: 'Block filter index',
+    debug_log: 'debug.log',
+    other: 'Everything else',
+    free: 'Free'
+};
+const STORAGE_REFRESH_MS = 60000;
+let plannedBudget = null;
+
+function renderStorageAlerts(alerts) {
+    const box = document.getElementById('storageAlerts');
+    if (!box) return;
+    box.innerHTML = '';
+    (alerts || []).forEach(alert => {
+        const item = document.createElement('div');
+        item.className = 'alert alert-error';
+        item.textContent = alert.message;
+        box.appendChild(item);
+    });
+    box.classList.toggle('hidden', !(alerts && alerts.length));
+}
+
+function renderStorage(state) {
+    const panel = document.getElementById('storagePanel');
+    const field = name => panel.querySelector(`[data-storage="${name}"]`);
+    renderStorageAlerts(state.alerts);
+
+    const list = document.getElementById('storageUsage');
+    list.innerHTML = '';
+    if (!state.available) {
+        list.innerHTML = '<li>Not measured yet</li>';
+    }
+    Object.entries(state.components || {}).forEach(([name, bytes]) => {
+        if (!bytes && name !== 'free') return;  // indexes that aren't enabled
+        const item = document.createElement('li');
+        item.textContent = `${STORAGE_LABELS[name] || name}: ${formatBytes(bytes)}`;
+        list.appendChild(item);
+    });
+
+    if (state.growth_bytes_per_day == null) {
+        field('growth').textContent = 'measuring…';
+    } else {
+        const growth = state.growth_bytes_per_day;
+        field('growth').textContent = `${growth < 0 ? '−' : '+'}${formatBytes(Math.abs(growth))}/day` +
+            (state.days_to_full != null ? `, full in ${formatDuration(state.days_to_full * 86400)}` : '');
+    }
+
+    const io = state.io || {};
+    field('io').textContent = io.busy_percent == null ? '–' :
+        `${Math.round(io.busy_percent)}% busy, ${(io.await_ms || 0).toFixed(1)} ms latency, queue ${(io.queue_depth || 0).toFixed(1)}`;
+
+    field('budget').textContent = state.budget ? `${state.budget.budget_gb} GB` : 'none';
+    document.getElementById('removeBudgetBtn').classList.toggle('hidden', !state.budget);
+}
+
+async function loadStorageState() {
+    if (!document.getElementById('storagePanel')) return;
+    try {
+        const response = await fetch('/api/storage');
+        renderStorage(await response.json());
+    } catch (error) {
+        console.error('Error loading storage state:', error);
+    }
+}
+
+function renderBudgetPlan(plan) {
+    const list = document.getElementById('storagePlan');
+    list.innerHTML = '';
+    plan.reasons.concat(plan.warnings).forEach((text, i) => {
+        const item = document.createElement('li');
+        item.textContent = text;
+        if (i >= plan.reasons.length) item.className = 'storage-plan-warning';
+        list.appendChild(item);
+    });
+}
+
+async function changeBudget(btn, budget) {
+    btn.disabled = true;
+    try {
+        const response = await fetch('/api/storage/budget', {
+            method: 'POST',
+            headers: { 'Content-Type': 'application/json' },
+            body: JSON.stringify({ budget_gb: budget })
+        });
+        const result = await response.json();
+        showNotification(result.message, result.success ? 'success' : 'error');
+        if (result.state) renderConfigState(result.state);
+        if (result.success) {
+            plannedBudget = null;
+            document.getElementById('applyBudgetBtn').classList.add('hidden');
+            document.getElementById('storagePlan').innerHTML = '';
+            loadStorageState();
+        }
+    } catch (error) {
+        console.error('Error:', error);
+        showNotification('An error occurred while applying the disk budget.', 'error');
+    } finally {
+        btn.disabled = false;
+    }
+}
+
+document.getElementById('storageBudgetForm')?.addEventListener('submit', async function(event) {
+    event.preventDefault();
+    const budget = Number(this.budget_gb.value);
+    try {
+        const response = await fetch(`/api/storage/plan?budget_gb=${encodeURIComponent(budget)}`);
+        const result = await response.json();
+        if (!result.success) {
+            showNotification(result.message, 'error');
+            return;
+        }
+        renderBudgetPlan(result.plan);
+        plannedBudget = budget;
+        document.getElementById('applyBudgetBtn').classList.remove('hidden');
+    } catch (error) {
+        console.error('Error planning disk budget:', error);
+    }
+});
+
+document.getElementById('applyBudgetBtn')?.addEventListener('click', function() {
+    if (plannedBudget != null) changeBudget(this, plannedBudget);
+});
+
+document.getElementById('removeBudgetBtn')?.addEventListener('click', function() {
+    changeBudget(this, null);
+});
+
+document.addEventListener('DOMContentLoaded', function() {
+    if (!document.getElementById('storagePanel')) return;
+    loadStorageState();
+    setInterval(loadStorageState, STORAGE_REFRESH_MS);
+});
+
+// Node log: a live tail while the panel is open, or pages of search results
+const LOG_LIVE_LINES = 500;  // trimmed from the top so a long-open tab stays light
+let logSource = null;
+let logSearch = null;  // {params, nextBefore} while showing search results
+
+function appendLogLines(lines, reset) {
+    const pre = document.getElementById('logLines');
+    const stick = pre.scrollTop + pre.clientHeight >= pre.scrollHeight - 5;
+    if (reset) pre.textContent = '';
+    if (lines.length) pre.append(lines.map(line => line.text).join('\n') + '\n');
+    const text = pre.textContent;
+    const excess = text.split('\n').length - 1 - LOG_LIVE_LINES;
+    if (excess > 0) {
+        let cut = 0;
+        for (let i = 0; i < excess; i++) cut = text.indexOf('\n', cut) + 1;
+        pre.textContent = text.slice(cut);
+    }
+    if (stick) pre.scrollTop = pre.scrollHeight;
+}
+
+function stopLogStream() {
+    if (logSource) logSource.close();
+    logSource = null;
+}
+
+function startLogStream() {
+    stopLogStream();
+    logSearch = null;
+    document.getElementById('logLiveBtn').classList.add('hidden');
+    document.getElementById('logOlderBtn').classList.add('hidden');
+    if (!window.EventSource) return;
+    logSource = new EventSource('/api/bitcoin/log/stream');
+    logSource.addEventListener('lines', event => {
+        const data = JSON.parse(event.data);
+        appendLogLines(data.lines, data.reset);
+    });
+}
+
+async function loadLogPage() {
+    const params = new URLSearchParams(logSearch.params);
+    if (logSearch.nextBefore !== null) params.set('before', logSearch.nextBefore);
+    const olderBtn = document.getElementById('logOlderBtn');
+    olderBtn.disabled = true;
+    try {
+        const response = await fetch(`/api/bitcoin/log?${params}`);
+        const result = await response.json();
+        if (!response.ok) {
+            showNotification(result.message, 'error');
+            return;
+        }
+        const pre = document.getElementById('logLines');
+        if (logSearch.nextBefore === null) {
+            pre.textContent = result.lines.length ? '' : 'No matching lines.';
+        }
+        if (result.lines.length) pre.append(result.lines.map(line => line.text).join('\n') + '\n');
+        logSearch.nextBefore = result.next_before;
+        olderBtn.classList.toggle('hidden', result.next_before === null);
+    } catch (error) {
+        console.error('Error searching the node log:', error);
+    } finally {
+        olderBtn.disabled = false;
+    }
+}
+
+document.getElementById('nodeLog')?.addEventListener('toggle', function() {
+    if (this.open) startLogStream();
+    else stopLogStream();
+});
+
+document.getElementById('logSearchForm')?.addEventListener('submit', function(event) {
+    event.preventDefault();
+    const params = {};
+    new FormData(this).forEach((value, key) => { if (value.trim()) params[key] = value.trim(); });
+    if (!Object.keys(params).length) {
+        startLogStream();
+        return;
+    }
+    stopLogStream();
+    logSearch = { params, nextBefore: null };
+    document.getElementById('logLiveBtn').classList.remove('hidden');
+    loadLogPage();
+});
+
+document.getElementById('logLiveBtn')?.addEventListener('click', function() {
+    document.getElementById('logSearchForm').reset();
+    startLogStream();
+});
+
+document.getElementById('logOlderBtn')?.addEventListener('click', loadLogPage);
+
+// Human-friendly sizes and durations for the install progress line
+function formatBytes(bytes) {
+    const units = ['B', 'KB', 'MB', 'GB'];
+    let i = 0;
+    while (bytes >= 1024 && i < units.length - 1) {
+        bytes /= 1024;
+        i++;
+    }
+    return `${bytes.toFixed(i ? 1 : 0)} ${units[i]}`;
+}
+
+function formatDuration(seconds) {
+    if (seconds < 60) return `${Math.ceil(seconds)}s`;
+    if (seconds < 3600) return `${Math.ceil(seconds / 60)}m`;
+    if (seconds >= 86400) return `${Math.floor(seconds / 86400)}d ${Math.floor((seconds % 86400) / 3600)}h`;
+    return `${Math.floor(seconds / 3600)}h ${Math.ceil((seconds % 3600) / 60)}m`;
+}
+
+const INSTALL_PHASES = {
+    download: 'Downloading',
+    verify: 'Verifying',
+    extract: 'Unpacking',
+    move: 'Installing',
+    config: 'Configuring'
+};
+
+// Shows phase, bytes and ETA of the running install job
+function renderInstallProgress(job) {
+    const progress = document.getElementById('installProgress');
+    if (!progress) return;
+
+    let text = INSTALL_PHASES[job.phase] || 'Preparing';
+    if (job.bytes_total) {
+        const percent = Math.floor(100 * job.bytes_done / job.bytes_total);
+        text += ` ${percent}% (${formatBytes(job.bytes_done)} of ${formatBytes(job.bytes_total)})`;
+    } else if (job.bytes_done) {
+        text += ` ${formatBytes(job.bytes_done)}`;
+    }
+    if (job.eta != null) {
+        text += ` · about ${formatDuration(job.eta)} left`;
+    }
+
+    progress.textContent = text;
+    progress.classList.remove('hidden');
+}
+
+function finishInstall(job) {
+    const btn = document.getElementById('installBitcoinBtn');
+    document.getElementById('installProgress')?.classList.add('hidden');
+
+    if (job.status === 'succeeded') {
+        showNotification('Bitcoin installed successfully! Reloading page...', 'success');
+        setTimeout(() => window.location.reload(), 1500);
+    } else {
+        showNotification(`Installation failed: ${job.message || 'Unknown error'}`, 'error');
+        if (btn) {
+            btn.disabled = false;
+            btn.classList.remove('disabled');
+            btn.textContent = 'Install Bitcoin';
+        }
+    }
+}
+
+// Follows an install job until it finishes (pushed over SSE, polled as a fallback)
+function followInstallJob(jobId) {
+    if (!window.EventSource) {
+        const timer = setInterval(async function() {
+            try {
+                const response = await fetch('/api/bitcoin/install/status');
+                const status = await response.json();
+                if (!status.job || status.job.id !== jobId) return;
+                renderInstallProgress(status.job);
+                if (status.job.status !== 'running') {
+                    clearInterval(timer);
+                    finishInstall(status.job);
+                }
+            } catch (error) {
+                console.error('Error checking installation status:', error);
+            }
+        }, 3000);
+        return;
+    }
+
+    const source = new EventSource(`/api/bitcoin/install/${jobId}/progress`);
+    source.addEventListener('progress', function(event) {
+        const job = JSON.parse(event.data);
+        renderInstallProgress(job);
+        if (job.status !== 'running') {
+            source.close();
+            finishInstall(job);
+        }
+    });
+    source.onerror = function() {
+        // A closed stream means the job is gone (e.g. the server restarted)
+        if (source.readyState === EventSource.CLOSED) {
+            showNotification('Lost track of the installation. Please reload the page.', 'info');
+        }
+    };
+}
+
+// Pick up an install that was already running when the page loaded
+document.addEventListener('DOMContentLoaded', async function() {
+    const installBtn = document.getElementById('installBitcoinBtn');
+    if (!installBtn || installBtn.textContent.trim() !== 'Installing...') return;
+
+    try {
+        const response = await fetch('/api/bitcoin/install/status');
+        const status = await response.json();
+        if (status.job && status.job.status === 'running') {
+            renderInstallProgress(status.job);
+            followInstallJob(status.job.id);
+        }
+    } catch (error) {
+        console.error('Error checking installation status:', error);
+    }
+});
+
+// Trigger Bitcoin installation
+document.getElementById('installBitcoinBtn')?.addEventListener('click', async function() {
+    const btn = this;
+    const originalText = btn.textContent;
+
+    btn.disabled = true;
+    btn.classList.add('disabled');
+    btn.textContent = 'Installing...';
+
+    try {
+        const response = await fetch('/api/bitcoin/install', {
+            method: 'POST',
+            headers: { 'Content-Type': 'application/json' }
+        });
+
+        if (!response.ok) throw new Error(`HTTP error! status: ${response.status}`);
+        const result = await response.json();
+
+        if (result.success) {
+            showNotification('Bitcoin installation started. Progress is shown below.', 'info');
+        } else {
+            showNotification(result.message || 'Bitcoin installation is already in progress.', 'info');
+        }
+
+        // Either way there is a job to follow – ours or the one already running
+        renderInstallProgress(result.job);
+        followInstallJob(result.job.id);
+    } catch (error) {
+        console.error('Error:', error);
+        showNotification('An error occurred while starting the installation. Please check the logs and try again.', 'error');
+        btn.disabled = false;
+        btn.classList.remove('disabled');
+        btn.textContent = originalText;
+    }
+});
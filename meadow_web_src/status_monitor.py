@@ -0,0 +1,95 @@
+import threading
+import logging
+from typing import Any, Dict, Optional
+from meadow_web.config import STATUS_MONITOR_INTERVAL, BITCOIN_SUPERVISED
+from meadow_web.events import event_hub
+from meadow_web.jobs import job_registry
+from meadow_web.supervisor import supervisor
+from meadow_web.bitcoin_utils import (
+    is_bitcoin_installed,
+    is_bitcoin_running,
+    is_installation_in_progress,
+    get_bitcoin_versions
+)
+
+logger = logging.getLogger(__name__)
+
+
+class StatusMonitor:
+    # One background thread works out installed/running/installing for everybody.
+    #
+    # Request threads never touch the system themselves: they read the latest
+    # snapshot, or block in wait_for_change() until the version number moves on.
+    # Every change is also published on the event hub for the status streams.
+
+    def __init__(self, interval: float = STATUS_MONITOR_INTERVAL):
+        self.interval = interval
+        self._cond = threading.Condition()
+        self._wakeup = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._version = 0
+        self._state: Dict[str, Any] = {}
+
+    def start(self) -> None:
+        # Safe to call more than once – only the first call spawns the thread
+        with self._cond:
+            if self._thread is not None:
+                return
+            self._thread = threading.Thread(target=self._run, name='status-monitor', daemon=True)
+        # Jobs starting or finishing (e.g. an install) change the status right away
+        job_registry.add_listener(lambda job: self.refresh())
+        self._collect()
+        self._thread.start()
+        logger.info(f"Status monitor started (interval {self.interval}s)")
+
+    def _collect(self) -> None:
+        try:
+            node_job = job_registry.active('node')
+            state = {
+                'is_installed': is_bitcoin_installed(),
+                'is_running': is_bitcoin_running(max_age=0),
+                'installing': is_installation_in_progress(),
+                # A start/stop underway: {'id', 'phase': starting|warmup|stopping}
+                'node_operation': {'id': node_job.id, 'phase': node_job.phase} if node_job else None,
+                **get_bitcoin_versions()
+            }
+            if BITCOIN_SUPERVISED:
+                # e.g. 'backoff' after a crash, with the exit code and when it retries
+                sup = supervisor.state()
+                state['supervisor'] = {key: sup[key] for key in ('state', 'restarts', 'next_restart_at', 'last_exit')}
+        except Exception as e:
+            logger.error(f"Error collecting node status: {str(e)}", exc_info=True)
+            return
+
+        with self._cond:
+            if state != self._state:
+                self._state = state
+                self._version += 1
+                logger.debug(f"Node status changed (v{self._version}): {state}")
+                self._cond.notify_all()
+                # Open status streams get it through the event hub
+                event_hub.publish('status', dict(state, version=self._version))
+
+    def _run(self) -> None:
+        while True:
+            self._wakeup.wait(self.interval)
+            self._wakeup.clear()
+            self._collect()
+
+    def refresh(self) -> None:
+        # Ask for a re-check right now, e.g. after the user hit start/stop
+        self._wakeup.set()
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._cond:
+            return dict(self._state, version=self._version)
+
+    def wait_for_change(self, version: int, timeout: float) -> Optional[Dict[str, Any]]:
+        # Blocks until there is a snapshot newer than `version`; None on timeout
+        with self._cond:
+            if not self._cond.wait_for(lambda: self._version > version, timeout):
+                return None
+            return dict(self._state, version=self._version)
+
+
+status_monitor = StatusMonitor()
@@ -0,0 +1,446 @@
+import os
+import shutil
+import threading
+import time
+import logging
+from collections import deque
+from pathlib import Path
+from typing import Any, Dict, List, NamedTuple, Optional, Tuple
+from meadow_web.config import (
+    BITCOIN_DATA_DIR,
+    DATA_MOUNT_POINT,
+    IBD_DISK_BOUND_PERCENT,
+    STORAGE_BUDGET_HEADROOM_GB,
+    STORAGE_FULL_ALERT_DAYS,
+    STORAGE_FULL_RESCAN_INTERVAL,
+    STORAGE_GROWTH_WINDOW,
+    STORAGE_LATENCY_ALERT_MS,
+    STORAGE_LOW_FREE_PERCENT,
+    STORAGE_PRESSURE_SHARE,
+    STORAGE_PRESSURE_WINDOW,
+    STORAGE_SCAN_INTERVAL,
+    STORAGE_SETTLED_AFTER,
+    TUNER_FULL_NODE_DISK_GB
+)
+from meadow_web import conf_tuner
+from meadow_web.events import event_hub
+from meadow_web.metrics import storage_bytes
+from meadow_web.system_stats import DiskStats, disk_latency_ms, disk_queue_depth, disk_utilisation
+
+logger = logging.getLogger(__name__)
+
+# Disk budget manager for the data partition.
+#
+# Usage per component (block files, block index, chainstate, each index, debug.log) is
+# measured without walking all of blocks/ every time: every folder's listing is cached
+# with its mtime, and a folder is only listed again once files were added or removed.
+# Files keep their cached size once nobody has written to them for STORAGE_SETTLED_AFTER
+# seconds – old blk/rev files never change – so a scan only stats the few files bitcoind
+# is still writing.
+#
+# From the usage history comes a growth rate and a time-to-full. plan_budget() turns a
+# budget in GB into a prune= target plus index toggles, which conf_tuner keeps on top of
+# its own recommendations. The sampler also feeds /proc/diskstats readings every
+# interval (average latency, queue depth, utilisation); when most recent samples are
+# over the limits, the disk is the bottleneck and the dashboards get an alert.
+
+GB = 1024 ** 3
+MB = 1024 ** 2
+
+# name -> path inside the data dir. Block files and the block index share blocks/,
+# so 'blocks' is measured as blocks/ minus blocks/index
+COMPONENTS = {
+    'blocks': 'blocks',
+    'block_index': 'blocks/index',
+    'chainstate': 'chainstate',
+    'txindex': 'indexes/txindex',
+    'coinstatsindex': 'indexes/coinstats',
+    'blockfilterindex': 'indexes/blockfilter',
+    'debug_log': 'debug.log'
+}
+INDEXES = ('txindex', 'coinstatsindex', 'blockfilterindex')
+
+# Indexes given up (in this order) when the budget doesn't leave room for pruned blocks.
+# txindex isn't on the list – a pruned node can't have one at all
+_DROPPABLE_INDEXES = ('blockfilterindex', 'coinstatsindex')
+
+# Growth rates over less history than this jump around too much to project anything
+_MIN_GROWTH_SPAN = 3600
+
+# Below this verificationprogress, scaling the blocks synced so far up to the whole chain
+# is guesswork – the early blocks are tiny
+_MIN_PROGRESS_FOR_ESTIMATE = 0.05
+
+ALERT_BOTTLENECK = 'disk_bottleneck'
+ALERT_FULL_SOON = 'disk_full_soon'
+ALERT_LOW_SPACE = 'disk_low_space'
+
+
+class _Folder(NamedTuple):
+    mtime_ns: int
+    files: Dict[str, Tuple[float, int]]  # name -> (mtime, size)
+    subfolders: List[str]
+
+
+class UsageScanner:
+    # Sizes of files and folders, remembered between scans (see the top of this file)
+
+    def __init__(self, settled_after: float = STORAGE_SETTLED_AFTER):
+        self.settled_after = settled_after
+        self._folders: Dict[str, _Folder] = {}
+        self.stats = 0  # files stat'ed since the last reset, to see how much a scan costs
+
+    def size(self, path: Path, now: float, full: bool = False) -> int:
+        # Bytes in `path` (a file or a folder and everything below it); 0 if it doesn't exist
+        path = str(path)
+        try:
+            if not os.path.isdir(path):
+                self.stats += 1
+                return os.stat(path).st_size
+        except OSError:
+            return 0
+        return self._folder_size(path, now, full)
+
+    def _stat(self, path: str) -> Optional[Tuple[float, int]]:
+        self.stats += 1
+        try:
+            st = os.stat(path)
+        except OSError:
+            return None  # deleted since the listing
+        return st.st_mtime, st.st_size
+
+    def _settled(self, entry: Tuple[float, int], now: float) -> bool:
+        return now - entry[0] >= self.settled_after
+
+    def _folder_size(self, path: str, now: float, full: bool) -> int:
+        try:
+            mtime_ns = os.stat(path).st_mtime_ns
+        except OSError:
+            self._forget(path)
+            return 0
+
+        cached = None if full else self._folders.get(path)
+        files: Dict[str, Tuple[float, int]] = {}
+        if cached is not None and cached.mtime_ns == mtime_ns:
+            # Same files as last time – only the ones still being written can have grown
+            subfolders = cached.subfolders
+            for name, entry in cached.files.items():
+                if not self._settled(entry, now):
+                    entry = self._stat(os.path.join(path, name))
+                if entry is not None:
+                    files[name] = entry
+        else:
+            # Files came or went: list again, but settled files we already know keep their size
+            subfolders = []
+            known = cached.files if cached is not None else {}
+            try:
+                with os.scandir(path) as entries:
+                    for item in entries:
+                        if item.is_dir(follow_symlinks=False):
+                            subfolders.append(item.path)
+                        elif item.is_file(follow_symlinks=False):
+                            entry = known.get(item.name)
+                            if entry is None or not self._settled(entry, now):
+                                entry = self._stat(item.path)
+                            if entry is not None:
+                                files[item.name] = entry
+            except OSError as e:
+                logger.warning(f"Failed to list {path}: {str(e)}")
+            if cached is not None:
+                for gone in set(cached.subfolders) - set(subfolders):
+                    self._forget(gone)
+
+        self._folders[path] = _Folder(mtime_ns, files, subfolders)
+        return sum(size for _, size in files.values()) + \
+            sum(self._folder_size(folder, now, full) for folder in subfolders)
+
+    def _forget(self, path: str) -> None:
+        prefix = path + os.sep
+        for folder in [folder for folder in self._folders if folder == path or folder.startswith(prefix)]:
+            del self._folders[folder]
+
+
+def read_conf_flags(data_dir: Path = BITCOIN_DATA_DIR) -> Dict[str, Any]:
+    # The bitcoin.conf settings the budget planner cares about: which indexes are on and
+    # the prune target (MB, 0 = not pruned). Only mainnet/top-level lines count
+    flags: Dict[str, Any] = {key: False for key in INDEXES}
+    flags['prune'] = 0
+    section = None
+    try:
+        with open(Path(data_dir) / conf_tuner.CONF_NAME, 'r') as f:
+            for line in f:
+                line = line.split('#', 1)[0].strip()
+                if line.startswith('[') and line.endswith(']'):
+                    section = line[1:-1].strip()
+                    continue
+                if '=' not in line or section not in (None, 'main'):
+                    continue
+                key, value = (part.strip() for part in line.split('=', 1))
+                if key in INDEXES:
+                    flags[key] = value not in ('0', '')
+                elif key == 'prune':
+                    flags['prune'] = int(value) if value.isdigit() else 0
+    except OSError:
+        pass
+    return flags
+
+
+def estimate_full_chain(usage: Dict[str, int], chain: Optional[Dict[str, Any]],
+                        flags: Dict[str, Any]) -> Optional[int]:
+    # Bytes of block files a full (unpruned) node needs today, or None if there's
+    # nothing to go on (pruned, or too early in the sync to tell)
+    if flags.get('prune') or (chain and chain.get('pruned')):
+        return None
+    blocks = usage.get('blocks', 0)
+    if chain and chain.get('initialblockdownload'):
+        progress = chain.get('verificationprogress') or 0
+        if progress < _MIN_PROGRESS_FOR_ESTIMATE:
+            return None
+        return int(blocks / progress)
+    return blocks or None
+
+
+def plan_budget(budget_gb: float, usage: Dict[str, int], chain: Optional[Dict[str, Any]] = None,
+                flags: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    # bitcoin.conf settings ({key: value or None to remove}) that keep the node inside
+    # `budget_gb` on the data disk, with the reasons and anything to watch out for
+    flags = flags if flags is not None else read_conf_flags()
+    budget_mb = int(budget_gb * 1024)
+    settings: Dict[str, Optional[str]] = {}
+    reasons: List[str] = []
+    warnings: List[str] = []
+    progress = (chain or {}).get('verificationprogress') or 0
+    in_ibd = bool((chain or {}).get('initialblockdownload'))
+
+    def size_mb(component: str, scale: bool = False) -> int:
+        size = usage.get(component, 0)
+        # Indexes grow with the chain: during the sync, project them to its end
+        if scale and in_ibd and progress >= _MIN_PROGRESS_FOR_ESTIMATE:
+            size = size / progress
+        return int(size / MB)
+
+    fixed_mb = size_mb('chainstate') + size_mb('block_index') + STORAGE_BUDGET_HEADROOM_GB * 1024
+    indexes = {key: size_mb(key, scale=True) for key in INDEXES if flags.get(key)}
+    full_chain = estimate_full_chain(usage, chain, flags)
+    if full_chain is not None:
+        full_mb = int(full_chain / MB) + sum(indexes.values()) + fixed_mb
+    else:
+        full_mb = TUNER_FULL_NODE_DISK_GB * 1024
+
+    if budget_mb >= full_mb:
+        settings['prune'] = None
+        reasons.append(f"prune=0: a full chain with the current indexes needs about {full_mb / 1024:.0f} GB, "
+                       f"which fits in {budget_gb:g} GB")
+        if flags.get('prune'):
+            warnings.append("The node is pruned now – keeping the whole chain means downloading and checking "
+                            "every block again (a full resync)")
+        return {'budget_gb': budget_gb, 'fits': True, 'needed_gb': round(full_mb / 1024, 1),
+                'settings': settings, 'reasons': reasons, 'warnings': warnings}
+
+    if indexes.pop('txindex', None) is not None:
+        settings['txindex'] = None
+        reasons.append("txindex=0: a pruned node can't keep a transaction index")
+        warnings.append(f"bitcoind leaves the old transaction index in {COMPONENTS['txindex']}/ "
+                        f"({size_mb('txindex') / 1024:.1f} GB) – delete it once the node runs without it")
+
+    room_mb = budget_mb - fixed_mb - sum(indexes.values())
+    for key in _DROPPABLE_INDEXES:
+        if room_mb >= conf_tuner.MIN_PRUNE_MB:
+            break
+        if key in indexes:
+            freed = indexes.pop(key)
+            settings[key] = None
+            room_mb += freed
+            reasons.append(f"{key}=0: frees about {freed / 1024:.1f} GB for blocks")
+
+    prune = max(room_mb, conf_tuner.MIN_PRUNE_MB)
+    settings['prune'] = str(prune)
+    reasons.append(f"prune={prune}: keeps the newest {prune / 1024:.1f} GB of blocks, with "
+                   f"{fixed_mb / 1024:.0f} GB for the chainstate, block index and headroom"
+                   + (f" and {sum(indexes.values()) / 1024:.1f} GB of indexes" if indexes else ""))
+    fits = room_mb >= conf_tuner.MIN_PRUNE_MB
+    if not fits:
+        warnings.append(f"Even fully pruned the node needs about "
+                        f"{(budget_mb - room_mb + conf_tuner.MIN_PRUNE_MB) / 1024:.0f} GB")
+    if not flags.get('prune'):
+        warnings.append("Block files beyond the prune target are deleted after the next restart – "
+                        "going back to a full node later means a full resync")
+    return {'budget_gb': budget_gb, 'fits': fits, 'needed_gb': round(full_mb / 1024, 1),
+            'settings': settings, 'reasons': reasons, 'warnings': warnings}
+
+
+def apply_budget(budget_gb: Optional[float], usage: Dict[str, int], chain: Optional[Dict[str, Any]] = None,
+                 data_dir: Path = BITCOIN_DATA_DIR) -> Tuple[bool, str]:
+    # Writes the plan for `budget_gb` into bitcoin.conf (None drops the budget again and
+    # leaves pruning to the tuner's disk-size rule)
+    if budget_gb is None:
+        success, message = conf_tuner.set_storage_settings(None, data_dir)
+        return success, "Disk budget removed" if success else message
+
+    result = plan_budget(budget_gb, usage, chain, read_conf_flags(data_dir))
+    success, message = conf_tuner.set_storage_settings({
+        'budget_gb': budget_gb,
+        'settings': result['settings'],
+        'reasons': result['reasons']
+    }, data_dir)
+    if not success:
+        return False, message
+    prune = result['settings'].get('prune')
+    return True, (f"Disk budget of {budget_gb:g} GB applied ({f'prune={prune}' if prune else 'no pruning'}); "
+                  f"bitcoind picks it up on its next restart")
+
+
+class StorageMonitor:
+    # Data disk usage, growth and I/O pressure. Like the sync monitor it doesn't run on
+    # its own – the sampler calls observe_io() every interval and scan() when scan_due().
+
+    def __init__(self, data_dir: Path = BITCOIN_DATA_DIR, mount_point: Path = DATA_MOUNT_POINT,
+                 scan_interval: float = STORAGE_SCAN_INTERVAL, growth_window: float = STORAGE_GROWTH_WINDOW,
+                 pressure_window: int = STORAGE_PRESSURE_WINDOW):
+        self.data_dir = Path(data_dir)
+        self.mount_point = Path(mount_point)
+        self.scan_interval = scan_interval
+        self.growth_window = growth_window
+        self._lock = threading.Lock()
+        self._scanner = UsageScanner()
+        self._scanned_at: Optional[float] = None
+        self._full_scan_at: Optional[float] = None
+        self._usage: Dict[str, Any] = {}
+        self._history = deque()  # (time, bytes used on the disk)
+        self._io: Dict[str, Any] = {}
+        self._pressure = deque(maxlen=pressure_window)  # True for samples over the limits
+        self._alerts: List[Dict[str, str]] = []
+
+    def scan_due(self, now: float) -> bool:
+        return self._scanned_at is None or now - self._scanned_at >= self.scan_interval
+
+    def observe_io(self, before: DiskStats, after: DiskStats, elapsed: float) -> Dict[str, Optional[float]]:
+        # Latency, queue depth and utilisation between two /proc/diskstats readings
+        latency = disk_latency_ms(before, after)
+        queue = disk_queue_depth(before, after, elapsed)
+        busy = disk_utilisation(before, after, elapsed)
+        pressured = (latency or 0) >= STORAGE_LATENCY_ALERT_MS or (busy or 0) >= IBD_DISK_BOUND_PERCENT
+        with self._lock:
+            self._io = {'await_ms': latency, 'queue_depth': queue, 'busy_percent': busy}
+            self._pressure.append(pressured)
+        self._update_alerts()
+        return {'disk_await_ms': latency, 'disk_queue_depth': queue}
+
+    def scan(self, now: Optional[float] = None) -> Dict[str, Any]:
+        now = now or time.time()
+        full = self._full_scan_at is None or now - self._full_scan_at >= STORAGE_FULL_RESCAN_INTERVAL
+        started = time.monotonic()
+        self._scanner.stats = 0
+
+        components = {name: self._scanner.size(self.data_dir / path, now, full) for name, path in COMPONENTS.items()}
+        components['blocks'] = max(components['blocks'] - components['block_index'], 0)
+        try:
+            disk = shutil.disk_usage(self.mount_point)
+        except OSError as e:
+            logger.error(f"Failed to read disk usage for {self.mount_point}: {str(e)}")
+            disk = None
+        if disk is not None:
+            components['other'] = max(disk.used - sum(components.values()), 0)
+            components['free'] = disk.free
+        for name, size in components.items():
+            storage_bytes.set(size, component=name)
+
+        with self._lock:
+            self._scanned_at = now
+            if full:
+                self._full_scan_at = now
+            self._usage = {
+                'components': components,
+                'total': disk.total if disk else None,
+                'used': disk.used if disk else None,
+                'free': disk.free if disk else None,
+                'scan_seconds': round(time.monotonic() - started, 3),
+                'files_statted': self._scanner.stats,
+                'full_scan': full
+            }
+            if disk is not None:
+                self._history.append((now, disk.used))
+                while self._history and now - self._history[0][0] > self.growth_window:
+                    self._history.popleft()
+        self._update_alerts()
+        return components
+
+    def _growth(self) -> Optional[float]:
+        # Bytes per day over the growth window (negative when pruning or cleanup freed space)
+        if len(self._history) < 2:
+            return None
+        (first_time, first_used), (last_time, last_used) = self._history[0], self._history[-1]
+        if last_time - first_time < _MIN_GROWTH_SPAN:
+            return None
+        return (last_used - first_used) / (last_time - first_time) * 86400
+
+    def _days_to_full(self, growth: Optional[float]) -> Optional[float]:
+        free = self._usage.get('free')
+        if not growth or growth <= 0 or free is None:
+            return None
+        return free / growth
+
+    def usage(self) -> Dict[str, int]:
+        with self._lock:
+            return dict(self._usage.get('components', {}))
+
+    def _check(self) -> List[Dict[str, str]]:
+        # Alerts for the current state; called with the lock held
+        alerts = []
+        if len(self._pressure) == self._pressure.maxlen:
+            share = sum(self._pressure) / len(self._pressure)
+            if share >= STORAGE_PRESSURE_SHARE:
+                alerts.append({'kind': ALERT_BOTTLENECK,
+                               'message': f"The data disk can't keep up: requests wait "
+                                          f"{self._io.get('await_ms') or 0:.0f} ms on average and it's busy "
+                                          f"{self._io.get('busy_percent') or 0:.0f}% of the time"})
+
+        total, free = self._usage.get('total'), self._usage.get('free')
+        days = self._days_to_full(self._growth())
+        if total and free is not None and free * 100 < total * STORAGE_LOW_FREE_PERCENT:
+            alerts.append({'kind': ALERT_LOW_SPACE,
+                           'message': f"Only {free / GB:.1f} GB left on the data disk"})
+        elif days is not None and days < STORAGE_FULL_ALERT_DAYS:
+            alerts.append({'kind': ALERT_FULL_SOON,
+                           'message': f"At the current rate the data disk is full in {days:.1f} days – "
+                                      f"set a disk budget to prune"})
+        return alerts
+
+    def _update_alerts(self) -> None:
+        # The messages carry live figures, so they're always refreshed – but only a kind
+        # appearing or clearing gets logged and pushed to the dashboard
+        with self._lock:
+            alerts = self._check()
+            previous = {alert['kind'] for alert in self._alerts}
+            self._alerts = alerts
+        if {alert['kind'] for alert in alerts} == previous:
+            return
+        for alert in alerts:
+            if alert['kind'] not in previous:
+                logger.warning(alert['message'])
+        event_hub.publish('storage', {'alerts': alerts})
+
+    def alerts(self) -> List[Dict[str, str]]:
+        with self._lock:
+            return list(self._alerts)
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            if not self._usage:
+                return {'available': False, 'io': dict(self._io), 'alerts': list(self._alerts)}
+            state = dict(self._usage, components=dict(self._usage['components']))
+            growth = self._growth()
+            state.update({
+                'available': True,
+                'scanned_at': self._scanned_at,
+                'growth_bytes_per_day': growth,
+                'days_to_full': self._days_to_full(growth),
+                'io': dict(self._io),
+                'pressure_share': sum(self._pressure) / len(self._pressure) if self._pressure else None,
+                'alerts': list(self._alerts)
+            })
+        state['budget'] = conf_tuner.read_state(self.data_dir).get('storage')
+        return state
+
+
+storage_monitor = StorageMonitor()
@@ -0,0 +1,350 @@
+import os
+import select
+import shutil
+import signal
+import subprocess
+import threading
+import time
+import logging
+from collections import deque
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+from meadow_web.config import (
+    BITCOIN_INSTALL_DIR,
+    BITCOIN_DATA_DIR,
+    SUPERVISOR_AUTOSTART,
+    SUPERVISOR_BACKOFF_INITIAL,
+    SUPERVISOR_BACKOFF_MAX,
+    SUPERVISOR_STABLE_AFTER,
+    BITCOIN_NICE,
+    BITCOIN_IONICE_CLASS,
+    BITCOIN_IONICE_LEVEL,
+    BITCOIN_CGROUP,
+    BITCOIN_CPU_MAX,
+    BITCOIN_MEMORY_MAX_MB
+)
+from meadow_web.process_probe import ProcessProbe, bitcoind_probe, read_start_time
+from meadow_web.metrics import timed_subprocess
+
+logger = logging.getLogger(__name__)
+
+# Supervisor mode: instead of `bitcoind -daemon`, the web app runs bitcoind in the
+# foreground as its own child and keeps an eye on it from one background thread.
+#
+# That thread is the only one that ever spawns, signals or reaps the process. It sleeps
+# in poll() on a pidfd (readable the instant bitcoind exits) plus a wake-up pipe for
+# start/stop requests, then reaps with waitpid to get the exit code. Crashes are
+# restarted with exponential backoff; a clean exit (status 0, e.g. `bitcoin-cli stop`)
+# is left alone. Request threads only call start()/stop(), which just record what is
+# wanted, and state(), which reads a snapshot.
+
+STATE_STOPPED = 'stopped'
+STATE_RUNNING = 'running'
+STATE_STOPPING = 'stopping'
+STATE_BACKOFF = 'backoff'  # crashed, waiting to restart
+
+_CGROUP_ROOT = Path('/sys/fs/cgroup')
+
+# bitcoind's stderr (startup errors before debug.log is open) goes here
+STDERR_LOG_NAME = 'bitcoind.stderr.log'
+
+
+def _describe_exit(returncode: int) -> Dict[str, Any]:
+    if returncode < 0:
+        try:
+            name = signal.Signals(-returncode).name
+        except ValueError:
+            name = f'signal {-returncode}'
+        return {'code': None, 'signal': name}
+    return {'code': returncode, 'signal': None}
+
+
+def _tail(path: Path, size: int = 1024) -> str:
+    try:
+        with open(path, 'rb') as f:
+            f.seek(0, os.SEEK_END)
+            f.seek(max(f.tell() - size, 0))
+            return f.read().decode('utf-8', 'replace').strip()
+    except OSError:
+        return ''
+
+
+class Supervisor:
+
+    def __init__(self, install_dir: Path = BITCOIN_INSTALL_DIR, data_dir: Path = BITCOIN_DATA_DIR,
+                 probe: ProcessProbe = bitcoind_probe, name: str = 'bitcoind', cgroup: Optional[str] = BITCOIN_CGROUP,
+                 cpu_max: Optional[float] = BITCOIN_CPU_MAX, memory_max_mb: Optional[int] = BITCOIN_MEMORY_MAX_MB):
+        self.install_dir = Path(install_dir)
+        self.data_dir = Path(data_dir)
+        self.probe = probe
+        self.name = name
+        self.cgroup = cgroup
+        self.cpu_max = cpu_max
+        self.memory_max_mb = memory_max_mb
+        # Appended to bitcoind's command line on the next spawn (nodes.py: chain, ports, memory share)
+        self.extra_args: List[str] = []
+
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        self._wake_r, self._wake_w = os.pipe2(os.O_NONBLOCK | os.O_CLOEXEC)
+
+        # Written by request threads (under the lock), read by the supervisor thread
+        self._want_running = SUPERVISOR_AUTOSTART
+
+        # Owned by the supervisor thread; request threads only see copies via state()
+        self._process: Optional[subprocess.Popen] = None
+        self._adopted_pid: Optional[int] = None  # a bitcoind we didn't start (no exit code)
+        self._pidfd: Optional[int] = None
+        self._failures = 0
+        self._restart_at: Optional[float] = None
+        self._stop_sent = False
+        self._state: Dict[str, Any] = {
+            'state': STATE_STOPPED,
+            'pid': None,
+            'started_at': None,
+            'restarts': 0,
+            'next_restart_at': None,
+            'last_exit': None,
+            'exits': deque(maxlen=10),
+        }
+
+    # --- request-thread side ---
+
+    def start_thread(self) -> None:
+        with self._lock:
+            if self._thread is not None:
+                return
+            self._thread = threading.Thread(target=self._run, name=f'{self.name}-supervisor', daemon=True)
+        self._thread.start()
+        logger.info(f"{self.name} supervisor started")
+
+    def start(self) -> None:
+        # Ask for bitcoind to be running (also cancels a pending backoff wait)
+        with self._lock:
+            self._want_running = True
+            self._failures = 0
+            self._restart_at = None
+        self._wake()
+
+    def stop(self) -> None:
+        # Ask for bitcoind to shut down (SIGTERM – its normal clean shutdown) and stay down
+        with self._lock:
+            self._want_running = False
+            self._restart_at = None
+        self._wake()
+
+    def state(self) -> Dict[str, Any]:
+        with self._lock:
+            state = dict(self._state)
+            state['exits'] = list(state['exits'])
+            state['wanted'] = STATE_RUNNING if self._want_running else STATE_STOPPED
+        return state
+
+    def _wake(self) -> None:
+        try:
+            os.write(self._wake_w, b'x')
+        except BlockingIOError:
+            pass  # pipe full – a wake-up is already pending
+
+    # --- supervisor thread ---
+
+    def _set_state(self, **changes) -> None:
+        with self._lock:
+            self._state.update(changes)
+
+    def _run(self) -> None:
+        self._adopt()
+        while True:
+            try:
+                self._step()
+            except Exception as e:
+                logger.error(f"Supervisor error: {str(e)}", exc_info=True)
+                time.sleep(1)
+
+    def _adopt(self) -> None:
+        # A bitcoind left running by a previous instance of the app: watch it, and take
+        # over properly (as our child) the next time it has to be started
+        pid = self.probe.get_pid(max_age=0)
+        if pid is None:
+            return
+        try:
+            self._pidfd = os.pidfd_open(pid)
+        except OSError:
+            return
+        self._adopted_pid = pid
+        with self._lock:
+            self._want_running = True
+        self._set_state(state=STATE_RUNNING, pid=pid, started_at=read_start_time(pid))
+        logger.info(f"Supervisor adopted running {self.name} (PID {pid})")
+
+    def _step(self) -> None:
+        with self._lock:
+            want_running = self._want_running
+            restart_at = self._restart_at
+        alive = self._process is not None or self._adopted_pid is not None
+
+        if alive:
+            if not want_running and not self._stop_sent:
+                self._signal(signal.SIGTERM)
+                self._stop_sent = True
+                self._set_state(state=STATE_STOPPING)
+            # Sleep until bitcoind exits or somebody wants something
+            if self._wait([self._pidfd], None if self._pidfd is not None else 1.0):
+                self._reap()
+            return
+
+        if want_running:
+            now = time.monotonic()
+            if restart_at is None or now >= restart_at:
+                self._spawn()
+                return
+            self._wait([], restart_at - now)
+            return
+
+        self._set_state(state=STATE_STOPPED, pid=None, next_restart_at=None)
+        self._wait([], None)
+
+    def _wait(self, fds: List[Optional[int]], timeout: Optional[float]) -> bool:
+        # Blocks until one of `fds` or the wake-up pipe is readable; True if an fd fired
+        poller = select.poll()
+        poller.register(self._wake_r, select.POLLIN)
+        for fd in fds:
+            if fd is not None:
+                poller.register(fd, select.POLLIN)
+        events = poller.poll(None if timeout is None else timeout * 1000)
+
+        fired = False
+        for fd, _ in events:
+            if fd == self._wake_r:
+                try:
+                    while os.read(self._wake_r, 64):
+                        pass
+                except BlockingIOError:
+                    pass
+            else:
+                fired = True
+        # Without a pidfd we fall back to checking on every timeout
+        if self._pidfd is None and self._process is not None:
+            fired = fired or self._process.poll() is not None
+        return fired
+
+    def _signal(self, signum: int) -> None:
+        pid = self._process.pid if self._process else self._adopted_pid
+        try:
+            os.kill(pid, signum)
+        except ProcessLookupError:
+            pass
+
+    def _command(self) -> List[str]:
+        # -daemon=0 overrides daemon=1 from bitcoin.conf so bitcoind stays our child
+        cmd = [str(self.install_dir / 'bin' / 'bitcoind'), f'-datadir={self.data_dir}',
+               '-daemon=0', '-printtoconsole=0'] + self.extra_args
+        # BusyBox ships both; they set the priority before exec, so every thread inherits it
+        if BITCOIN_IONICE_CLASS is not None and shutil.which('ionice'):
+            cmd = ['ionice', '-c', str(BITCOIN_IONICE_CLASS), '-n', str(BITCOIN_IONICE_LEVEL)] + cmd
+        if BITCOIN_NICE and shutil.which('nice'):
+            cmd = ['nice', '-n', str(BITCOIN_NICE)] + cmd
+        return cmd
+
+    def _spawn(self) -> None:
+        cmd = self._command()
+        logger.info(f"Supervisor starting {self.name}: {' '.join(cmd)}")
+        try:
+            # Fresh file per run, so its tail after a crash belongs to that run
+            with open(self.data_dir / STDERR_LOG_NAME, 'wb') as stderr, timed_subprocess('spawn-bitcoind'):
+                # Own session: a Ctrl-C or SIGTERM meant for the web app doesn't reach bitcoind
+                self._process = subprocess.Popen(cmd, stdin=subprocess.DEVNULL, stdout=subprocess.DEVNULL,
+                                                 stderr=stderr, start_new_session=True)
+        except OSError as e:
+            logger.error(f"Failed to launch bitcoind: {e}")
+            self._schedule_restart({'code': None, 'signal': None, 'error': str(e), 'at': time.time(), 'uptime': None})
+            return
+
+        pid = self._process.pid
+        try:
+            self._pidfd = os.pidfd_open(pid)
+        except (AttributeError, OSError):
+            self._pidfd = None
+        if BITCOIN_NICE and not shutil.which('nice'):
+            # Only reaches the main thread, but bitcoind starts its workers later and they inherit it
+            try:
+                os.setpriority(os.PRIO_PROCESS, pid, BITCOIN_NICE)
+            except OSError as e:
+                logger.warning(f"Failed to renice bitcoind: {e}")
+        self._join_cgroup(pid)
+
+        self.probe.invalidate()
+        with self._lock:
+            self._restart_at = None
+        self._set_state(state=STATE_RUNNING, pid=pid, started_at=time.time(), next_restart_at=None)
+
+    def _reap(self) -> None:
+        if self._process is not None:
+            returncode = self._process.wait()
+            exit_info = _describe_exit(returncode)
+        else:
+            # Not our child, so no exit status to collect
+            exit_info = {'code': None, 'signal': None}
+        if self._pidfd is not None:
+            os.close(self._pidfd)
+        self._process, self._adopted_pid, self._pidfd = None, None, None
+        self.probe.invalidate()
+
+        started_at = self._state['started_at']
+        uptime = time.time() - started_at if started_at else None
+        exit_info.update({'at': time.time(), 'uptime': uptime})
+
+        stop_sent, self._stop_sent = self._stop_sent, False
+        with self._lock:
+            want_running = self._want_running
+        failed = exit_info['code'] != 0  # unknown (adopted) counts as a crash
+        if failed and not stop_sent:
+            exit_info['stderr'] = _tail(self.data_dir / STDERR_LOG_NAME)
+
+        if want_running and failed and not stop_sent:
+            logger.warning(f"{self.name} exited unexpectedly: {exit_info}")
+            if uptime is not None and uptime >= SUPERVISOR_STABLE_AFTER:
+                self._failures = 0
+            self._schedule_restart(exit_info)
+            return
+
+        logger.info(f"{self.name} exited: {exit_info}")
+        with self._lock:
+            # A clean exit nobody asked for (e.g. `bitcoin-cli stop`) is respected. If we
+            # stopped it and a start came in meanwhile, the next step starts it right away.
+            if not stop_sent:
+                self._want_running = False
+            self._state['exits'].append(exit_info)
+            self._state.update(state=STATE_STOPPED, pid=None, last_exit=exit_info)
+
+    def _schedule_restart(self, exit_info: Dict[str, Any]) -> None:
+        self._failures += 1
+        delay = min(SUPERVISOR_BACKOFF_INITIAL * 2 ** (self._failures - 1), SUPERVISOR_BACKOFF_MAX)
+        logger.info(f"Restarting {self.name} in {delay}s (failure #{self._failures})")
+        with self._lock:
+            self._restart_at = time.monotonic() + delay
+            self._state['exits'].append(exit_info)
+            self._state.update(state=STATE_BACKOFF, pid=None, last_exit=exit_info,
+                               restarts=self._state['restarts'] + 1,
+                               next_restart_at=time.time() + delay)
+
+    def _join_cgroup(self, pid: int) -> None:
+        # Optional cgroup v2 limits; best effort, the node runs fine without them
+        if not self.cgroup or not (self.cpu_max or self.memory_max_mb):
+            return
+        if not (_CGROUP_ROOT / 'cgroup.controllers').exists():
+            return
+        group = _CGROUP_ROOT / self.cgroup
+        try:
+            group.mkdir(exist_ok=True)
+            if self.cpu_max:
+                period = 100000
+                (group / 'cpu.max').write_text(f"{int(self.cpu_max * period)} {period}")
+            if self.memory_max_mb:
+                (group / 'memory.max').write_text(str(self.memory_max_mb * 1024 * 1024))
+            (group / 'cgroup.procs').write_text(str(pid))
+        except OSError as e:
+            logger.warning(f"Failed to put {self.name} into cgroup {group}: {e}")
+
+
+supervisor = Supervisor()
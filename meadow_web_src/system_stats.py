@@ -0,0 +1,166 @@
+import os
+import logging
+from pathlib import Path
+from typing import Dict, List, NamedTuple, Optional
+
+logger = logging.getLogger(__name__)
+
+# Readers for the bits of /proc we sample: CPU time, memory and per-disk I/O counters.
+# All of them are plain file reads – no forks, cheap enough to call every few seconds.
+
+PROC_DIR = Path('/proc')
+
+# /proc/diskstats always counts in 512-byte sectors, whatever the device's real sector size
+SECTOR_SIZE = 512
+
+
+class CpuTimes(NamedTuple):
+    busy: int      # jiffies spent doing work (user, nice, system, irq, softirq, steal)
+    iowait: int    # jiffies idle while waiting for I/O
+    total: int     # all jiffies
+
+
+class DiskStats(NamedTuple):
+    reads: int
+    sectors_read: int
+    ms_reading: int
+    writes: int
+    sectors_written: int
+    ms_writing: int
+    in_flight: int
+    io_ms: int           # time the device had I/O queued (drives "utilisation")
+    weighted_io_ms: int  # io_ms weighted by queue length (drives "queue depth")
+
+
+def _cpu_times(fields: List[str]) -> CpuTimes:
+    # user nice system idle iowait irq softirq steal (guest time is already in user/nice)
+    values = [int(value) for value in fields[1:9]]
+    values += [0] * (8 - len(values))
+    user, nice, system, idle, iowait, irq, softirq, steal = values
+    busy = user + nice + system + irq + softirq + steal
+    return CpuTimes(busy=busy, iowait=iowait, total=busy + idle + iowait)
+
+
+def read_cpu_times() -> Dict[str, CpuTimes]:
+    # The 'cpu' (all cores) and per-core 'cpuN' lines of /proc/stat by name, from one read
+    # (offline cores are simply missing)
+    times = {}
+    try:
+        with open(PROC_DIR / 'stat', 'r') as f:
+            for line in f:
+                fields = line.split()
+                if not fields or not fields[0].startswith('cpu'):
+                    # The cpu lines come first
+                    break
+                times[fields[0]] = _cpu_times(fields)
+    except OSError as e:
+        logger.error(f"Failed to read /proc/stat: {e}")
+    return times
+
+
+def cpu_percent(before: CpuTimes, after: CpuTimes) -> Optional[float]:
+    # Share of CPU time spent busy between two samples, 0-100 across all cores
+    total = after.total - before.total
+    if total <= 0:
+        return None
+    return 100.0 * (after.busy - before.busy) / total
+
+
+def busiest_core_percent(before: Dict[str, CpuTimes], after: Dict[str, CpuTimes]) -> Optional[float]:
+    # Busy share of the single busiest core – a one-thread bottleneck on a 4-core
+    # board only shows up as ~25% in cpu_percent()
+    percents = [cpu_percent(before[name], times) for name, times in after.items()
+                if name != 'cpu' and name in before]
+    percents = [percent for percent in percents if percent is not None]
+    return max(percents) if percents else None
+
+
+def iowait_percent(before: CpuTimes, after: CpuTimes) -> Optional[float]:
+    # Share of CPU time spent idle waiting on I/O between two samples
+    total = after.total - before.total
+    if total <= 0:
+        return None
+    return 100.0 * (after.iowait - before.iowait) / total
+
+
+def read_meminfo() -> Dict[str, int]:
+    # /proc/meminfo as {field: bytes}
+    info = {}
+    try:
+        with open(PROC_DIR / 'meminfo', 'r') as f:
+            for line in f:
+                name, _, rest = line.partition(':')
+                parts = rest.split()
+                if parts:
+                    info[name] = int(parts[0]) * (1024 if len(parts) > 1 else 1)
+    except OSError as e:
+        logger.error(f"Failed to read /proc/meminfo: {e}")
+    return info
+
+
+def find_mount(path: Path) -> Optional[Dict[str, str]]:
+    # The /proc/mounts entry (device, mount point, fs type) that contains `path`
+    path = os.path.realpath(path)
+    best = None
+    try:
+        with open(PROC_DIR / 'mounts', 'r') as f:
+            for line in f:
+                parts = line.split()
+                if len(parts) < 3:
+                    continue
+                device, mount_point, fs_type = parts[0], parts[1].replace('\\040', ' '), parts[2]
+                if path == mount_point or path.startswith(mount_point.rstrip('/') + '/'):
+                    if best is None or len(mount_point) > len(best['mount_point']):
+                        best = {'device': device, 'mount_point': mount_point, 'fs_type': fs_type}
+    except OSError as e:
+        logger.error(f"Failed to read /proc/mounts: {e}")
+    return best
+
+
+def block_device_for(path: Path) -> Optional[str]:
+    # Kernel name of the block device behind `path` (e.g. 'sda1'), as used in /proc/diskstats
+    mount = find_mount(path)
+    if mount is None or not mount['device'].startswith('/dev/'):
+        return None
+    # /dev/disk/by-label/data and friends are symlinks to the real node
+    return os.path.basename(os.path.realpath(mount['device']))
+
+
+def read_diskstats(device: str) -> Optional[DiskStats]:
+    try:
+        with open(PROC_DIR / 'diskstats', 'r') as f:
+            for line in f:
+                fields = line.split()
+                if len(fields) >= 14 and fields[2] == device:
+                    # major minor name, then: reads merged sectors ms, writes merged sectors ms,
+                    # in-flight, io ms, weighted io ms (merged counts are skipped)
+                    values = [int(value) for value in fields[3:14]]
+                    return DiskStats(
+                        reads=values[0], sectors_read=values[2], ms_reading=values[3],
+                        writes=values[4], sectors_written=values[6], ms_writing=values[7],
+                        in_flight=values[8], io_ms=values[9], weighted_io_ms=values[10])
+    except OSError as e:
+        logger.error(f"Failed to read /proc/diskstats: {e}")
+    return None
+
+
+def disk_utilisation(before: DiskStats, after: DiskStats, elapsed: float) -> Optional[float]:
+    # Percentage of wall time the device had I/O outstanding (100 = saturated)
+    if elapsed <= 0:
+        return None
+    return min(100.0, 100.0 * (after.io_ms - before.io_ms) / (elapsed * 1000))
+
+
+def disk_latency_ms(before: DiskStats, after: DiskStats) -> Optional[float]:
+    # Average time a request spent queued and being served ("await"), in ms
+    requests = (after.reads - before.reads) + (after.writes - before.writes)
+    if requests <= 0:
+        return None
+    return ((after.ms_reading - before.ms_reading) + (after.ms_writing - before.ms_writing)) / requests
+
+
+def disk_queue_depth(before: DiskStats, after: DiskStats, elapsed: float) -> Optional[float]:
+    # Average number of requests outstanding on the device ("aqu-sz")
+    if elapsed <= 0:
+        return None
+    return (after.weighted_io_ms - before.weighted_io_ms) / (elapsed * 1000)
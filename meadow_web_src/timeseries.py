@@ -0,0 +1,182 @@
+import json
+import math
+import os
+import struct
+import threading
+import time
+import logging
+from array import array
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence, Tuple
+
+logger = logging.getLogger(__name__)
+
+# File layout: magic, header length, JSON header, then for every series and level the
+# raw bucket-id array followed by the raw value array (native byte order – the file
+# never leaves the box that wrote it).
+_MAGIC = b'MTS1'
+_HEADER = struct.Struct('>4sI')
+
+
+class Ring:
+    # Fixed-size, array-backed ring of one value per time bucket.
+    #
+    # Bucket b (= timestamp // resolution) lives in slot b % capacity; the slot also
+    # remembers which bucket it holds, so stale slots are recognised without clearing.
+    # Several samples landing in the same bucket are averaged.
+
+    __slots__ = ('resolution', 'capacity', 'buckets', 'values', '_bucket', '_sum', '_count')
+
+    def __init__(self, resolution: int, capacity: int):
+        self.resolution = resolution
+        self.capacity = capacity
+        self.buckets = array('q', [-1]) * capacity
+        self.values = array('d', [math.nan]) * capacity
+        self._bucket = -1
+        self._sum = 0.0
+        self._count = 0
+
+    def add(self, timestamp: float, value: float) -> None:
+        bucket = int(timestamp // self.resolution)
+        if bucket != self._bucket:
+            self._bucket, self._sum, self._count = bucket, 0.0, 0
+        self._sum += value
+        self._count += 1
+        slot = bucket % self.capacity
+        self.buckets[slot] = bucket
+        self.values[slot] = self._sum / self._count
+
+    @property
+    def span(self) -> int:
+        # How many seconds of history this ring can hold
+        return self.resolution * self.capacity
+
+    def points(self, start: float, end: float) -> List[Tuple[float, float]]:
+        first = int(start // self.resolution)
+        last = int(end // self.resolution)
+        first = max(first, last - self.capacity + 1)
+
+        points = []
+        for bucket in range(first, last + 1):
+            slot = bucket % self.capacity
+            if self.buckets[slot] == bucket:
+                points.append((bucket * self.resolution, self.values[slot]))
+        return points
+
+
+def downsample(points: List[Tuple[float, float]], max_points: int) -> List[Tuple[float, float]]:
+    # Averages neighbouring points so at most max_points come back
+    if max_points <= 0 or len(points) <= max_points:
+        return points
+    group = math.ceil(len(points) / max_points)
+    result = []
+    for i in range(0, len(points), group):
+        chunk = points[i:i + group]
+        result.append((chunk[0][0], sum(value for _, value in chunk) / len(chunk)))
+    return result
+
+
+class TimeSeriesStore:
+    # Named series, each kept at several resolutions (e.g. 10s, 1m, 1h) in Rings.
+    #
+    # Memory is fixed by (number of series) x (sum of level capacities), no matter how
+    # long the box has been up. The whole store is written to one compact binary file.
+
+    def __init__(self, levels: Sequence[Tuple[int, int]], path: Optional[Path] = None):
+        self.levels = [tuple(level) for level in levels]
+        self.path = Path(path) if path else None
+        self._lock = threading.Lock()
+        self._series: Dict[str, List[Ring]] = {}
+
+    def _rings(self, name: str) -> List[Ring]:
+        rings = self._series.get(name)
+        if rings is None:
+            rings = [Ring(resolution, capacity) for resolution, capacity in self.levels]
+            self._series[name] = rings
+        return rings
+
+    def record(self, timestamp: float, values: Dict[str, Optional[float]]) -> None:
+        with self._lock:
+            for name, value in values.items():
+                if value is None or math.isnan(value):
+                    continue
+                for ring in self._rings(name):
+                    ring.add(timestamp, value)
+
+    def series_names(self) -> List[str]:
+        with self._lock:
+            return sorted(self._series)
+
+    def query(self, name: str, start: float, end: float, max_points: int = 300) -> List[Tuple[float, float]]:
+        # Points between start and end from the finest level that reaches back far enough
+        with self._lock:
+            rings = self._series.get(name)
+            if not rings:
+                return []
+            age = time.time() - start
+            # (one bucket of slack so "the last 24h" still fits the 24h level)
+            ring = next((ring for ring in rings if ring.span + ring.resolution >= age), rings[-1])
+            points = ring.points(start, end)
+        return downsample(points, max_points)
+
+    # --- persistence ---
+
+    def save(self) -> None:
+        if self.path is None:
+            return
+        with self._lock:
+            names = sorted(self._series)
+            header = json.dumps({'levels': self.levels, 'series': names}).encode()
+            chunks = [_HEADER.pack(_MAGIC, len(header)), header]
+            for name in names:
+                for ring in self._series[name]:
+                    chunks.append(ring.buckets.tobytes())
+                    chunks.append(ring.values.tobytes())
+
+        # Write-then-rename, so a power cut never leaves a half-written file behind
+        try:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            tmp_path = self.path.with_suffix('.tmp')
+            with open(tmp_path, 'wb') as f:
+                for chunk in chunks:
+                    f.write(chunk)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_path, self.path)
+        except OSError as e:
+            logger.error(f"Failed to save time series to {self.path}: {e}")
+
+    def load(self) -> None:
+        if self.path is None or not self.path.exists():
+            return
+        try:
+            with open(self.path, 'rb') as f:
+                magic, header_len = _HEADER.unpack(f.read(_HEADER.size))
+                if magic != _MAGIC:
+                    raise ValueError("not a time series file")
+                header = json.loads(f.read(header_len))
+                if [tuple(level) for level in header['levels']] != self.levels:
+                    # Different rollup settings – old data doesn't fit, start over
+                    logger.info("Time series levels changed, discarding saved history")
+                    return
+
+                series = {}
+                for name in header['series']:
+                    rings = []
+                    for resolution, capacity in self.levels:
+                        ring = Ring(resolution, capacity)
+                        ring.buckets = array('q')
+                        ring.buckets.frombytes(f.read(capacity * ring.buckets.itemsize))
+                        ring.values = array('d')
+                        ring.values.frombytes(f.read(capacity * ring.values.itemsize))
+                        if len(ring.buckets) != capacity or len(ring.values) != capacity:
+                            raise ValueError("file is truncated")
+                        rings.append(ring)
+                    series[name] = rings
+        except (OSError, ValueError, KeyError, struct.error) as e:
+            logger.error(f"Failed to load time series from {self.path}: {e}")
+            return
+
+        with self._lock:
+            self._series = series
+        logger.info(f"Loaded {len(series)} time series from {self.path}")
@@ -0,0 +1,84 @@
+import threading
+import time
+import logging
+from typing import Any, Callable, Dict, List
+
+logger = logging.getLogger(__name__)
+
+
+class CoalescingCache:
+    # A set of cached fields, each with its own TTL, refreshed by one shared loader.
+    #
+    # When fields go stale, the first caller ("leader") loads all of them in a single
+    # loader call while every other caller waits for that result instead of starting
+    # its own – so N concurrent requests cost at most one refresh.
+    #
+    # The loader gets the list of stale keys and returns {key: value}. A value may be
+    # an Exception instance; it is cached like any other value so a failing backend
+    # isn't hammered, and handed back to callers to deal with.
+
+    def __init__(self, ttls: Dict[str, float], loader: Callable[[List[str]], Dict[str, Any]]):
+        self.ttls = dict(ttls)
+        self.loader = loader
+        self._cond = threading.Condition()
+        self._values: Dict[str, Any] = {}
+        self._loaded_at: Dict[str, float] = {}
+        self._loading = False
+
+    def _stale_keys(self, now: float) -> List[str]:
+        return [key for key, ttl in self.ttls.items()
+                if now - self._loaded_at.get(key, float('-inf')) >= ttl]
+
+    def get(self) -> Dict[str, Any]:
+        with self._cond:
+            while True:
+                stale = self._stale_keys(time.monotonic())
+                if not stale:
+                    return dict(self._values)
+                if not self._loading:
+                    self._loading = True
+                    break
+                # Someone else is already loading – piggyback on their result
+                self._cond.wait()
+
+        try:
+            try:
+                values = self.loader(stale)
+            except Exception as e:
+                logger.error(f"Cache loader failed: {str(e)}", exc_info=True)
+                values = {key: e for key in stale}
+
+            with self._cond:
+                now = time.monotonic()
+                for key in stale:
+                    self._values[key] = values.get(key)
+                    self._loaded_at[key] = now
+                return dict(self._values)
+        finally:
+            # Even on SystemExit/KeyboardInterrupt in the loader: hand leadership on, or every
+            # later caller would wait for a load that never finishes
+            with self._cond:
+                self._loading = False
+                self._cond.notify_all()
+
+    def invalidate(self, *keys: str) -> None:
+        # Marks the given keys (or everything) stale
+        with self._cond:
+            for key in keys or list(self._loaded_at):
+                self._loaded_at.pop(key, None)
+
+    def peek(self, key: str) -> Any:
+        # The cached value, however old, without triggering a load (None if never loaded)
+        with self._cond:
+            return self._values.get(key)
+
+    def set_ttl(self, key: str, ttl: float) -> None:
+        # E.g. a longer TTL while something else keeps the value up to date
+        with self._cond:
+            self.ttls[key] = ttl
+
+    def update(self, key: str, value: Any) -> None:
+        # Puts a value in from the outside, e.g. when an event tells us what changed
+        with self._cond:
+            self._values[key] = value
+            self._loaded_at[key] = time.monotonic()
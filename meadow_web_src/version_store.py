@@ -0,0 +1,159 @@
+import os
+import re
+import shutil
+import logging
+from pathlib import Path
+from typing import List, Optional, Tuple
+from meadow_web.config import (
+    BITCOIN_INSTALL_DIR,
+    BITCOIN_VERSIONS_DIR,
+    BITCOIN_ARTIFACT_CACHE_DIR,
+    BITCOIN_ARTIFACT_CACHE_KEEP
+)
+
+logger = logging.getLogger(__name__)
+
+# Name given to an install that predates the version store (a plain /opt/bitcoin folder)
+LEGACY_VERSION = 'legacy'
+
+_VERSION_RE = re.compile(r'bitcoin-(\d+(?:\.\d+)+(?:rc\d+)?)-')
+
+
+def version_from_archive(archive_name: str) -> Optional[str]:
+    # 'bitcoin-28.1-aarch64-linux-gnu.tar.gz' -> '28.1'
+    match = _VERSION_RE.match(archive_name)
+    return match.group(1) if match else None
+
+
+def version_key(version: str) -> Tuple:
+    # Sorts 27.2 < 28.0rc1 < 28.0 < 28.1 (release candidates before the release)
+    match = re.match(r'(\d+(?:\.\d+)*)(?:rc(\d+))?$', version)
+    if not match:
+        return ((), 0)
+    numbers = tuple(int(part) for part in match.group(1).split('.'))
+    rc = int(match.group(2)) if match.group(2) else float('inf')
+    return (numbers, rc)
+
+
+class VersionStore:
+    # One directory per Bitcoin Core release under `versions_dir`, plus a symlink
+    # (`active_link`, i.e. BITCOIN_INSTALL_DIR) pointing at the one in use.
+    #
+    # Switching versions is a single rename of a symlink, so there is never a moment
+    # without a bitcoind binary. Verified release tarballs are kept in `cache_dir`,
+    # which makes reinstalls work without the network.
+
+    def __init__(self, versions_dir: Path, active_link: Path, cache_dir: Path, cache_keep: int):
+        self.versions_dir = Path(versions_dir)
+        self.active_link = Path(active_link)
+        self.cache_dir = Path(cache_dir)
+        self.cache_keep = cache_keep
+
+    def version_dir(self, version: str) -> Path:
+        return self.versions_dir / version
+
+    def staging_dir(self, version: str) -> Path:
+        # Same filesystem as the final directory, so finishing an install is a rename
+        return self.versions_dir / f'.{version}.staging'
+
+    def has_version(self, version: str) -> bool:
+        return (self.version_dir(version) / 'bin' / 'bitcoind').is_file()
+
+    def installed_versions(self) -> List[str]:
+        try:
+            entries = os.listdir(self.versions_dir)
+        except OSError:
+            return []
+        versions = [name for name in entries if not name.startswith('.') and self.has_version(name)]
+        return sorted(versions, key=version_key)
+
+    def active_version(self) -> Optional[str]:
+        if self.active_link.is_symlink():
+            target = Path(os.readlink(self.active_link))
+            if not target.is_absolute():
+                target = self.active_link.parent / target
+            if target.parent == self.versions_dir and self.has_version(target.name):
+                return target.name
+            return None
+        if (self.active_link / 'bin' / 'bitcoind').is_file():
+            return LEGACY_VERSION  # not migrated yet
+        return None
+
+    def _migrate_legacy(self) -> None:
+        # A real directory can't be atomically replaced by a symlink, so move it into the store first
+        if self.active_link.is_symlink() or not self.active_link.exists():
+            return
+        target = self.version_dir(LEGACY_VERSION)
+        shutil.rmtree(target, ignore_errors=True)
+        self.versions_dir.mkdir(parents=True, exist_ok=True)
+        logger.info(f"Moving existing install {self.active_link} to {target}")
+        shutil.move(str(self.active_link), str(target))
+
+    def activate(self, version: str) -> None:
+        # Points the active symlink at `version` with one atomic rename
+        if not self.has_version(version):
+            raise ValueError(f"Bitcoin Core {version} is not installed")
+
+        self._migrate_legacy()
+        self.active_link.parent.mkdir(parents=True, exist_ok=True)
+        tmp_link = self.active_link.parent / f'.{self.active_link.name}.tmp'
+        if tmp_link.is_symlink() or tmp_link.exists():
+            tmp_link.unlink()
+        os.symlink(self.version_dir(version), tmp_link)
+        os.replace(tmp_link, self.active_link)
+        logger.info(f"Activated Bitcoin Core {version}")
+
+    def commit_staging(self, version: str) -> Path:
+        # Turns a fully unpacked staging dir into the version's directory
+        final = self.version_dir(version)
+        old = self.versions_dir / f'.{version}.old'
+        shutil.rmtree(old, ignore_errors=True)
+        if final.exists():
+            final.rename(old)
+        self.staging_dir(version).rename(final)
+        shutil.rmtree(old, ignore_errors=True)
+        return final
+
+    # --- local cache of verified release tarballs ---
+
+    def cached_archive(self, archive_name: str) -> Optional[Tuple[Path, str]]:
+        # (path, sha256) of a cached tarball, if we have one with a recorded digest
+        archive = self.cache_dir / archive_name
+        digest_file = self.cache_dir / f'{archive_name}.sha256'
+        try:
+            digest = digest_file.read_text().strip()
+        except OSError:
+            return None
+        if not archive.is_file() or not digest:
+            return None
+        return archive, digest
+
+    def store_archive(self, path: Path, archive_name: str, digest: str) -> None:
+        # Moves a verified download into the cache (a rename – downloads live on the same disk)
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        os.replace(path, self.cache_dir / archive_name)
+        (self.cache_dir / f'{archive_name}.sha256').write_text(digest + '\n')
+        self._prune_cache()
+
+    def forget_archive(self, archive_name: str) -> None:
+        for name in (archive_name, f'{archive_name}.sha256'):
+            try:
+                (self.cache_dir / name).unlink()
+            except OSError:
+                pass
+
+    def _prune_cache(self) -> None:
+        # Keep only the newest few tarballs – each one is ~50 MB
+        archives = []
+        for entry in self.cache_dir.glob('*.sha256'):
+            archive_name = entry.name[:-len('.sha256')]
+            version = version_from_archive(archive_name)
+            archives.append((version_key(version) if version else ((), 0), archive_name))
+        archives.sort()
+        for _, archive_name in archives[:max(len(archives) - self.cache_keep, 0)]:
+            logger.info(f"Dropping {archive_name} from the artifact cache")
+            self.forget_archive(archive_name)
+
+
+version_store = VersionStore(BITCOIN_VERSIONS_DIR, BITCOIN_INSTALL_DIR,
+                             BITCOIN_ARTIFACT_CACHE_DIR, BITCOIN_ARTIFACT_CACHE_KEEP)
@@ -0,0 +1,292 @@
+import hashlib
+import struct
+import threading
+import time
+import logging
+from typing import Any, Dict, Optional, Tuple
+from meadow_web.bitcoin_rpc import bitcoin_rpc, BitcoinRPCError
+from meadow_web.config import (
+    BITCOIN_ZMQ_HASHBLOCK,
+    BITCOIN_ZMQ_RAWTX,
+    NODE_INFO_TTLS,
+    ZMQ_CHAIN_TTL,
+    ZMQ_EVENT_INTERVAL
+)
+from meadow_web.events import event_hub
+from meadow_web.node_info import node_info_cache
+
+try:
+    import zmq
+    from zmq.utils.monitor import recv_monitor_message
+except ImportError:
+    zmq = None
+
+logger = logging.getLogger(__name__)
+
+# Bridge from bitcoind's ZMQ notifications to the dashboards.
+#
+# One SUB socket listens to `hashblock` and `rawtx`. Notifications are collected and
+# flushed every ZMQ_EVENT_INTERVAL seconds as at most one 'block' and one 'mempool'
+# event on the event hub, so a burst (a block's worth of rawtx, hundreds of blocks a
+# second during IBD) never turns into hundreds of browser messages.
+#
+# A new tip is looked up with a single getblockheader and patched into the cached
+# getblockchaininfo, instead of refreshing everything. During IBD the cache is left to
+# its normal TTL (verification progress has to come from RPC anyway) and the event only
+# carries the hash. Each notification has a sequence number; a gap means some were lost
+# (bitcoind's send buffer was full), and the cached chain state is then refreshed.
+
+_TOPICS = (b'hashblock', b'rawtx')
+
+
+def _read_varint(raw: bytes, pos: int) -> Tuple[int, int]:
+    first = raw[pos]
+    if first < 0xfd:
+        return first, pos + 1
+    size = {0xfd: 2, 0xfe: 4, 0xff: 8}[first]
+    return int.from_bytes(raw[pos + 1:pos + 1 + size], 'little'), pos + 1 + size
+
+
+def parse_tx(raw: bytes) -> Tuple[str, int]:
+    # (txid, vsize) of a serialized transaction; raises ValueError if it doesn't parse
+    try:
+        segwit = raw[4] == 0 and raw[5] == 1
+        pos = 6 if segwit else 4
+        body_start = pos
+        input_count, pos = _read_varint(raw, pos)
+        for _ in range(input_count):
+            script_length, pos = _read_varint(raw, pos + 36)  # previous txid and output index
+            pos += script_length + 4  # script and sequence
+        output_count, pos = _read_varint(raw, pos)
+        for _ in range(output_count):
+            script_length, pos = _read_varint(raw, pos + 8)  # amount
+            pos += script_length
+        body_end = pos
+        if segwit:
+            for _ in range(input_count):
+                items, pos = _read_varint(raw, pos)
+                for _ in range(items):
+                    length, pos = _read_varint(raw, pos)
+                    pos += length
+    except (IndexError, KeyError):
+        raise ValueError("truncated transaction")
+    if pos + 4 != len(raw):
+        raise ValueError("transaction length doesn't add up")
+
+    # txid and vsize are both based on the serialization without witness data
+    stripped = raw[:4] + raw[body_start:body_end] + raw[-4:]
+    txid = hashlib.sha256(hashlib.sha256(stripped).digest()).digest()[::-1].hex()
+    weight = len(stripped) * 3 + len(raw)
+    return txid, (weight + 3) // 4
+
+
+class ZmqBridge:
+
+    def __init__(self, hashblock_endpoint: str = BITCOIN_ZMQ_HASHBLOCK, rawtx_endpoint: str = BITCOIN_ZMQ_RAWTX,
+                 interval: float = ZMQ_EVENT_INTERVAL, chain_ttl: float = ZMQ_CHAIN_TTL):
+        self.hashblock_endpoint = hashblock_endpoint
+        self.rawtx_endpoint = rawtx_endpoint
+        self.interval = interval
+        self.chain_ttl = chain_ttl
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+
+        self._connected = set()
+        self._sequence: Dict[bytes, int] = {}
+        self._chain_ttl_extended = False
+        # Collected since the last flush
+        self._tip: Optional[str] = None
+        self._new_blocks = 0
+        self._blocks_missed = False
+        self._txs = 0
+        self._tx_vbytes = 0
+        self._flushed_at = time.monotonic()
+        # Totals for state()
+        self._stats = {'blocks': 0, 'txs': 0, 'missed': 0, 'last_block_at': None}
+
+    @property
+    def available(self) -> bool:
+        return zmq is not None
+
+    def start(self) -> None:
+        if zmq is None:
+            logger.info("pyzmq is not installed – new blocks show up with the regular RPC refresh")
+            return
+        with self._lock:
+            if self._thread is not None:
+                return
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name='zmq-bridge', daemon=True)
+        logger.info(f"Listening for bitcoind notifications on {self.hashblock_endpoint} and {self.rawtx_endpoint}")
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        thread = self._thread
+        if thread is not None:
+            thread.join(5)
+        with self._lock:
+            self._thread = None
+
+    def state(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                'available': self.available,
+                'connected': self.hashblock_endpoint in self._connected,
+                **self._stats
+            }
+
+    # --- the bridge thread ---
+
+    def _run(self) -> None:
+        while not self._stop.is_set():
+            try:
+                self._listen()
+            except Exception as e:
+                logger.error(f"ZMQ bridge failed, restarting it: {str(e)}", exc_info=True)
+                self._set_connected(set())
+                self._stop.wait(5)
+
+    def _listen(self) -> None:
+        context = zmq.Context.instance()
+        socket = context.socket(zmq.SUB)
+        for topic in _TOPICS:
+            socket.setsockopt(zmq.SUBSCRIBE, topic)
+        monitor = socket.get_monitor_socket(zmq.EVENT_CONNECTED | zmq.EVENT_DISCONNECTED)
+        # Connecting never fails – libzmq keeps retrying in the background until bitcoind listens
+        for endpoint in {self.hashblock_endpoint, self.rawtx_endpoint}:
+            socket.connect(endpoint)
+
+        poller = zmq.Poller()
+        poller.register(socket, zmq.POLLIN)
+        poller.register(monitor, zmq.POLLIN)
+        connected = set()
+        try:
+            while not self._stop.is_set():
+                for ready, _ in poller.poll(self.interval * 1000):
+                    if ready is monitor:
+                        event = recv_monitor_message(monitor)
+                        endpoint = event['endpoint'].decode()
+                        if event['event'] == zmq.EVENT_CONNECTED:
+                            connected.add(endpoint)
+                        else:
+                            connected.discard(endpoint)
+                        self._set_connected(set(connected))
+                    else:
+                        self._drain(socket)
+                if time.monotonic() - self._flushed_at >= self.interval:
+                    self._flush()
+        finally:
+            socket.disable_monitor()
+            monitor.close(linger=0)
+            socket.close(linger=0)
+            self._set_connected(set())
+
+    def _drain(self, socket) -> None:
+        # What's queued right now, without blocking – in slices, so a flood of rawtx
+        # can't hold off the next flush
+        for _ in range(1000):
+            try:
+                parts = socket.recv_multipart(zmq.NOBLOCK)
+            except zmq.Again:
+                return
+            if len(parts) != 3 or len(parts[2]) != 4:
+                continue
+            topic, body, sequence = parts[0], parts[1], struct.unpack('<I', parts[2])[0]
+            missed = self._check_sequence(topic, sequence)
+            if topic == b'hashblock':
+                self._tip = body.hex()
+                self._new_blocks += 1
+                self._blocks_missed = self._blocks_missed or missed
+            elif topic == b'rawtx':
+                try:
+                    _, vsize = parse_tx(body)
+                except ValueError:
+                    vsize = len(body)
+                self._txs += 1
+                self._tx_vbytes += vsize
+
+    def _check_sequence(self, topic: bytes, sequence: int) -> bool:
+        # True if notifications were lost before this one. Sequences count up from 0 per
+        # topic and start over when bitcoind restarts
+        last = self._sequence.get(topic)
+        self._sequence[topic] = sequence
+        if last is None or sequence == 0 or sequence == (last + 1) & 0xffffffff:
+            return False
+        with self._lock:
+            self._stats['missed'] += (sequence - last - 1) & 0xffffffff
+        return True
+
+    def _flush(self) -> None:
+        now = time.monotonic()
+        seconds, self._flushed_at = now - self._flushed_at, now
+        if self._tip is not None:
+            self._publish_block(self._tip, self._new_blocks, self._blocks_missed)
+            self._tip, self._new_blocks, self._blocks_missed = None, 0, False
+        if self._txs:
+            with self._lock:
+                self._stats['txs'] += self._txs
+            event_hub.publish('mempool', {'txs': self._txs, 'vbytes': self._tx_vbytes, 'seconds': round(seconds, 2)})
+            self._txs = self._tx_vbytes = 0
+        self._update_chain_ttl()
+
+    def _publish_block(self, block_hash: str, count: int, missed: bool) -> None:
+        with self._lock:
+            self._stats['blocks'] += count
+            self._stats['last_block_at'] = time.time()
+
+        chain = node_info_cache.peek('blockchain')
+        event = {'hash': block_hash, 'count': count, 'height': None, 'time': None}
+        if isinstance(chain, dict) and chain.get('initialblockdownload'):
+            event['initial_block_download'] = True
+            event_hub.publish('block', event)
+            return
+
+        try:
+            header = bitcoin_rpc.call('getblockheader', block_hash)
+        except BitcoinRPCError as e:
+            logger.warning(f"Couldn't look up new block {block_hash}: {str(e)}")
+            header = None
+
+        if header is None or header.get('confirmations', 0) < 1 or missed or not isinstance(chain, dict):
+            # Gone again (reorg), lost notifications or nothing cached to patch: have the
+            # next reader fetch the chain state from scratch
+            node_info_cache.invalidate('blockchain')
+        else:
+            chain = dict(chain, blocks=header['height'], headers=max(chain.get('headers') or 0, header['height']),
+                         bestblockhash=block_hash, time=header.get('time'), mediantime=header.get('mediantime'))
+            node_info_cache.update('blockchain', chain)
+        # The block took its transactions out of the mempool
+        node_info_cache.invalidate('mempool')
+
+        if header is not None:
+            event.update(height=header.get('height'), time=header.get('time'))
+        event_hub.publish('block', event)
+
+    def _set_connected(self, connected: set) -> None:
+        with self._lock:
+            if connected == self._connected:
+                return
+            was_connected = self.hashblock_endpoint in self._connected
+            self._connected = connected
+            now_connected = self.hashblock_endpoint in connected
+        if now_connected != was_connected:
+            logger.info(f"Block notifications {'connected' if now_connected else 'disconnected'} "
+                        f"({self.hashblock_endpoint})")
+            self._sequence.clear()
+        self._update_chain_ttl()
+
+    def _update_chain_ttl(self) -> None:
+        # Chain state may be served from cache for longer only while every new block is
+        # guaranteed to come in by ZMQ, i.e. connected and out of IBD
+        chain = node_info_cache.peek('blockchain')
+        with self._lock:
+            connected = self.hashblock_endpoint in self._connected
+        extend = connected and isinstance(chain, dict) and chain.get('initialblockdownload') is False
+        if extend != self._chain_ttl_extended:
+            self._chain_ttl_extended = extend
+            node_info_cache.set_ttl('blockchain', self.chain_ttl if extend else NODE_INFO_TTLS['blockchain'])
+
+
+zmq_bridge = ZmqBridge()